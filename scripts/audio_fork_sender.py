@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Stand-in for FreeSWITCH mod_audio_fork, for load testing the media server.
+Opens one connection per simulated call and streams 16-bit PCM in real
+time (20 ms frames), then reports how far behind schedule sending fell.
+"""
+import sys
+import json
+import time
+import uuid
+import wave
+import asyncio
+import argparse
+import logging
+from typing import List
+
+import numpy as np
+import websockets
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def load_audio(path: str, sample_rate: int, duration: float) -> bytes:
+    """
+    Load 16-bit mono PCM to send, or generate a speech-like test signal.
+    
+    Args:
+        path: WAV file to send (16-bit mono), or None to generate audio
+        sample_rate: Sample rate to generate at
+        duration: Seconds of audio to generate
+    
+    Returns:
+        Raw PCM bytes
+    """
+    if path:
+        with wave.open(path, 'rb') as wav:
+            if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+                raise ValueError("WAV input must be 16-bit mono")
+            return wav.readframes(wav.getnframes())
+    
+    # Alternate one second of tone with one second of silence
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) * ((t.astype(int) % 2) == 0)
+    return (tone * 32767).astype('<i2').tobytes()
+
+
+async def send_call(args, audio: bytes, lags: List[float]) -> None:
+    """
+    Stream audio for one simulated call.
+    
+    Args:
+        args: Command line arguments
+        audio: PCM to send
+        lags: List the per-frame send lag (seconds) is appended to
+    """
+    call_id = str(uuid.uuid4())
+    frame_bytes = int(args.sample_rate * args.frame_ms / 1000) * 2
+    frames = [audio[i:i + frame_bytes] for i in range(0, len(audio), frame_bytes)]
+    
+    if args.tcp:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        writer.write(f"{call_id}\n".encode('utf-8'))
+    else:
+        websocket = await websockets.connect(f"ws://{args.host}:{args.port}/calls/{call_id}")
+        await websocket.send(json.dumps({'uuid': call_id, 'sampling': args.sample_rate}))
+    
+    start = time.perf_counter()
+    try:
+        for index, frame in enumerate(frames):
+            due = start + index * args.frame_ms / 1000
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, time.perf_counter() - due))
+            
+            if args.tcp:
+                writer.write(frame)
+                await writer.drain()
+            else:
+                await websocket.send(frame)
+    finally:
+        if args.tcp:
+            writer.close()
+            await writer.wait_closed()
+        else:
+            await websocket.close()
+
+
+async def run(args) -> None:
+    """
+    Run all simulated calls concurrently and report send lag.
+    
+    Args:
+        args: Command line arguments
+    """
+    audio = load_audio(args.wav, args.sample_rate, args.duration)
+    lags: List[float] = []
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(send_call(args, audio, lags) for _ in range(args.calls)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    
+    failures = [result for result in results if isinstance(result, Exception)]
+    for failure in failures[:5]:
+        logger.error(f"Call failed: {failure}")
+    
+    if lags:
+        lag_ms = np.array(lags) * 1000
+        print(f"Calls: {args.calls} ({len(failures)} failed), frames sent: {len(lags)}, elapsed: {elapsed:.1f}s")
+        print(f"Send lag ms: mean {lag_ms.mean():.2f}, p95 {np.percentile(lag_ms, 95):.2f}, max {lag_ms.max():.2f}")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Simulate audio forks from many concurrent calls")
+    parser.add_argument("--host", default="127.0.0.1", help="Media server host")
+    parser.add_argument("--port", type=int, default=8085, help="Media server port (WebSocket, or TCP with --tcp)")
+    parser.add_argument("--tcp", action="store_true", help="Send raw PCM over TCP instead of WebSocket")
+    parser.add_argument("--calls", type=int, default=10, help="Number of concurrent calls")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of generated audio per call")
+    parser.add_argument("--wav", help="16-bit mono WAV file to send instead of generated audio")
+    parser.add_argument("--sample-rate", type=int, default=8000, help="Sample rate of generated audio")
+    parser.add_argument("--frame-ms", type=int, default=20, help="Frame duration in milliseconds")
+    
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,26 +7,64 @@ import logging
 import json
 import yaml
 import time
-from typing import Dict, List, Optional, Any, Union, Tuple
+import bisect
+import heapq
+import itertools
+from typing import Dict, List, Optional, Any, Union, Tuple, Deque, Callable, Awaitable
 from datetime import datetime
 from collections import deque
 
-from src.llm.prompts import get_prompt_template
+from src.llm.prompts import get_prompt_template, compile_conversation_prompt, PROMPT_DEFAULTS
 
 logger = logging.getLogger(__name__)
 
+# Per-message overhead of the chat template (role markers, separators)
+TOKENS_PER_MESSAGE = 4
+
+# Instructions for folding old turns into the running summary
+SUMMARY_PROMPT = (
+    "Summarize this phone conversation between a caller and an AI assistant "
+    "for the assistant's own reference. Keep the caller's details, requests, "
+    "anything agreed or promised, and open questions. Write a few short "
+    "sentences without greetings or commentary."
+)
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text.
+    
+    Uses the common approximation of four characters per token for English,
+    which avoids loading the model's tokenizer in the call path.
+    
+    Args:
+        text: The text to measure
+        
+    Returns:
+        Estimated token count
+    """
+    return (len(text) + 3) // 4
+
 class ConversationContext:
     """
     Manages conversation context for LLM interactions.
     Handles message history, conversation state, and context management.
+    
+    System messages are pinned; user and assistant messages are kept in a
+    deque and evicted oldest first once the history exceeds max_history
+    messages or token_limit tokens. Each message's token count is stored
+    when it is added, so the running total never has to be recomputed.
+    
+    On long calls the oldest turns are folded into a running summary system
+    message before they would be evicted (see summarize()).
     """
     
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None):
         """
         Initialize the conversation context manager.
         
         Args:
             config_path: Path to the configuration file
+            config: Already parsed configuration; skips reading config_path
         """
         self.config_path = config_path or os.path.join(
             os.path.dirname(__file__), 
@@ -38,11 +76,29 @@ class ConversationContext:
         self.token_limit = 4000
         self.context_type = "call_answering"
         
+        # Rolling summarization settings
+        self.summarize_enabled = True
+        self.summary_threshold = 12
+        self.summary_keep_recent = 6
+        
         # Load configuration
-        self._load_config()
+        self._load_config(config)
+        
+        # Message storage: (sequence, tokens, message) entries in arrival order
+        self._pinned: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._history: Deque[Tuple[int, int, Dict[str, Any]]] = deque()
+        self._sequence = itertools.count()
+        self.total_tokens = 0
+        # Bumped whenever earlier messages are removed or replaced, so an
+        # LLM prefix cache of this conversation knows it is stale
+        self.revision = 0
+        
+        # Running summary of turns folded out of the history
+        self.summary: Optional[str] = None
+        self._summary_entry: Optional[Tuple[int, int, Dict[str, Any]]] = None
+        self._summarizing = False
         
         # Initialize context
-        self.messages = []
         self.metadata = {}
         self.context_variables = {}
         self.last_updated = time.time()
@@ -53,13 +109,17 @@ class ConversationContext:
         
         logger.info("Conversation context initialized")
     
-    def _load_config(self) -> None:
+    def _load_config(self, config: Optional[Dict[str, Any]] = None) -> None:
         """
         Load configuration from YAML file.
+        
+        Args:
+            config: Already parsed configuration to use instead of the file
         """
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            if config is None:
+                with open(self.config_path, 'r') as f:
+                    config = yaml.safe_load(f)
             
             if config and 'llm' in config:
                 llm_config = config['llm']
@@ -75,6 +135,15 @@ class ConversationContext:
                     
                     if 'context_type' in context_config:
                         self.context_type = context_config['context_type']
+                    
+                    if 'summarize' in context_config:
+                        self.summarize_enabled = bool(context_config['summarize'])
+                    
+                    if 'summary_threshold' in context_config:
+                        self.summary_threshold = int(context_config['summary_threshold'])
+                    
+                    if 'summary_keep_recent' in context_config:
+                        self.summary_keep_recent = int(context_config['summary_keep_recent'])
                 
             logger.info(f"Loaded context configuration from {self.config_path}")
         except Exception as e:
@@ -110,16 +179,19 @@ class ConversationContext:
         # Add any additional metadata
         self.metadata.update(metadata)
         
-        # Add the initial system message
-        system_prompt = get_prompt_template(self.context_type)
-        
-        # Format the system prompt with metadata
-        try:
-            system_prompt = system_prompt.format(**self.metadata)
-        except KeyError as e:
-            logger.warning(f"Missing metadata key in prompt template: {e}")
+        # Add the initial system message, formatted with the metadata. The
+        # prompt comes from the config's prompt store, which serves edits to
+        # the config and overlay files from memory
+        template = compile_conversation_prompt(
+            get_prompt_template(self.context_type, self.config_path), self.context_type
+        )
+        variables = {**PROMPT_DEFAULTS, **self.metadata}
+        missing = template.missing(variables)
+        if missing:
+            logger.warning(f"Missing metadata key in prompt template: {', '.join(missing)}")
+        system_prompt = template.render(variables)
         
-        self.messages.append({
+        self._append_message({
             "role": "system",
             "content": system_prompt
         })
@@ -151,7 +223,7 @@ class ConversationContext:
             message.update(metadata)
         
         # Add to message history
-        self.messages.append(message)
+        self._append_message(message)
         
         # Update entities based on message content
         # In a real implementation, we would extract entities here
@@ -187,7 +259,7 @@ class ConversationContext:
             message.update(metadata)
         
         # Add to message history
-        self.messages.append(message)
+        self._append_message(message)
         
         # Extract potential actions from the assistant's response
         self._extract_actions(content)
@@ -217,7 +289,10 @@ class ConversationContext:
         }
         
         # Add to message history
-        self.messages.append(message)
+        self._append_message(message)
+        
+        # Trim history if needed
+        self._trim_history()
         
         self.last_updated = time.time()
         logger.info(f"Added system message: {content[:50]}{'...' if len(content) > 50 else ''}")
@@ -262,6 +337,25 @@ class ConversationContext:
             "timestamp": time.time()
         })
     
+    @property
+    def messages(self) -> List[Dict[str, Any]]:
+        """Messages of the conversation in chronological order."""
+        if not self._pinned:
+            return [message for _, _, message in self._history]
+        return [message for _, _, message in heapq.merge(self._pinned, self._history)]
+    
+    @messages.setter
+    def messages(self, messages: List[Dict[str, Any]]) -> None:
+        """Replace the conversation's messages, recounting their tokens."""
+        self._pinned = []
+        self._history = deque()
+        self.total_tokens = 0
+        self.revision += 1
+        self.summary = None
+        self._summary_entry = None
+        for message in messages:
+            self._append_message(message)
+    
     def get_context(self) -> List[Dict[str, str]]:
         """
         Get the current conversation context for the LLM.
@@ -271,6 +365,53 @@ class ConversationContext:
         """
         return self.messages
     
+    def needs_summary(self) -> bool:
+        """
+        Check whether old turns should be folded into the summary.
+        
+        Returns:
+            True if the history is over the summary threshold and no
+            summary is being computed
+        """
+        return (
+            self.summarize_enabled and
+            not self._summarizing and
+            len(self._history) > self.summary_threshold
+        )
+    
+    async def summarize(self, generate: Callable[[List[Dict[str, str]]], Awaitable[Optional[str]]]) -> bool:
+        """
+        Fold all but the most recent turns into the running summary.
+        
+        Meant to run as a background task: turns keep being added while the
+        summary is generated, and only the turns it covers are removed.
+        
+        Args:
+            generate: Coroutine function that returns the LLM response to a
+                list of messages
+            
+        Returns:
+            True if the summary was updated
+        """
+        fold = list(self._history)[:len(self._history) - self.summary_keep_recent]
+        if self._summarizing or not fold:
+            return False
+        
+        self._summarizing = True
+        try:
+            summary = await generate(self._build_summary_request([message for _, _, message in fold]))
+            if not summary or not summary.strip():
+                logger.warning("Empty conversation summary, keeping history")
+                return False
+            
+            self._apply_summary(summary.strip(), fold[-1][0])
+            return True
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {str(e)}", exc_info=True)
+            return False
+        finally:
+            self._summarizing = False
+    
     def get_user_messages(self) -> List[Dict[str, Any]]:
         """
         Get all user messages in the conversation.
@@ -412,32 +553,97 @@ class ConversationContext:
             logger.error(f"Error loading conversation: {str(e)}", exc_info=True)
             return False
     
-    def _trim_history(self) -> None:
+    def _append_message(self, message: Dict[str, Any]) -> None:
         """
-        Trim conversation history to stay within limits.
+        Store a message and add its tokens to the running total.
+        
+        Args:
+            message: The message to store
         """
-        # First, check if we're beyond the max number of messages
-        if len(self.messages) <= self.max_history:
-            return
+        tokens = count_tokens(message.get('content', '')) + TOKENS_PER_MESSAGE
+        entry = (next(self._sequence), tokens, message)
         
-        # Keep the system messages and the most recent messages
-        system_messages = [msg for msg in self.messages if msg.get('role') == 'system']
-        non_system_messages = [msg for msg in self.messages if msg.get('role') != 'system']
+        if message.get('role') == 'system':
+            self._pinned.append(entry)
+        else:
+            self._history.append(entry)
+        self.total_tokens += tokens
+    
+    def _build_summary_request(self, messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Build the LLM request that folds turns into the running summary.
         
-        # Sort non-system messages by timestamp (newest first)
-        non_system_messages.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+        Args:
+            messages: The turns to fold, oldest first
+            
+        Returns:
+            Messages for the LLM
+        """
+        transcript = "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in messages)
+        if self.summary:
+            transcript = f"Summary of the earlier conversation: {self.summary}\n\n{transcript}"
         
-        # Keep only the most recent messages up to the limit
-        keep_count = min(self.max_history - len(system_messages), len(non_system_messages))
-        kept_messages = non_system_messages[:keep_count]
+        return [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript}
+        ]
+    
+    def _apply_summary(self, summary: str, last_sequence: int) -> None:
+        """
+        Replace the folded turns with the new summary.
+        
+        Args:
+            summary: The summary text
+            last_sequence: Sequence number of the newest folded message
+        """
+        folded = 0
+        while self._history and self._history[0][0] <= last_sequence:
+            _, tokens, _ = self._history.popleft()
+            self.total_tokens -= tokens
+            folded += 1
         
-        # Sort kept messages back to chronological order
-        kept_messages.sort(key=lambda x: x.get('timestamp', 0))
+        if self._summary_entry is not None:
+            self._pinned.remove(self._summary_entry)
+            self.total_tokens -= self._summary_entry[1]
         
-        # Rebuild the messages list
-        self.messages = system_messages + kept_messages
+        message = {
+            "role": "system",
+            "content": f"Summary of the conversation so far: {summary}",
+            "summary": True,
+            "timestamp": time.time()
+        }
+        tokens = count_tokens(message['content']) + TOKENS_PER_MESSAGE
+        # Sorts where the folded turns were: after the prompt, before the recent turns
+        self._summary_entry = (last_sequence, tokens, message)
+        bisect.insort(self._pinned, self._summary_entry)
+        self.total_tokens += tokens
+        self.summary = summary
+        self.revision += 1
+        
+        logger.info(f"Folded {folded} messages into the conversation summary, "
+                    f"{self.total_tokens} tokens remain")
+    
+    def _trim_history(self) -> None:
+        """
+        Trim conversation history to stay within limits.
         
-        logger.info(f"Trimmed conversation history to {len(self.messages)} messages")
+        Evicts the oldest user/assistant messages until the conversation fits
+        both max_history and token_limit. System messages and the newest
+        message are always kept.
+        """
+        evicted = 0
+        while len(self._history) > 1 and (
+            len(self._pinned) + len(self._history) > self.max_history or
+            self.total_tokens > self.token_limit
+        ):
+            _, tokens, _ = self._history.popleft()
+            self.total_tokens -= tokens
+            evicted += 1
+        
+        if evicted:
+            self.revision += 1
+            logger.info(f"Trimmed {evicted} messages from conversation history, "
+                        f"{self.total_tokens} tokens remain")
     
     def _extract_entities(self, text: str) -> None:
         """
@@ -0,0 +1,388 @@
+"""
+Dispatching of LLM generation requests.
+Gathers concurrent requests from all calls and releases them to the Ollama
+server in priority order, keeping the number of in-flight requests at the
+parallelism the server is tuned for.
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Any, Callable, Awaitable, Deque
+
+from src.performance_config import LlmOptimizationConfig
+
+logger = logging.getLogger(__name__)
+
+class _Request:
+    """
+    A queued call of a generation function.
+    """
+    
+    __slots__ = ('priority', 'func', 'args', 'kwargs', 'future', 'task',
+                 'queued_at', 'started_at', 'preempted', 'preemptible')
+    
+    def __init__(self, priority: int, func: Callable[..., Awaitable[Any]],
+                 args: tuple, kwargs: Dict[str, Any], future: asyncio.Future,
+                 preemptible: bool = True):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.task: Optional[asyncio.Task] = None
+        self.queued_at = time.monotonic()
+        self.started_at = 0.0
+        self.preempted = False
+        # Whether cancelling the task aborts the backend request
+        self.preemptible = preemptible
+
+
+class _Queue:
+    """
+    FIFO of one priority class with its concurrency cap and metrics.
+    """
+    
+    # Recent waits kept for percentile metrics
+    WAIT_SAMPLES = 1000
+    
+    def __init__(self, name: str, max_in_flight: int):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.pending: Deque[_Request] = deque()
+        self.running: List[_Request] = []
+        
+        # Statistics
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.preempted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits: Deque[float] = deque(maxlen=self.WAIT_SAMPLES)
+    
+    def record_wait(self, wait: float) -> None:
+        """
+        Record how long a request waited before it was started.
+        
+        Args:
+            wait: Seconds between queueing and start
+        """
+        self.started += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.waits.append(wait)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue statistics.
+        
+        Returns:
+            Dictionary with request counts and wait times in seconds
+        """
+        waits = sorted(self.waits)
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'preempted': self.preempted,
+            'queued': len(self.pending),
+            'in_flight': len(self.running),
+            'max_in_flight': self.max_in_flight,
+            'mean_wait': self.wait_total / self.started if self.started else 0.0,
+            'p95_wait': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            'max_wait': self.wait_max
+        }
+
+
+class GenerationDispatcher:
+    """
+    Bounded, priority-ordered gate in front of the LLM backend.
+    
+    Ollama has no multi-prompt batch endpoint; it decodes up to
+    OLLAMA_NUM_PARALLEL requests together. The dispatcher therefore batches
+    by admission: requests wait in per-priority queues and are released
+    whenever one of max_in_flight slots is free.
+    
+    Live-call turns have strict priority: background work (post-call
+    summaries, analytics) only starts while no live turn is waiting, is
+    capped at its own in-flight limit, and is gathered for max_batch_wait
+    before release. When a live turn finds every slot busy, the most
+    recently started natively async background request is cancelled,
+    which aborts it on the backend, and requeued, so background load does
+    not add latency to a caller.
+    """
+    
+    PRIORITY_LIVE = 0
+    PRIORITY_BACKGROUND = 1
+    
+    def __init__(self, max_in_flight: int = 5, max_batch_wait: float = 0.5,
+                 background_max_in_flight: int = 2, preempt_background: bool = True):
+        """
+        Initialize the dispatcher.
+        
+        Args:
+            max_in_flight: Maximum number of requests sent to the backend at once
+            max_batch_wait: Seconds background requests are gathered before release
+            background_max_in_flight: Maximum background requests in flight
+            preempt_background: Cancel and requeue background requests to
+                make room for live turns
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_batch_wait = max_batch_wait
+        self.preempt_background = preempt_background
+        
+        # Indexed by priority; earlier queues are served first
+        self._queues = [
+            _Queue('live', self.max_in_flight),
+            _Queue('background', min(background_max_in_flight, self.max_in_flight))
+        ]
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.in_flight = 0
+    
+    @classmethod
+    def from_config(cls, llm_config: LlmOptimizationConfig) -> "GenerationDispatcher":
+        """
+        Create a dispatcher from the LLM optimization configuration.
+        
+        Args:
+            llm_config: LLM optimization settings
+        
+        Returns:
+            Configured dispatcher
+        """
+        return cls(
+            max_in_flight=llm_config.max_batch_size,
+            max_batch_wait=llm_config.max_batch_wait,
+            background_max_in_flight=llm_config.background_max_in_flight,
+            preempt_background=llm_config.preempt_background
+        )
+    
+    async def submit(self, priority: int, func: Callable[..., Awaitable[Any]],
+                     *args, **kwargs) -> Any:
+        """
+        Queue a generation and wait for its result.
+        
+        func must be natively async (e.g. OllamaClient.agenerate_response):
+        a preempted background request is cancelled, which aborts its
+        backend request, and restarted from scratch, so func must also be
+        safe to call again. Work running on a worker thread goes through
+        submit_blocking instead.
+        
+        Args:
+            priority: PRIORITY_LIVE or PRIORITY_BACKGROUND
+            func: Async callable performing the request
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            The callable's return value
+        """
+        return await self._submit(priority, func, args, kwargs, True)
+    
+    async def submit_blocking(self, priority: int, func: Callable[..., Awaitable[Any]],
+                              *args, **kwargs) -> Any:
+        """
+        Queue a generation that runs on a worker thread and wait for its result.
+        
+        Cancelling the awaiting coroutine cannot stop the thread, so these
+        requests are never preempted; preempting one would only run the
+        same generation twice. A cancelled request keeps its slot until
+        the thread has finished, so the backend never sees more than
+        max_in_flight requests.
+        
+        Args:
+            priority: PRIORITY_LIVE or PRIORITY_BACKGROUND
+            func: Async callable handing the blocking work to an executor
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            The callable's return value
+        """
+        return await self._submit(priority, func, args, kwargs, False)
+    
+    async def _submit(self, priority: int, func: Callable[..., Awaitable[Any]],
+                      args: tuple, kwargs: Dict[str, Any], preemptible: bool) -> Any:
+        """
+        Queue a request and wait for its result.
+        
+        Args:
+            priority: PRIORITY_LIVE or PRIORITY_BACKGROUND
+            func: Async callable performing the request
+            args: Positional arguments for func
+            kwargs: Keyword arguments for func
+            preemptible: Whether live turns may preempt the request
+        
+        Returns:
+            The callable's return value
+        """
+        loop = asyncio.get_running_loop()
+        queue = self._queues[min(max(priority, 0), len(self._queues) - 1)]
+        request = _Request(priority, func, args, kwargs, loop.create_future(), preemptible)
+        queue.pending.append(request)
+        queue.submitted += 1
+        
+        if queue is self._queues[self.PRIORITY_LIVE]:
+            if self.in_flight >= self.max_in_flight:
+                self._preempt()
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_batch_wait, self._dispatch)
+        
+        try:
+            return await request.future
+        except asyncio.CancelledError:
+            # Free the backend slot if the caller gave up (e.g. hung up)
+            if request.task is not None:
+                request.task.cancel()
+            raise
+    
+    async def generate(self, client, messages: List[Dict[str, str]],
+                       options: Optional[Dict[str, Any]] = None,
+                       priority: int = PRIORITY_LIVE) -> Optional[str]:
+        """
+        Generate a response through the dispatcher.
+        
+        Args:
+            client: OllamaClient to generate with
+            messages: List of message dictionaries with 'role' and 'content' keys
+            options: Additional options for the generation
+            priority: Request priority
+        
+        Returns:
+            Generated response text or None if generation failed
+        """
+        return await self.submit(priority, client.agenerate_response, messages, options)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get dispatcher statistics.
+        
+        Returns:
+            Dictionary with the total in-flight requests and, per queue,
+            request counts, preemptions and wait times in seconds
+        """
+        stats: Dict[str, Any] = {'in_flight': self.in_flight, 'max_in_flight': self.max_in_flight}
+        for queue in self._queues:
+            stats[queue.name] = queue.get_stats()
+        return stats
+    
+    def _dispatch(self) -> None:
+        """
+        Release queued requests into the free slots, live turns first.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        for queue in self._queues:
+            while queue.pending and self.in_flight < self.max_in_flight:
+                if len(queue.running) >= queue.max_in_flight:
+                    break
+                
+                request = queue.pending.popleft()
+                if request.future.cancelled():
+                    continue
+                
+                request.started_at = time.monotonic()
+                queue.record_wait(request.started_at - request.queued_at)
+                queue.running.append(request)
+                self.in_flight += 1
+                request.task = asyncio.ensure_future(self._run(queue, request))
+            
+            # Strict priority: lower queues wait while a higher one has requests waiting
+            if queue.pending:
+                break
+    
+    def _preempt(self) -> None:
+        """
+        Cancel the most recently started preemptible background request to free a slot.
+        """
+        if not self.preempt_background:
+            return
+        
+        queue = self._queues[self.PRIORITY_BACKGROUND]
+        candidates = [
+            request for request in queue.running
+            if request.preemptible and not request.preempted
+        ]
+        if not candidates:
+            return
+        
+        # The newest request has done the least work
+        request = max(candidates, key=lambda candidate: candidate.started_at)
+        request.preempted = True
+        queue.preempted += 1
+        request.task.cancel()
+        logger.info("Preempted a background LLM request for a live turn")
+    
+    async def _run(self, queue: _Queue, request: _Request) -> None:
+        """
+        Perform a request and resolve its future.
+        
+        Args:
+            queue: Queue the request came from
+            request: The dispatched request
+        """
+        release = True
+        try:
+            if request.preemptible:
+                result = await request.func(*request.args, **request.kwargs)
+            else:
+                work = asyncio.ensure_future(request.func(*request.args, **request.kwargs))
+                try:
+                    result = await asyncio.shield(work)
+                except asyncio.CancelledError:
+                    if not work.done():
+                        # The worker thread keeps the backend busy; hold the
+                        # slot until it has finished
+                        release = False
+                        work.add_done_callback(lambda done: self._release_abandoned(queue, request, done))
+                    raise
+            queue.completed += 1
+            if not request.future.done():
+                request.future.set_result(result)
+        except asyncio.CancelledError:
+            if request.preempted and not request.future.done():
+                # Run again once live turns leave room, ahead of newer background work
+                request.preempted = False
+                request.queued_at = time.monotonic()
+                queue.pending.appendleft(request)
+            elif not request.future.done():
+                request.future.cancel()
+        except Exception as e:
+            queue.failed += 1
+            logger.error(f"Error in dispatched LLM request: {str(e)}", exc_info=True)
+            if not request.future.done():
+                request.future.set_exception(e)
+        finally:
+            if release:
+                self._release(queue, request)
+    
+    def _release(self, queue: _Queue, request: _Request) -> None:
+        """
+        Free a request's slot and hand it to the next waiting request.
+        
+        Args:
+            queue: Queue the request came from
+            request: The finished request
+        """
+        queue.running.remove(request)
+        self.in_flight -= 1
+        # A freed slot goes to the highest-priority waiting request
+        self._dispatch()
+    
+    def _release_abandoned(self, queue: _Queue, request: _Request, work: asyncio.Future) -> None:
+        """
+        Free the slot of a cancelled blocking request once its thread has finished.
+        
+        Args:
+            queue: Queue the request came from
+            request: The cancelled request
+            work: The request's finished work
+        """
+        if not work.cancelled() and work.exception() is not None:
+            logger.debug(f"Cancelled LLM request failed: {str(work.exception())}")
+        self._release(queue, request)
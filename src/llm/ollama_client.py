@@ -6,23 +6,92 @@ import os
 import logging
 import json
 import yaml
-import requests
 import time
-from typing import Dict, List, Optional, Any, Union, Tuple
+import asyncio
+import threading
+import importlib.util
+from typing import Dict, List, Optional, Any, Union, Tuple, AsyncIterator, Iterator
+import httpx
+
+from src.performance_config import get_performance_config
+from src.llm.response_cache import ResponseCache
+from src.llm.prompt_session import PromptSession
 
 logger = logging.getLogger(__name__)
 
+# Speaker labels used when messages are sent as a single /generate prompt
+PROMPT_LABELS = {
+    'system': "Note",
+    'user': "Caller",
+    'assistant': "Assistant"
+}
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Stream chunks are parsed with orjson when it is installed
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+if ORJSON_AVAILABLE:
+    import orjson
+    _json_loads = orjson.loads
+else:
+    _json_loads = json.loads
+
+# Timing fields of Ollama's final stream chunk (durations in nanoseconds)
+STREAM_STATS_FIELDS = (
+    'total_duration',
+    'load_duration',
+    'prompt_eval_count',
+    'prompt_eval_duration',
+    'eval_count',
+    'eval_duration'
+)
+
+class StreamEvent:
+    """
+    One event of a streamed generation.
+    
+    A stream yields DELTA events with the text generated since the previous
+    event and ends with either DONE, carrying the full response and Ollama's
+    timing statistics, or ERROR, carrying the error message. A cancelled
+    stream just ends.
+    """
+    
+    DELTA = "delta"
+    DONE = "done"
+    ERROR = "error"
+    
+    __slots__ = ('type', 'text', 'stats')
+    
+    def __init__(self, type: str, text: str = "", stats: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the event.
+        
+        Args:
+            type: DELTA, DONE or ERROR
+            text: Text delta, full response or error message
+            stats: Timing statistics of a DONE event
+        """
+        self.type = type
+        self.text = text
+        self.stats = stats or {}
+    
+    def __repr__(self) -> str:
+        return f"StreamEvent({self.type!r}, {self.text!r})"
+
+
 class OllamaClient:
     """
     Client for interacting with Ollama LLM API.
     """
     
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, environment: str = "development"):
         """
         Initialize the Ollama client with configuration.
         
         Args:
             config_path: Path to the configuration file
+            environment: Environment whose performance configuration is used
         """
         self.config_path = config_path or os.path.join(
             os.path.dirname(__file__), 
@@ -32,14 +101,48 @@ class OllamaClient:
         # Default settings
         self.api_url = "http://localhost:11434/api"
         self.model = "mistral"
+        # Dedicated model for embeddings (semantic cache); chat models make poor embedders
+        self.embedding_model = "nomic-embed-text"
         self.temperature = 0.7
         self.system_prompt = "You are an AI assistant for a call answering service. Your job is to professionally greet callers, understand their requests, and take appropriate actions."
         self.max_tokens = 500
         self.timeout = 15
+        # How long Ollama keeps the model (and its prompt cache) loaded after a request
+        self.keep_alive: Optional[str] = None
+        
+        # Connection pool settings
+        self.max_connections = 20
+        self.max_keepalive_connections = 10
+        self.keepalive_expiry = 30.0
+        self.http2 = True
+        
+        # Model availability cache settings
+        self.availability_ttl = 300.0
+        self.availability_refresh = True
         
         # Load configuration
         self._load_config()
         
+        # Shared keep-alive clients, created on first use
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Cached model availability, kept fresh by a background refresher
+        self._model_available = False
+        self._availability_checked_at = 0.0
+        self._availability_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+        
+        # Cache of responses to deterministic (low-temperature) requests
+        perf_config = get_performance_config(environment)
+        self.cache_max_temperature = perf_config.llm.cache_max_temperature
+        self.response_cache: Optional[ResponseCache] = None
+        if perf_config.llm.cache_enabled:
+            self.response_cache = ResponseCache.from_config(perf_config.llm, perf_config.cache)
+        
         logger.info(f"Ollama client initialized with model: {self.model}")
     
     def _load_config(self) -> None:
@@ -56,6 +159,9 @@ class OllamaClient:
                 if 'model' in llm_config:
                     self.model = llm_config['model']
                 
+                if 'embedding_model' in llm_config:
+                    self.embedding_model = llm_config['embedding_model']
+                
                 if 'temperature' in llm_config:
                     self.temperature = float(llm_config['temperature'])
                 
@@ -71,10 +177,448 @@ class OllamaClient:
                 if 'api_url' in llm_config:
                     self.api_url = llm_config['api_url']
                 
+                if 'keep_alive' in llm_config:
+                    self.keep_alive = llm_config['keep_alive']
+                
+                if 'http' in llm_config:
+                    http_config = llm_config['http'] or {}
+                    
+                    if 'max_connections' in http_config:
+                        self.max_connections = int(http_config['max_connections'])
+                    
+                    if 'max_keepalive_connections' in http_config:
+                        self.max_keepalive_connections = int(http_config['max_keepalive_connections'])
+                    
+                    if 'keepalive_expiry' in http_config:
+                        self.keepalive_expiry = float(http_config['keepalive_expiry'])
+                    
+                    if 'http2' in http_config:
+                        self.http2 = bool(http_config['http2'])
+                
+                if 'availability_ttl' in llm_config:
+                    self.availability_ttl = float(llm_config['availability_ttl'])
+                
+                if 'availability_refresh' in llm_config:
+                    self.availability_refresh = bool(llm_config['availability_refresh'])
+                
             logger.info(f"Loaded LLM configuration from {self.config_path}")
         except Exception as e:
             logger.error(f"Error loading configuration: {str(e)}", exc_info=True)
     
+    def _client_options(self) -> Dict[str, Any]:
+        """
+        Build the options shared by the sync and async HTTP clients.
+        
+        Returns:
+            Keyword arguments for httpx.Client / httpx.AsyncClient
+        """
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            # Negotiated via ALPN, so only used when Ollama sits behind TLS
+            "http2": self.http2 and HTTP2_AVAILABLE,
+            "timeout": self.timeout
+        }
+    
+    def _get_client(self) -> httpx.Client:
+        """
+        Get the shared keep-alive HTTP client.
+        
+        Returns:
+            The pooled synchronous client
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options())
+        return self._client
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared keep-alive async HTTP client for the running event loop.
+        
+        Returns:
+            The pooled asynchronous client
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            if self._async_client is not None:
+                self._discard_async_client(self._async_client, self._async_client_loop)
+            self._async_client = httpx.AsyncClient(**self._client_options())
+            self._async_client_loop = loop
+        return self._async_client
+    
+    def _discard_async_client(self, client: httpx.AsyncClient,
+                              loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """
+        Close an async client that belonged to a different event loop.
+        
+        Args:
+            client: The client to close
+            loop: The event loop the client was created on
+        """
+        if loop is not None and loop.is_running():
+            # Its connections must be closed on their own loop
+            asyncio.run_coroutine_threadsafe(self._aclose_client(client), loop)
+        else:
+            asyncio.ensure_future(self._aclose_client(client))
+    
+    async def _aclose_client(self, client: httpx.AsyncClient) -> None:
+        """
+        Close an async client, ignoring connections whose event loop is gone.
+        
+        Args:
+            client: The client to close
+        """
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.debug(f"Error closing async HTTP client: {str(e)}")
+    
+    def close(self) -> None:
+        """
+        Stop the availability refresher and close the pooled synchronous connections.
+        """
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=1)
+            self._refresh_thread = None
+        
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+    
+    async def aclose(self) -> None:
+        """
+        Close the pooled connections of both clients.
+        """
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
+        self.close()
+    
+    def _build_chat_request(self, messages: List[Dict[str, str]],
+                            options: Optional[Dict[str, Any]] = None,
+                            stream: bool = False) -> Dict[str, Any]:
+        """
+        Build the body of a /chat request.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            options: Additional options for the generation
+            stream: Whether to request a streamed response
+            
+        Returns:
+            Request body
+        """
+        # Parse messages to ensure they have the correct format
+        formatted_messages = []
+        
+        # Always start with system message if not already included
+        has_system = any(msg.get('role') == 'system' for msg in messages)
+        if not has_system and self.system_prompt:
+            formatted_messages.append({
+                "role": "system",
+                "content": self.system_prompt
+            })
+        
+        # Add the rest of the messages
+        for msg in messages:
+            role = msg.get('role', '').lower()
+            content = msg.get('content', '')
+            
+            if role in ['system', 'user', 'assistant'] and content:
+                formatted_messages.append({
+                    "role": role,
+                    "content": content
+                })
+        
+        # Default options
+        request_options = {
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "num_predict": self.max_tokens
+        }
+        
+        # Update with any user-provided options
+        if options:
+            request_options.update(options)
+        
+        request_data = {
+            "model": self.model,
+            "messages": formatted_messages,
+            "options": request_options,
+            "stream": stream
+        }
+        if self.keep_alive is not None:
+            request_data["keep_alive"] = self.keep_alive
+        
+        return request_data
+    
+    def _build_session_request(self, messages: List[Dict[str, str]],
+                               session: PromptSession,
+                               options: Optional[Dict[str, Any]] = None,
+                               stream: bool = False) -> Dict[str, Any]:
+        """
+        Build the body of a /generate request continuing a conversation's prefix.
+        
+        Args:
+            messages: The full conversation
+            session: Prefix state of the conversation
+            options: Additional options for the generation
+            stream: Whether to request a streamed response
+            
+        Returns:
+            Request body; only the messages added since the session's last
+            reply are included when its cached context is still valid
+        """
+        chat_request = self._build_chat_request(messages, options, stream)
+        formatted_messages = chat_request.pop("messages")
+        
+        pending, tokens = session.prepare(messages)
+        if tokens is None:
+            # Full prompt: the leading system messages become the system
+            # prompt; later ones (rolling summary, action results) stay in
+            # the transcript where they were added
+            leading = 0
+            while leading < len(formatted_messages) and formatted_messages[leading]['role'] == 'system':
+                leading += 1
+            if leading:
+                chat_request["system"] = "\n\n".join(msg['content'] for msg in formatted_messages[:leading])
+            chat_request["prompt"] = self._render_prompt(formatted_messages[leading:])
+        else:
+            chat_request["context"] = tokens
+            chat_request["prompt"] = self._render_prompt(
+                [msg for msg in pending if msg.get('role') in PROMPT_LABELS and msg.get('content')]
+            )
+        
+        return chat_request
+    
+    def _render_prompt(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Render messages as a single /generate prompt.
+        
+        Args:
+            messages: Messages with 'role' and 'content' keys
+            
+        Returns:
+            The caller's words for a single user message, otherwise a
+            transcript with one labelled line per message
+        """
+        if len(messages) == 1 and messages[0]['role'] == 'user':
+            return messages[0]['content']
+        return "\n".join(f"{PROMPT_LABELS[msg['role']]}: {msg['content']}" for msg in messages)
+    
+    def _response_text(self, result: Dict[str, Any]) -> str:
+        """
+        Get the generated text of a /chat or /generate response (or chunk).
+        
+        Args:
+            result: Parsed response body
+            
+        Returns:
+            The generated text
+        """
+        if 'response' in result:
+            return result['response']
+        return result.get('message', {}).get('content', '')
+    
+    def _build_request(self, messages: List[Dict[str, str]],
+                       options: Optional[Dict[str, Any]] = None,
+                       session: Optional[PromptSession] = None,
+                       stream: bool = False) -> Tuple[Dict[str, Any], str, Optional[str]]:
+        """
+        Build a generation request.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            options: Additional options for the generation
+            session: Prefix state of the conversation, if prefix reuse is used
+            stream: Whether to request a streamed response
+            
+        Returns:
+            Tuple of the request body, the API endpoint and the response cache
+            key (None if the response should not be cached)
+        """
+        if session is not None:
+            return self._build_session_request(messages, session, options, stream), "generate", None
+        
+        request_data = self._build_chat_request(messages, options, stream)
+        return request_data, "chat", self._cache_key(request_data)
+    
+    def _parse_chunk(self, line: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse one line of a streamed response.
+        
+        Args:
+            line: The JSON line
+            
+        Returns:
+            The parsed chunk, or None if the line is not valid JSON
+        """
+        try:
+            return _json_loads(line)
+        except ValueError:
+            # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
+            logger.warning(f"Failed to parse chunk: {line}")
+            return None
+    
+    def _stream_stats(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the timing statistics of the final stream chunk.
+        
+        Args:
+            chunk: The chunk with the done flag
+            
+        Returns:
+            Ollama's counts and durations, plus the generation speed in
+            tokens per second when available
+        """
+        stats = {field: chunk[field] for field in STREAM_STATS_FIELDS if field in chunk}
+        if stats.get('eval_count') and stats.get('eval_duration'):
+            stats['tokens_per_second'] = stats['eval_count'] / (stats['eval_duration'] / 1e9)
+        return stats
+    
+    def _cache_key(self, request_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the response cache key of a chat request.
+        
+        Args:
+            request_data: Body of the /chat request
+            
+        Returns:
+            The cache key, or None if the request should not be cached
+        """
+        if self.response_cache is None:
+            return None
+        
+        options = request_data.get('options', {})
+        # Sampled responses vary on purpose; only repeatable ones are reused
+        if float(options.get('temperature', self.temperature)) > self.cache_max_temperature:
+            return None
+        
+        return ResponseCache.make_key(request_data['model'], request_data['messages'], options)
+    
+    async def _acache_get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response without blocking the event loop on Redis.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            The cached response, or None on a miss
+        """
+        if self.response_cache.redis is None:
+            return self.response_cache.get(key)
+        return await asyncio.to_thread(self.response_cache.get, key)
+    
+    async def _acache_set(self, key: str, value: str) -> None:
+        """
+        Cache a response without blocking the event loop on Redis.
+        
+        Args:
+            key: Cache key
+            value: Generated response
+        """
+        if self.response_cache.redis is None:
+            self.response_cache.set(key, value)
+        else:
+            await asyncio.to_thread(self.response_cache.set, key, value)
+    
+    def _model_known_available(self) -> bool:
+        """
+        Check the cached model availability without contacting Ollama.
+        
+        Returns:
+            True if the model was seen within the availability TTL
+        """
+        return (
+            self._model_available and
+            time.monotonic() - self._availability_checked_at < self.availability_ttl
+        )
+    
+    def _set_model_available(self, available: bool) -> None:
+        """
+        Record the result of an availability check.
+        
+        Args:
+            available: Whether the model is available
+        """
+        self._model_available = available
+        self._availability_checked_at = time.monotonic()
+        
+        if available:
+            self._start_availability_refresher()
+    
+    def invalidate_model_availability(self) -> None:
+        """
+        Forget the cached availability so the next request re-checks the model.
+        """
+        self._model_available = False
+        self._availability_checked_at = 0.0
+    
+    def _is_model_not_found(self, status_code: int) -> bool:
+        """
+        Invalidate the availability cache if a chat request hit a missing model.
+        
+        Ollama answers 404 ("model not found") for a model that is not loaded.
+        
+        Args:
+            status_code: HTTP status of the chat response
+        
+        Returns:
+            True if the model was not found
+        """
+        if status_code != 404:
+            return False
+        
+        logger.warning(f"Model {self.model} not found by Ollama, invalidating availability cache")
+        self.invalidate_model_availability()
+        return True
+    
+    def _start_availability_refresher(self) -> None:
+        """
+        Start the background thread that keeps the availability cache fresh.
+        """
+        if not self.availability_refresh or self.availability_ttl <= 0:
+            return
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_availability,
+            name="ollama-availability",
+            daemon=True
+        )
+        self._refresh_thread.start()
+    
+    def _refresh_availability(self) -> None:
+        """
+        Re-check model availability every half TTL until stopped.
+        
+        Refreshing before the TTL runs out keeps requests from ever waiting on
+        the check; a model that disappears is noticed within one interval.
+        """
+        interval = self.availability_ttl / 2
+        while not self._refresh_stop.wait(interval):
+            available = self._check_model_availability()
+            if self._refresh_stop.is_set():
+                break
+            
+            self._set_model_available(available)
+            if not available:
+                logger.warning(f"Model {self.model} is no longer available in Ollama")
+                break
+        
+        self._refresh_thread = None
+    
     def _check_model_availability(self) -> bool:
         """
         Check if the specified model is available in Ollama.
@@ -83,7 +627,7 @@ class OllamaClient:
             True if the model is available, False otherwise
         """
         try:
-            response = requests.get(
+            response = self._get_client().get(
                 f"{self.api_url}/tags",
                 timeout=5
             )
@@ -107,14 +651,31 @@ class OllamaClient:
             True if the model is available (either already or after pulling),
             False if the model couldn't be pulled
         """
-        if self._check_model_availability():
+        # Hot path: no request while the cached availability is fresh
+        if self._model_known_available():
             return True
         
+        # Serialise checks so concurrent callers don't all query (or pull) at once
+        with self._availability_lock:
+            if self._model_known_available():
+                return True
+            
+            available = self._check_model_availability() or self._pull_model()
+            self._set_model_available(available)
+            return available
+    
+    def _pull_model(self) -> bool:
+        """
+        Pull the model into Ollama.
+        
+        Returns:
+            True if the model was pulled, False otherwise
+        """
         logger.info(f"Model {self.model} not found locally, attempting to pull")
         
         try:
             # Pull the model
-            response = requests.post(
+            response = self._get_client().post(
                 f"{self.api_url}/pull",
                 json={"name": self.model},
                 timeout=600  # Longer timeout for model pulling
@@ -132,82 +693,71 @@ class OllamaClient:
             return False
     
     def generate_response(self, messages: List[Dict[str, str]], 
-                         options: Optional[Dict[str, Any]] = None) -> Optional[str]:
+                         options: Optional[Dict[str, Any]] = None,
+                         session: Optional[PromptSession] = None) -> Optional[str]:
         """
         Generate a response using the Ollama API.
         
         Args:
             messages: List of message dictionaries with 'role' and 'content' keys
             options: Additional options for the generation
+            session: Prefix state of the conversation; when given, only the
+                new messages are sent while the cached prefix is valid
             
         Returns:
             Generated response text or None if generation failed
         """
         try:
+            # Prepare the request
+            request_data, endpoint, cache_key = self._build_request(messages, options, session)
+            
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Serving cached response of {len(cached)} characters")
+                    return cached
+            
             # Ensure model is available
             if not self._pull_model_if_needed():
                 logger.error(f"Model {self.model} is not available")
                 return None
             
-            # Parse messages to ensure they have the correct format
-            formatted_messages = []
-            
-            # Always start with system message if not already included
-            has_system = any(msg.get('role') == 'system' for msg in messages)
-            if not has_system and self.system_prompt:
-                formatted_messages.append({
-                    "role": "system",
-                    "content": self.system_prompt
-                })
-            
-            # Add the rest of the messages
-            for msg in messages:
-                role = msg.get('role', '').lower()
-                content = msg.get('content', '')
-                
-                if role in ['system', 'user', 'assistant'] and content:
-                    formatted_messages.append({
-                        "role": role,
-                        "content": content
-                    })
-            
-            # Default options
-            request_options = {
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens,
-                "num_predict": self.max_tokens
-            }
-            
-            # Update with any user-provided options
-            if options:
-                request_options.update(options)
-            
-            # Prepare the request
-            request_data = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "options": request_options,
-                "stream": False
-            }
-            
             # Make the request
-            response = requests.post(
-                f"{self.api_url}/chat",
+            response = self._get_client().post(
+                f"{self.api_url}/{endpoint}",
                 json=request_data,
                 timeout=self.timeout
             )
             
+            if self._is_model_not_found(response.status_code):
+                # Unloaded since it was cached: re-check (or pull) and retry once
+                if not self._pull_model_if_needed():
+                    logger.error(f"Model {self.model} is not available")
+                    return None
+                
+                response = self._get_client().post(
+                    f"{self.api_url}/{endpoint}",
+                    json=request_data,
+                    timeout=self.timeout
+                )
+            
             if response.status_code == 200:
                 result = response.json()
-                generated_text = result.get('message', {}).get('content', '')
+                generated_text = self._response_text(result)
                 
                 if generated_text:
                     logger.info(f"Generated response of {len(generated_text)} characters")
+                    if cache_key is not None:
+                        self.response_cache.set(cache_key, generated_text)
+                    if session is not None:
+                        session.update(messages, generated_text, result.get('context'))
                     return generated_text
                 else:
                     logger.warning("Empty response from Ollama API")
                     return None
             else:
+                if session is not None:
+                    session.invalidate()
                 logger.error(f"API request failed: {response.status_code} - {response.text}")
                 return None
                 
@@ -215,103 +765,132 @@ class OllamaClient:
             logger.error(f"Error generating response: {str(e)}", exc_info=True)
             return None
     
-    def stream_response(self, messages: List[Dict[str, str]], 
-                       callback: callable,
-                       options: Optional[Dict[str, Any]] = None) -> bool:
+    def iter_stream(self, messages: List[Dict[str, str]],
+                    options: Optional[Dict[str, Any]] = None,
+                    cancel_event: Optional[threading.Event] = None,
+                    session: Optional[PromptSession] = None) -> Iterator[StreamEvent]:
         """
-        Stream a response from the Ollama API with a callback for each chunk.
+        Stream a response from the Ollama API as typed events.
+        
+        Closing the generator early closes the stream, which stops generation.
         
         Args:
             messages: List of message dictionaries with 'role' and 'content' keys
-            callback: Callback function that receives each text chunk
             options: Additional options for the generation
+            cancel_event: When set, stop reading and close the stream so the
+                server stops generating
+            session: Prefix state of the conversation; when given, only the
+                new messages are sent while the cached prefix is valid
             
-        Returns:
-            True if streaming completed successfully, False otherwise
+        Yields:
+            DELTA events as text is generated, then a DONE or ERROR event
         """
         try:
+            request_data, endpoint, cache_key = self._build_request(messages, options, session, stream=True)
+            
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Serving cached response of {len(cached)} characters")
+                    yield StreamEvent(StreamEvent.DELTA, cached)
+                    yield StreamEvent(StreamEvent.DONE, cached, {'cached': True})
+                    return
+            
             # Ensure model is available
             if not self._pull_model_if_needed():
                 logger.error(f"Model {self.model} is not available")
-                return False
-            
-            # Parse messages (same as in generate_response)
-            formatted_messages = []
-            
-            has_system = any(msg.get('role') == 'system' for msg in messages)
-            if not has_system and self.system_prompt:
-                formatted_messages.append({
-                    "role": "system",
-                    "content": self.system_prompt
-                })
-            
-            for msg in messages:
-                role = msg.get('role', '').lower()
-                content = msg.get('content', '')
-                
-                if role in ['system', 'user', 'assistant'] and content:
-                    formatted_messages.append({
-                        "role": role,
-                        "content": content
-                    })
-            
-            # Default options
-            request_options = {
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens,
-                "num_predict": self.max_tokens
-            }
-            
-            # Update with any user-provided options
-            if options:
-                request_options.update(options)
-            
-            # Prepare the request
-            request_data = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "options": request_options,
-                "stream": True
-            }
+                yield StreamEvent(StreamEvent.ERROR, f"Model {self.model} is not available")
+                return
             
             # Make the streaming request
-            with requests.post(
-                f"{self.api_url}/chat",
+            with self._get_client().stream(
+                "POST",
+                f"{self.api_url}/{endpoint}",
                 json=request_data,
-                timeout=self.timeout,
-                stream=True
+                timeout=self.timeout
             ) as response:
                 if response.status_code != 200:
+                    response.read()
+                    self._is_model_not_found(response.status_code)
+                    if session is not None:
+                        session.invalidate()
                     logger.error(f"API request failed: {response.status_code} - {response.text}")
-                    return False
+                    yield StreamEvent(StreamEvent.ERROR, f"API request failed: {response.status_code}")
+                    return
                 
-                full_response = ""
+                # Joined once at the end; repeated concatenation is quadratic
+                chunks = []
                 
-                # Process each chunk in the stream
                 for line in response.iter_lines():
-                    if line:
-                        try:
-                            chunk = json.loads(line.decode('utf-8'))
-                            chunk_text = chunk.get('message', {}).get('content', '')
-                            
-                            if chunk_text:
-                                full_response += chunk_text
-                                callback(chunk_text)
-                            
-                            # Check for done flag
-                            if chunk.get('done', False):
-                                logger.info(f"Streaming complete, total length: {len(full_response)}")
-                                break
-                                
-                        except json.JSONDecodeError:
-                            logger.warning(f"Failed to parse chunk: {line}")
-                            continue
+                    if cancel_event is not None and cancel_event.is_set():
+                        logger.info(f"Streaming cancelled after {len(chunks)} chunks")
+                        return
+                    
+                    if not line:
+                        continue
+                    
+                    chunk = self._parse_chunk(line)
+                    if chunk is None:
+                        continue
+                    
+                    chunk_text = self._response_text(chunk)
+                    if chunk_text:
+                        chunks.append(chunk_text)
+                        yield StreamEvent(StreamEvent.DELTA, chunk_text)
+                    
+                    if chunk.get('done', False):
+                        full_response = "".join(chunks)
+                        logger.info(f"Streaming complete, total length: {len(full_response)}")
+                        if cache_key is not None and full_response:
+                            self.response_cache.set(cache_key, full_response)
+                        if session is not None:
+                            session.update(messages, full_response, chunk.get('context'))
+                        yield StreamEvent(StreamEvent.DONE, full_response, self._stream_stats(chunk))
+                        return
                 
-                return True
+                logger.warning("Stream ended before the response was complete")
+                yield StreamEvent(StreamEvent.ERROR, "Stream ended before the response was complete")
                 
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}", exc_info=True)
+            yield StreamEvent(StreamEvent.ERROR, str(e))
+    
+    def stream_response(self, messages: List[Dict[str, str]], 
+                       callback: callable,
+                       options: Optional[Dict[str, Any]] = None,
+                       cancel_event: Optional[threading.Event] = None,
+                       session: Optional[PromptSession] = None) -> bool:
+        """
+        Stream a response from the Ollama API with a callback for each chunk.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            callback: Callback function that receives each text chunk
+            options: Additional options for the generation
+            cancel_event: When set, stop reading and close the stream so the
+                server stops generating
+            session: Prefix state of the conversation; when given, only the
+                new messages are sent while the cached prefix is valid
+            
+        Returns:
+            True if streaming completed successfully, False otherwise
+        """
+        events = self.iter_stream(messages, options, cancel_event=cancel_event, session=session)
+        try:
+            for event in events:
+                if event.type == StreamEvent.DELTA:
+                    callback(event.text)
+                else:
+                    return event.type == StreamEvent.DONE
+            
+            # Cancelled
+            return False
+            
         except Exception as e:
             logger.error(f"Error streaming response: {str(e)}", exc_info=True)
             return False
+        finally:
+            events.close()
     
     def embed_text(self, text: str) -> Optional[List[float]]:
         """
@@ -325,10 +904,10 @@ class OllamaClient:
         """
         try:
             # Embeddings endpoint
-            response = requests.post(
+            response = self._get_client().post(
                 f"{self.api_url}/embeddings",
                 json={
-                    "model": self.model,
+                    "model": self.embedding_model,
                     "prompt": text
                 },
                 timeout=10
@@ -355,7 +934,7 @@ class OllamaClient:
             List of available models and their metadata
         """
         try:
-            response = requests.get(
+            response = self._get_client().get(
                 f"{self.api_url}/tags",
                 timeout=5
             )
@@ -368,4 +947,278 @@ class OllamaClient:
                 
         except Exception as e:
             logger.error(f"Error getting available models: {str(e)}", exc_info=True)
-            return []
\ No newline at end of file
+            return []
+    
+    async def _acheck_model_availability(self) -> bool:
+        """
+        Check if the specified model is available in Ollama (async).
+        
+        Returns:
+            True if the model is available, False otherwise
+        """
+        try:
+            response = await self._get_async_client().get(
+                f"{self.api_url}/tags",
+                timeout=5
+            )
+            
+            if response.status_code == 200:
+                models = response.json().get('models', [])
+                return any(model['name'] == self.model for model in models)
+            else:
+                logger.warning(f"Failed to get models from Ollama: {response.status_code}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"Error checking model availability: {str(e)}", exc_info=True)
+            return False
+    
+    async def _apull_model_if_needed(self) -> bool:
+        """
+        Pull the model if it's not available locally (async).
+        
+        Returns:
+            True if the model is available (either already or after pulling),
+            False if the model couldn't be pulled
+        """
+        if self._model_known_available():
+            return True
+        
+        available = await self._acheck_model_availability() or await self._apull_model()
+        self._set_model_available(available)
+        return available
+    
+    async def _apull_model(self) -> bool:
+        """
+        Pull the model into Ollama (async).
+        
+        Returns:
+            True if the model was pulled, False otherwise
+        """
+        logger.info(f"Model {self.model} not found locally, attempting to pull")
+        
+        try:
+            response = await self._get_async_client().post(
+                f"{self.api_url}/pull",
+                json={"name": self.model},
+                timeout=600  # Longer timeout for model pulling
+            )
+            
+            if response.status_code == 200:
+                logger.info(f"Successfully pulled model {self.model}")
+                return True
+            else:
+                logger.error(f"Failed to pull model {self.model}: {response.status_code} - {response.text}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"Error pulling model: {str(e)}", exc_info=True)
+            return False
+    
+    async def agenerate_response(self, messages: List[Dict[str, str]],
+                                 options: Optional[Dict[str, Any]] = None,
+                                 session: Optional[PromptSession] = None) -> Optional[str]:
+        """
+        Generate a response using the Ollama API without blocking the event loop.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            options: Additional options for the generation
+            session: Prefix state of the conversation; when given, only the
+                new messages are sent while the cached prefix is valid
+            
+        Returns:
+            Generated response text or None if generation failed
+        """
+        try:
+            request_data, endpoint, cache_key = self._build_request(messages, options, session)
+            
+            if cache_key is not None:
+                cached = await self._acache_get(cache_key)
+                if cached is not None:
+                    logger.info(f"Serving cached response of {len(cached)} characters")
+                    return cached
+            
+            # Ensure model is available
+            if not await self._apull_model_if_needed():
+                logger.error(f"Model {self.model} is not available")
+                return None
+            
+            response = await self._get_async_client().post(
+                f"{self.api_url}/{endpoint}",
+                json=request_data,
+                timeout=self.timeout
+            )
+            
+            if self._is_model_not_found(response.status_code):
+                # Unloaded since it was cached: re-check (or pull) and retry once
+                if not await self._apull_model_if_needed():
+                    logger.error(f"Model {self.model} is not available")
+                    return None
+                
+                response = await self._get_async_client().post(
+                    f"{self.api_url}/{endpoint}",
+                    json=request_data,
+                    timeout=self.timeout
+                )
+            
+            if response.status_code == 200:
+                result = response.json()
+                generated_text = self._response_text(result)
+                
+                if generated_text:
+                    logger.info(f"Generated response of {len(generated_text)} characters")
+                    if cache_key is not None:
+                        await self._acache_set(cache_key, generated_text)
+                    if session is not None:
+                        session.update(messages, generated_text, result.get('context'))
+                    return generated_text
+                else:
+                    logger.warning("Empty response from Ollama API")
+                    return None
+            else:
+                if session is not None:
+                    session.invalidate()
+                logger.error(f"API request failed: {response.status_code} - {response.text}")
+                return None
+                
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}", exc_info=True)
+            return None
+    
+    async def aiter_stream(self, messages: List[Dict[str, str]],
+                           options: Optional[Dict[str, Any]] = None,
+                           session: Optional[PromptSession] = None) -> AsyncIterator[StreamEvent]:
+        """
+        Stream a response from the Ollama API as typed events without blocking the event loop.
+        
+        Closing the iterator early closes the stream, which stops generation.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            options: Additional options for the generation
+            session: Prefix state of the conversation; when given, only the
+                new messages are sent while the cached prefix is valid
+            
+        Yields:
+            DELTA events as text is generated, then a DONE or ERROR event
+        """
+        try:
+            request_data, endpoint, cache_key = self._build_request(messages, options, session, stream=True)
+            
+            if cache_key is not None:
+                cached = await self._acache_get(cache_key)
+                if cached is not None:
+                    logger.info(f"Serving cached response of {len(cached)} characters")
+                    yield StreamEvent(StreamEvent.DELTA, cached)
+                    yield StreamEvent(StreamEvent.DONE, cached, {'cached': True})
+                    return
+            
+            # Ensure model is available
+            if not await self._apull_model_if_needed():
+                logger.error(f"Model {self.model} is not available")
+                yield StreamEvent(StreamEvent.ERROR, f"Model {self.model} is not available")
+                return
+            
+            async with self._get_async_client().stream(
+                "POST",
+                f"{self.api_url}/{endpoint}",
+                json=request_data,
+                timeout=self.timeout
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    self._is_model_not_found(response.status_code)
+                    if session is not None:
+                        session.invalidate()
+                    logger.error(f"API request failed: {response.status_code} - {response.text}")
+                    yield StreamEvent(StreamEvent.ERROR, f"API request failed: {response.status_code}")
+                    return
+                
+                chunks = []
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    
+                    chunk = self._parse_chunk(line)
+                    if chunk is None:
+                        continue
+                    
+                    chunk_text = self._response_text(chunk)
+                    if chunk_text:
+                        chunks.append(chunk_text)
+                        yield StreamEvent(StreamEvent.DELTA, chunk_text)
+                    
+                    if chunk.get('done', False):
+                        full_response = "".join(chunks)
+                        logger.info(f"Streaming complete, total length: {len(full_response)}")
+                        if cache_key is not None and full_response:
+                            await self._acache_set(cache_key, full_response)
+                        if session is not None:
+                            session.update(messages, full_response, chunk.get('context'))
+                        yield StreamEvent(StreamEvent.DONE, full_response, self._stream_stats(chunk))
+                        return
+                
+                logger.warning("Stream ended before the response was complete")
+                yield StreamEvent(StreamEvent.ERROR, "Stream ended before the response was complete")
+                
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}", exc_info=True)
+            yield StreamEvent(StreamEvent.ERROR, str(e))
+    
+    async def astream_response(self, messages: List[Dict[str, str]],
+                               options: Optional[Dict[str, Any]] = None,
+                               session: Optional[PromptSession] = None) -> AsyncIterator[str]:
+        """
+        Stream a response from the Ollama API as an async iterator of text chunks.
+        
+        Closing the iterator early closes the stream, which stops generation.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            options: Additional options for the generation
+            session: Prefix state of the conversation; when given, only the
+                new messages are sent while the cached prefix is valid
+            
+        Yields:
+            Text chunks as they are generated
+        """
+        events = self.aiter_stream(messages, options, session=session)
+        try:
+            async for event in events:
+                if event.type == StreamEvent.DELTA:
+                    yield event.text
+        finally:
+            await events.aclose()
+    
+    async def aembed_text(self, text: str) -> Optional[List[float]]:
+        """
+        Generate embeddings for the given text using Ollama (async).
+        
+        Args:
+            text: The text to embed
+            
+        Returns:
+            List of embedding values or None if embedding failed
+        """
+        try:
+            response = await self._get_async_client().post(
+                f"{self.api_url}/embeddings",
+                json={
+                    "model": self.embedding_model,
+                    "prompt": text
+                },
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                embeddings = response.json().get('embedding', [])
+                logger.info(f"Generated embeddings with dimension {len(embeddings)}")
+                return embeddings
+            else:
+                logger.error(f"Embedding request failed: {response.status_code} - {response.text}")
+                return None
+                
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {str(e)}", exc_info=True)
+            return None
@@ -0,0 +1,130 @@
+"""
+Prompt prefix reuse for a single conversation.
+Tracks the context tokens Ollama returns for a call, so each turn only
+sends the messages added since the previous one instead of having the
+server re-process the system prompt and the whole history.
+"""
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+
+from src.llm.context import ConversationContext
+
+logger = logging.getLogger(__name__)
+
+class PromptSession:
+    """
+    Prefix state of one conversation on the Ollama server.
+    
+    After each generation Ollama returns the token context of the prompt
+    plus its reply. While the conversation only grows by new messages after
+    that reply, the next request sends the context and the new messages;
+    the server continues from the cached tokens (kept loaded by keep_alive)
+    instead of prefilling the system prompt again. Any rewrite of earlier
+    messages (trimming, summarization, a shortened interrupted reply)
+    falls back to sending the full conversation once.
+    """
+    
+    def __init__(self, context: ConversationContext):
+        """
+        Initialize the session.
+        
+        Args:
+            context: The conversation whose prompts are sent
+        """
+        self.context = context
+        
+        self._tokens: Optional[List[int]] = None
+        self._revision = -1
+        # Revision of the conversation the pending generation was built from
+        self._prepared_revision = -1
+        # Number of messages covered by _tokens, including the last reply
+        self._consumed = 0
+        self._last_reply: Optional[str] = None
+        
+        # Statistics
+        self.reused = 0
+        self.prefilled = 0
+    
+    def prepare(self, messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[List[int]]]:
+        """
+        Work out what has to be sent for the next generation.
+        
+        Args:
+            messages: The full conversation, as returned by get_context()
+        
+        Returns:
+            Tuple of the messages to send and the context tokens to continue
+            from, or the full conversation and None if the prefix is stale
+        """
+        self._prepared_revision = self.context.revision
+        
+        if self._tokens is not None and self._is_prefix_of(messages):
+            self.reused += 1
+            return messages[self._consumed:], self._tokens
+        
+        if self._tokens is not None:
+            logger.info("Conversation prefix changed, sending the full prompt")
+        self.prefilled += 1
+        return messages, None
+    
+    def update(self, messages: List[Dict[str, Any]], reply: str, tokens: Optional[List[int]]) -> None:
+        """
+        Record the server state after a generation.
+        
+        The tokens are tagged with the revision seen by prepare(), so a
+        rewrite that lands while the reply is generating (e.g. a background
+        summary) still invalidates them.
+        
+        Args:
+            messages: The full conversation the reply was generated for
+            reply: The generated reply
+            tokens: Context tokens returned by the server, if any
+        """
+        if not tokens:
+            self.invalidate()
+            return
+        
+        self._tokens = list(tokens)
+        self._revision = self._prepared_revision
+        self._consumed = len(messages) + 1
+        self._last_reply = reply
+    
+    def invalidate(self) -> None:
+        """
+        Forget the server state; the next generation sends the full conversation.
+        """
+        self._tokens = None
+        self._revision = -1
+        self._consumed = 0
+        self._last_reply = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get session statistics.
+        
+        Returns:
+            Dictionary with the number of reused and full prompts
+        """
+        return {
+            'reused': self.reused,
+            'prefilled': self.prefilled
+        }
+    
+    def _is_prefix_of(self, messages: List[Dict[str, Any]]) -> bool:
+        """
+        Check that the conversation only grew since the last generation.
+        
+        Args:
+            messages: The full conversation
+        
+        Returns:
+            True if the cached tokens cover the start of messages and at
+            least one new message follows
+        """
+        if self.context.revision != self._revision or len(messages) <= self._consumed:
+            return False
+        
+        # The stored reply must be the one the server generated (an
+        # interrupted reply is stored shortened)
+        reply = messages[self._consumed - 1]
+        return reply.get('role') == 'assistant' and reply.get('content') == self._last_reply
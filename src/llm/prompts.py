@@ -4,8 +4,13 @@ Provides a collection of prompt templates for various call scenarios.
 """
 import os
 import logging
+import string
+import tempfile
+import threading
+import time
 import yaml
-from typing import Dict, Optional, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -150,9 +155,477 @@ Please greet the caller, verify their identity, and help with their support need
 """
 }
 
+# Variables every conversation provides to its system prompt
+PROMPT_VARIABLES = frozenset({
+    "business_name",
+    "caller_name",
+    "caller_number",
+    "call_id",
+    "conversation_id",
+    "start_time",
+    "context_type"
+})
+
+# Values used for conversation variables a call does not provide
+PROMPT_DEFAULTS = {
+    "business_name": "the business",
+    "caller_name": "the caller",
+    "caller_number": "unknown",
+    "call_id": "unknown"
+}
+
+# Variables whose value is the same for every call of a deployment; they are
+# filled in once per value, the others on every render
+STATIC_VARIABLES = frozenset({
+    "business_name",
+    "context_type"
+})
+
 # Cache for loaded prompts
 _prompt_cache = {}
 
+# Prompt stores by config path
+_prompt_stores: Dict[str, "PromptStore"] = {}
+_prompt_stores_lock = threading.Lock()
+
+# Compiled templates by template text, least recently used first
+_compiled_cache: "OrderedDict[str, PromptTemplate]" = OrderedDict()
+_compiled_cache_lock = threading.Lock()
+COMPILED_CACHE_SIZE = 64
+
+_formatter = string.Formatter()
+
+# Binding cache key of a variable that was not provided
+_MISSING = object()
+
+
+class PromptTemplate:
+    """
+    A prompt template parsed once into literal and placeholder segments.
+    
+    Rendering walks the segments and joins them in a single pass instead of
+    re-parsing the template with str.format. Placeholders whose variable is
+    missing are kept as written, so a partially known call still gets every
+    known value filled in. The static variables (STATIC_VARIABLES) are
+    filled in once per value and the result is kept with its adjacent
+    literals pre-joined, so a render only substitutes the per-call fields.
+    """
+    
+    # Bindings of the static variables kept per template
+    BIND_CACHE_SIZE = 16
+    
+    def __init__(self, text: str):
+        """
+        Parse a template.
+        
+        Args:
+            text: Template text with str.format style {placeholders}
+        """
+        self.text = text
+        
+        # Literal strings and (name, conversion, format_spec, placeholder) fields
+        self._segments: List[Union[str, Tuple[str, Optional[str], str, str]]] = []
+        try:
+            for literal, name, format_spec, conversion in _formatter.parse(text):
+                if literal:
+                    self._segments.append(literal)
+                if name is not None:
+                    placeholder = "{" + name + (f"!{conversion}" if conversion else "") + \
+                        (f":{format_spec}" if format_spec else "") + "}"
+                    self._segments.append((name, conversion, format_spec or "", placeholder))
+        except ValueError as e:
+            logger.warning(f"Invalid prompt template, using it verbatim: {str(e)}")
+            self._segments = [text]
+        
+        self.fields: Tuple[str, ...] = tuple(dict.fromkeys(
+            segment[0] for segment in self._segments if isinstance(segment, tuple)
+        ))
+        self.static_fields: Tuple[str, ...] = tuple(name for name in self.fields if name in STATIC_VARIABLES)
+        self._bindings: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def missing(self, variables: Dict[str, Any]) -> List[str]:
+        """
+        Get the template's variables that are not provided.
+        
+        Args:
+            variables: Available variables
+            
+        Returns:
+            Names of the missing variables
+        """
+        return [name for name in self.fields if name not in variables]
+    
+    def validate(self, known: frozenset = PROMPT_VARIABLES) -> List[str]:
+        """
+        Get the template's variables that no conversation provides.
+        
+        Args:
+            known: Names of the variables that will be available
+            
+        Returns:
+            Names of the unknown variables
+        """
+        return [name for name in self.fields if name not in known]
+    
+    def render(self, variables: Dict[str, Any]) -> str:
+        """
+        Render the template.
+        
+        Args:
+            variables: Values of the placeholders
+            
+        Returns:
+            The rendered prompt
+        """
+        if not self.fields:
+            return self.text
+        
+        segments = self._bound_segments(variables)
+        if len(segments) == 1 and isinstance(segments[0], str):
+            return segments[0]
+        return "".join(self._fill(segments, variables))
+    
+    def _bound_segments(self, variables: Dict[str, Any]) -> list:
+        """
+        Get the segments with the static variables filled in.
+        
+        Args:
+            variables: Values of the placeholders
+            
+        Returns:
+            Segments in which only per-call fields remain, adjacent
+            literals joined
+        """
+        static = {name: variables[name] for name in self.static_fields if name in variables}
+        key = tuple(static.get(name, _MISSING) for name in self.static_fields)
+        try:
+            with self._lock:
+                segments = self._bindings.get(key)
+                if segments is not None:
+                    self._bindings.move_to_end(key)
+                    return segments
+        except TypeError:
+            # Unhashable values are bound without caching
+            return self._bind(static)
+        
+        segments = self._bind(static)
+        with self._lock:
+            self._bindings[key] = segments
+            if len(self._bindings) > self.BIND_CACHE_SIZE:
+                self._bindings.popitem(last=False)
+        return segments
+    
+    def _bind(self, static: Dict[str, Any]) -> list:
+        """
+        Fill in the static variables and join the adjacent literals.
+        
+        Args:
+            static: Values of the static variables
+            
+        Returns:
+            The bound segments
+        """
+        segments: list = []
+        for segment in self._segments:
+            if not isinstance(segment, str) and segment[0] not in static:
+                segments.append(segment)
+                continue
+            
+            text = segment if isinstance(segment, str) else "".join(self._fill([segment], static))
+            if segments and isinstance(segments[-1], str):
+                segments[-1] += text
+            else:
+                segments.append(text)
+        return segments
+    
+    def _fill(self, segments: list, variables: Dict[str, Any]) -> List[str]:
+        """
+        Substitute the variables into segments.
+        
+        Args:
+            segments: Literal strings and placeholder fields
+            variables: Values of the placeholders
+            
+        Returns:
+            The rendered parts
+        """
+        parts = []
+        for segment in segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+                continue
+            
+            name, conversion, format_spec, placeholder = segment
+            if name not in variables:
+                parts.append(placeholder)
+                continue
+            
+            value = variables[name]
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            parts.append(format(value, format_spec) if format_spec else str(value))
+        
+        return parts
+
+
+def compile_template(text: str) -> PromptTemplate:
+    """
+    Get the compiled form of a template, parsing it on first use.
+    
+    Args:
+        text: Template text
+        
+    Returns:
+        The compiled template
+    """
+    with _compiled_cache_lock:
+        template = _compiled_cache.get(text)
+        if template is not None:
+            _compiled_cache.move_to_end(text)
+            return template
+    
+    template = PromptTemplate(text)
+    unknown = template.validate()
+    if unknown:
+        logger.warning(f"Prompt template uses variables no conversation provides: {', '.join(unknown)}")
+    
+    with _compiled_cache_lock:
+        # Keep the first compiled instance if another thread won the race
+        template = _compiled_cache.setdefault(text, template)
+        _compiled_cache.move_to_end(text)
+        if len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return template
+
+
+def compile_conversation_prompt(text: str, prompt_type: str) -> PromptTemplate:
+    """
+    Compile a conversation's system prompt.
+    
+    A prompt from the config or overlay file that uses variables no
+    conversation provides would reach the model with its placeholders
+    unrendered, so the built-in prompt of the type is used instead.
+    
+    Args:
+        text: Prompt template, e.g. from get_prompt_template
+        prompt_type: The type of the prompt
+        
+    Returns:
+        The compiled template
+    """
+    template = compile_template(text)
+    unknown = template.validate()
+    if unknown:
+        logger.debug(f"Using the built-in '{prompt_type}' prompt; the configured one uses "
+                     f"unknown variables: {', '.join(unknown)}")
+        template = compile_template(get_prompt_template(prompt_type))
+    return template
+
+
+class PromptStore:
+    """
+    In-memory view of the prompts of one configuration file.
+    
+    Defaults, the config file's prompts and the overlay file of custom
+    prompts are merged once into an immutable snapshot. Lookups never touch
+    the disk: at most every poll_interval seconds the files' modification
+    times are checked, and a changed file is re-read into a new snapshot that
+    replaces the old one in a single assignment. Unknown prompt types are
+    remembered so their fallback is logged once per snapshot.
+    
+    Custom prompts are written to the overlay file next to the config file
+    (default.yml -> default.prompts.yml), leaving the config file untouched.
+    """
+    
+    def __init__(self, config_path: str, overlay_path: Optional[str] = None, poll_interval: float = 2.0):
+        """
+        Initialize the store and load its prompts.
+        
+        Args:
+            config_path: Path to the config file with custom prompts
+            overlay_path: Path to the overlay file of custom prompts
+                (defaults to <config name>.prompts.yml beside the config file)
+            poll_interval: Minimum seconds between file modification checks
+        """
+        self.config_path = config_path
+        if overlay_path is None:
+            stem, _ = os.path.splitext(config_path)
+            overlay_path = f"{stem}.prompts.yml"
+        self.overlay_path = overlay_path
+        self.poll_interval = poll_interval
+        
+        self._prompts: Dict[str, str] = dict(DEFAULT_PROMPTS)
+        self._missing: set = set()
+        self._mtimes: Tuple[Optional[int], Optional[int]] = (None, None)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        
+        self.reload()
+    
+    def get(self, prompt_type: str) -> str:
+        """
+        Get a prompt template by type.
+        
+        Args:
+            prompt_type: The type of prompt to retrieve
+            
+        Returns:
+            The prompt template, or the call_answering template if the type is unknown
+        """
+        if time.monotonic() - self._checked_at >= self.poll_interval:
+            self._check_for_changes()
+        
+        prompts = self._prompts
+        prompt = prompts.get(prompt_type)
+        if prompt:
+            return prompt
+        
+        if prompt_type not in self._missing:
+            self._missing.add(prompt_type)
+            logger.warning(f"Prompt type '{prompt_type}' not found in {self.config_path}, using call_answering")
+        return prompts.get("call_answering") or DEFAULT_PROMPTS["call_answering"]
+    
+    def set(self, prompt_type: str, text: str) -> bool:
+        """
+        Create or update a custom prompt in the overlay file.
+        
+        Args:
+            prompt_type: The type of prompt to create/update
+            text: The prompt template
+            
+        Returns:
+            True if the prompt was saved successfully, False otherwise
+        """
+        try:
+            with self._lock:
+                overlay = self._prompts_section(self._read_yaml(self.overlay_path), ('prompts',))
+                overlay[prompt_type] = text
+                
+                # Write a temporary file and rename it so readers never see a partial file
+                directory = os.path.dirname(os.path.abspath(self.overlay_path))
+                fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        yaml.dump({'prompts': overlay}, f, default_flow_style=False)
+                    os.replace(temp_path, self.overlay_path)
+                except Exception:
+                    os.unlink(temp_path)
+                    raise
+            
+            self.reload()
+            logger.info(f"Saved custom prompt '{prompt_type}' to {self.overlay_path}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error saving custom prompt: {str(e)}", exc_info=True)
+            return False
+    
+    def reload(self) -> None:
+        """
+        Re-read the config and overlay files into a new snapshot.
+        """
+        with self._lock:
+            mtimes = (self._mtime(self.config_path), self._mtime(self.overlay_path))
+            
+            config = self._read_yaml(self.config_path)
+            
+            prompts = dict(DEFAULT_PROMPTS)
+            # Config prompts may live at the top level or under llm
+            prompts.update(self._prompts_section(config, ('llm', 'prompts')))
+            prompts.update(self._prompts_section(config, ('prompts',)))
+            prompts.update(self._prompts_section(self._read_yaml(self.overlay_path), ('prompts',)))
+            
+            self._prompts = prompts
+            self._missing = set()
+            self._mtimes = mtimes
+            self._checked_at = time.monotonic()
+        
+        logger.info(f"Loaded {len(prompts)} prompts for {self.config_path}")
+    
+    def _check_for_changes(self) -> None:
+        """
+        Reload the prompts if the config or overlay file changed.
+        """
+        self._checked_at = time.monotonic()
+        if (self._mtime(self.config_path), self._mtime(self.overlay_path)) != self._mtimes:
+            self.reload()
+    
+    def _mtime(self, path: str) -> Optional[int]:
+        """
+        Get a file's modification time.
+        
+        Args:
+            path: File path
+            
+        Returns:
+            Modification time in nanoseconds, or None if the file does not exist
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _read_yaml(self, path: str) -> Dict[str, Any]:
+        """
+        Read a YAML file.
+        
+        Args:
+            path: File path
+            
+        Returns:
+            The parsed file; empty if it does not exist or could not be read
+        """
+        if not os.path.exists(path):
+            return {}
+        
+        try:
+            with open(path, 'r') as f:
+                data = yaml.safe_load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.error(f"Error loading prompts from {path}: {str(e)}", exc_info=True)
+            return {}
+    
+    def _prompts_section(self, data: Dict[str, Any], section: Tuple[str, ...]) -> Dict[str, str]:
+        """
+        Get the prompts mapping of a parsed file.
+        
+        Args:
+            data: The parsed file
+            section: Keys leading to the prompts mapping
+            
+        Returns:
+            Prompts by type; empty if the section does not exist
+        """
+        for key in section:
+            data = data.get(key) if isinstance(data, dict) else None
+        
+        if not isinstance(data, dict):
+            return {}
+        return {str(key): value for key, value in data.items() if isinstance(value, str)}
+
+
+def get_prompt_store(config_path: str) -> PromptStore:
+    """
+    Get the prompt store of a config file, loading it on first use.
+    
+    Args:
+        config_path: Path to the config file
+        
+    Returns:
+        The shared prompt store
+    """
+    store = _prompt_stores.get(config_path)
+    if store is None:
+        with _prompt_stores_lock:
+            store = _prompt_stores.get(config_path)
+            if store is None:
+                store = PromptStore(config_path)
+                _prompt_stores[config_path] = store
+    return store
+
+
 def get_prompt_template(prompt_type: str, config_path: Optional[str] = None) -> str:
     """
     Get a prompt template by type.
@@ -164,41 +637,22 @@ def get_prompt_template(prompt_type: str, config_path: Optional[str] = None) ->
     Returns:
         The prompt template string
     """
+    if config_path:
+        return get_prompt_store(config_path).get(prompt_type)
+    
     # Check cache first
-    cache_key = f"{prompt_type}:{config_path or 'default'}"
-    if cache_key in _prompt_cache:
-        return _prompt_cache[cache_key]
-    
-    # If no config path provided, use the default prompt
-    if not config_path:
-        prompt = DEFAULT_PROMPTS.get(prompt_type)
-        if not prompt:
-            logger.warning(f"Prompt type '{prompt_type}' not found in defaults, using call_answering")
-            prompt = DEFAULT_PROMPTS.get("call_answering")
-            
-        _prompt_cache[cache_key] = prompt
+    prompt = _prompt_cache.get(prompt_type)
+    if prompt is not None:
         return prompt
     
-    # Try to load from config file
-    try:
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
-        
-        if config and 'prompts' in config:
-            prompts = config['prompts']
-            if prompt_type in prompts:
-                prompt = prompts[prompt_type]
-                _prompt_cache[cache_key] = prompt
-                return prompt
-        
-        # If prompt not found in config, fall back to default
-        logger.warning(f"Prompt type '{prompt_type}' not found in config, using default")
-        return get_prompt_template(prompt_type)
-        
-    except Exception as e:
-        logger.error(f"Error loading prompts from {config_path}: {str(e)}", exc_info=True)
-        # Fall back to default prompt
-        return get_prompt_template(prompt_type)
+    prompt = DEFAULT_PROMPTS.get(prompt_type)
+    if not prompt:
+        logger.warning(f"Prompt type '{prompt_type}' not found in defaults, using call_answering")
+        prompt = DEFAULT_PROMPTS.get("call_answering")
+    
+    # Unknown types are cached too, so the fallback is resolved once
+    _prompt_cache[prompt_type] = prompt
+    return prompt
 
 
 def get_available_prompt_types() -> Dict[str, str]:
@@ -230,29 +684,17 @@ def format_prompt(prompt_template: str, variables: Dict[str, Any]) -> str:
         The formatted prompt string
     """
     try:
-        # Add default values for common variables if not provided
-        defaults = {
-            "business_name": "the business",
-            "caller_name": "the caller",
-            "caller_number": "unknown",
-            "call_id": "unknown"
-        }
-        
         # Merge defaults with provided variables (provided take precedence)
-        format_vars = {**defaults, **variables}
-        
-        # Format the template
-        return prompt_template.format(**format_vars)
-        
-    except KeyError as e:
-        logger.warning(f"Missing variable in prompt template: {e}")
-        # Return the template with partial formatting (using what we have)
-        for key, value in variables.items():
-            try:
-                prompt_template = prompt_template.replace(f"{{{key}}}", str(value))
-            except:
-                pass
-        return prompt_template
+        format_vars = {**PROMPT_DEFAULTS, **variables}
+        
+        template = compile_template(prompt_template)
+        missing = template.missing(format_vars)
+        if missing:
+            # Placeholders of missing variables are kept as written
+            logger.warning(f"Missing variable in prompt template: {', '.join(missing)}")
+        
+        return template.render(format_vars)
+        
     except Exception as e:
         logger.error(f"Error formatting prompt: {str(e)}", exc_info=True)
         return prompt_template  # Return the unformatted template as fallback
@@ -260,7 +702,10 @@ def format_prompt(prompt_template: str, variables: Dict[str, Any]) -> str:
 
 def create_custom_prompt(prompt_type: str, custom_text: str, config_path: str) -> bool:
     """
-    Create or update a custom prompt in the config file.
+    Create or update a custom prompt for a config file.
+    
+    The prompt is saved in the config file's overlay file (see PromptStore)
+    and is used immediately.
     
     Args:
         prompt_type: The type of prompt to create/update
@@ -270,32 +715,4 @@ def create_custom_prompt(prompt_type: str, custom_text: str, config_path: str) -
     Returns:
         True if the prompt was saved successfully, False otherwise
     """
-    try:
-        # Load existing config
-        config = {}
-        if os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f) or {}
-        
-        # Initialize prompts section if it doesn't exist
-        if 'prompts' not in config:
-            config['prompts'] = {}
-        
-        # Add or update the prompt
-        config['prompts'][prompt_type] = custom_text
-        
-        # Save the config
-        with open(config_path, 'w') as f:
-            yaml.dump(config, f, default_flow_style=False)
-        
-        # Clear the cache for this prompt
-        cache_key = f"{prompt_type}:{config_path}"
-        if cache_key in _prompt_cache:
-            del _prompt_cache[cache_key]
-        
-        logger.info(f"Saved custom prompt '{prompt_type}' to {config_path}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error saving custom prompt: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+    return get_prompt_store(config_path).set(prompt_type, custom_text)
@@ -0,0 +1,226 @@
+"""
+LLM response cache.
+Serves repeated deterministic prompts (FAQ answers, call screening) from a
+bounded in-memory LRU, optionally backed by Redis so the cache is shared
+between processes.
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+import importlib.util
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+from src.performance_config import CacheConfig, LlmOptimizationConfig
+
+logger = logging.getLogger(__name__)
+
+# The Redis tier needs the optional redis package
+REDIS_AVAILABLE = importlib.util.find_spec("redis") is not None
+
+class ResponseCache:
+    """
+    Two-tier cache of generated responses.
+    
+    Lookups check the in-memory LRU first and fall back to Redis; Redis hits
+    are copied into memory. Entries expire after the TTL in both tiers.
+    """
+    
+    def __init__(self, max_size: int = 1000, ttl: int = 3600,
+                 redis_url: Optional[str] = None, prefix: str = "llm:"):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_size: Maximum number of responses kept in memory
+            ttl: Seconds a cached response stays valid
+            redis_url: Redis connection string, or None for memory only
+            prefix: Prefix of the Redis keys
+        """
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.prefix = prefix
+        
+        # key -> (expires_at, response), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.redis = None
+        if redis_url:
+            if REDIS_AVAILABLE:
+                import redis
+                # Short timeouts: a slow cache must never stall a caller's turn
+                self.redis = redis.Redis.from_url(
+                    redis_url,
+                    socket_timeout=0.1,
+                    socket_connect_timeout=0.1
+                )
+            else:
+                logger.warning("redis package not installed, LLM response cache is memory only")
+        
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self.evictions = 0
+    
+    @classmethod
+    def from_config(cls, llm_config: LlmOptimizationConfig,
+                    cache_config: CacheConfig) -> "ResponseCache":
+        """
+        Create a cache from the performance configuration.
+        
+        Args:
+            llm_config: LLM optimization settings (TTL)
+            cache_config: Shared cache settings (size and backend)
+        
+        Returns:
+            Configured cache
+        """
+        redis_url = None
+        if cache_config.enabled and cache_config.backend == "redis":
+            redis_url = cache_config.redis_url
+        
+        return cls(
+            max_size=cache_config.max_size,
+            ttl=llm_config.cache_ttl,
+            redis_url=redis_url,
+            prefix=cache_config.prefixes.get("llm", "llm:")
+        )
+    
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], options: Dict[str, Any]) -> str:
+        """
+        Build the cache key of a request.
+        
+        Args:
+            model: Model name
+            messages: Formatted chat messages
+            options: Generation options
+        
+        Returns:
+            Hex digest of the canonical JSON encoding of the request
+        """
+        canonical = json.dumps(
+            {"model": model, "messages": messages, "options": options},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Cache key from make_key()
+        
+        Returns:
+            The cached response, or None on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        
+        value = self._redis_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            self.redis_hits += 1
+        
+        self._store(key, value, now)
+        return value
+    
+    def set(self, key: str, value: str) -> None:
+        """
+        Cache a response.
+        
+        Args:
+            key: Cache key from make_key()
+            value: Generated response
+        """
+        self._store(key, value, time.monotonic())
+        
+        if self.redis is not None:
+            try:
+                self.redis.setex(self.prefix + key, self.ttl, value)
+            except Exception as e:
+                logger.error(f"Error writing LLM response to Redis: {str(e)}")
+    
+    def clear(self) -> None:
+        """
+        Drop the in-memory entries.
+        """
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with hit, miss and eviction counts, the hit rate and
+            the number of entries in memory
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'redis_hits': self.redis_hits,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+    
+    def _store(self, key: str, value: str, now: float) -> None:
+        """
+        Insert an entry into the memory tier, evicting the least recently used.
+        
+        Args:
+            key: Cache key
+            value: Response text
+            now: Current monotonic time
+        """
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def _redis_get(self, key: str) -> Optional[str]:
+        """
+        Look up a response in the Redis tier.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            The cached response, or None if missing or Redis is unavailable
+        """
+        if self.redis is None:
+            return None
+        
+        try:
+            value = self.redis.get(self.prefix + key)
+        except Exception as e:
+            logger.error(f"Error reading LLM response from Redis: {str(e)}")
+            return None
+        
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
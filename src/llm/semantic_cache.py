@@ -0,0 +1,276 @@
+"""
+Semantic cache of answers to frequently asked questions.
+Matches a new question against previously answered ones by the cosine
+similarity of their embeddings, so paraphrases ("what are your hours",
+"when are you open") reuse one answer instead of a new generation.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """
+    Fixed-size embedding matrix searched with one matrix-vector product.
+    
+    Each row holds the unit-normalised embedding of an answered question.
+    Entries belong to a namespace (e.g. an information category or prompt
+    type) so unrelated answers never match, expire after the TTL, and the
+    least recently used entry is evicted when the matrix is full.
+    """
+    
+    # Embeddings of recent lookups kept so a following put() does not re-embed
+    RECENT_EMBEDDINGS = 64
+    
+    def __init__(self, embed_fn: Callable[[str], Optional[List[float]]],
+                 threshold: float = 0.9, max_entries: int = 512, ttl: int = 3600):
+        """
+        Initialize the cache.
+        
+        Args:
+            embed_fn: Returns the embedding of a text, or None on failure
+                (e.g. OllamaClient.embed_text)
+            threshold: Minimum cosine similarity for a match
+            max_entries: Maximum number of cached answers
+            ttl: Seconds a cached answer stays valid
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        
+        # Allocated on the first insert, once the embedding size is known
+        self._embeddings: Optional[np.ndarray] = None
+        self._expires = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries, dtype=np.int64)
+        # Namespace id of each row; -1 marks an empty row
+        self._namespaces = np.full(self.max_entries, -1, dtype=np.int32)
+        self._values: List[Any] = [None] * self.max_entries
+        
+        self._namespace_ids: Dict[str, int] = {}
+        # Ids are never reused, so a cleared namespace cannot match new entries
+        self._next_namespace_id = 0
+        self._clock = 0
+        self._recent: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @classmethod
+    def from_config(cls, embed_fn: Callable[[str], Optional[List[float]]],
+                    cache_config: Dict[str, Any]) -> "SemanticCache":
+        """
+        Create a cache from the llm.semantic_cache configuration section.
+        
+        Args:
+            embed_fn: Embedding function
+            cache_config: The llm.semantic_cache configuration
+        
+        Returns:
+            Configured cache
+        """
+        return cls(
+            embed_fn,
+            threshold=float(cache_config.get('threshold', 0.9)),
+            max_entries=int(cache_config.get('max_entries', 512)),
+            ttl=int(cache_config.get('ttl', 3600))
+        )
+    
+    def get(self, query: str, namespace: str = "default") -> Optional[Any]:
+        """
+        Find the answer of the most similar cached question.
+        
+        Args:
+            query: The question
+            namespace: Namespace to search
+        
+        Returns:
+            The cached answer, or None if no question is similar enough
+        """
+        vector = self._embed(query)
+        
+        with self._lock:
+            slot = self._match(vector, namespace) if vector is not None else None
+            if slot is None:
+                self.misses += 1
+                return None
+            
+            self._clock += 1
+            self._last_used[slot] = self._clock
+            self.hits += 1
+            return self._values[slot]
+    
+    def put(self, query: str, value: Any, namespace: str = "default") -> bool:
+        """
+        Cache the answer to a question.
+        
+        Args:
+            query: The question
+            value: Its answer
+            namespace: Namespace of the entry
+        
+        Returns:
+            True if the answer was cached, False if the question could not be embedded
+        """
+        vector = self._embed(query)
+        if vector is None:
+            return False
+        
+        with self._lock:
+            if self._embeddings is None or self._embeddings.shape[1] != len(vector):
+                # First entry, or the embedding model changed
+                self._reset(len(vector))
+            
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None:
+                namespace_id = self._next_namespace_id
+                self._next_namespace_id += 1
+                self._namespace_ids[namespace] = namespace_id
+            
+            # A near-identical question replaces its existing entry
+            slot = self._match(vector, namespace)
+            if slot is None:
+                free = np.flatnonzero((self._namespaces < 0) | (self._expires <= time.monotonic()))
+                if len(free):
+                    slot = int(free[0])
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self.evictions += 1
+            
+            self._clock += 1
+            self._embeddings[slot] = vector
+            self._expires[slot] = time.monotonic() + self.ttl
+            self._last_used[slot] = self._clock
+            self._namespaces[slot] = namespace_id
+            self._values[slot] = value
+        
+        return True
+    
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """
+        Drop cached answers.
+        
+        Args:
+            namespace: Namespace to drop (e.g. one call's answers), or None
+                to drop all answers
+        """
+        with self._lock:
+            if namespace is None:
+                self._namespaces[:] = -1
+                self._values = [None] * self.max_entries
+                self._namespace_ids.clear()
+                self._recent.clear()
+                return
+            
+            namespace_id = self._namespace_ids.pop(namespace, None)
+            if namespace_id is None:
+                return
+            
+            for slot in np.flatnonzero(self._namespaces == namespace_id):
+                self._namespaces[slot] = -1
+                self._values[slot] = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with hit, miss and eviction counts, the hit rate and
+            the number of live entries
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            live = (self._namespaces >= 0) & (self._expires > time.monotonic())
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': int(np.count_nonzero(live)),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """
+        Get the unit-normalised embedding of a text.
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            Float32 unit vector, or None if embedding failed
+        """
+        key = " ".join(text.lower().split())
+        with self._lock:
+            vector = self._recent.get(key)
+            if vector is not None:
+                self._recent.move_to_end(key)
+                return vector
+        
+        try:
+            embedding = self.embed_fn(text)
+        except Exception as e:
+            logger.error(f"Error embedding text for semantic cache: {str(e)}", exc_info=True)
+            return None
+        
+        if not embedding:
+            return None
+        
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        vector /= norm
+        
+        with self._lock:
+            self._recent[key] = vector
+            while len(self._recent) > self.RECENT_EMBEDDINGS:
+                self._recent.popitem(last=False)
+        
+        return vector
+    
+    def _match(self, vector: np.ndarray, namespace: str) -> Optional[int]:
+        """
+        Find the live entry most similar to an embedding. Caller holds the lock.
+        
+        Args:
+            vector: Unit-normalised query embedding
+            namespace: Namespace to search
+        
+        Returns:
+            Row of the best entry at or above the threshold, or None
+        """
+        namespace_id = self._namespace_ids.get(namespace)
+        if namespace_id is None or self._embeddings is None or self._embeddings.shape[1] != len(vector):
+            return None
+        
+        valid = (self._namespaces == namespace_id) & (self._expires > time.monotonic())
+        if not valid.any():
+            return None
+        
+        # Rows are unit vectors, so the dot product is the cosine similarity
+        scores = np.where(valid, self._embeddings @ vector, -1.0)
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.threshold:
+            return None
+        
+        logger.debug(f"Semantic cache match in {namespace} with similarity {scores[slot]:.3f}")
+        return slot
+    
+    def _reset(self, dimension: int) -> None:
+        """
+        Allocate an empty embedding matrix. Caller holds the lock.
+        
+        Args:
+            dimension: Embedding size
+        """
+        self._embeddings = np.zeros((self.max_entries, dimension), dtype=np.float32)
+        self._namespaces[:] = -1
+        self._values = [None] * self.max_entries
@@ -1,6 +1,7 @@
 """Main entry point for the AI Call Secretary application."""
 import os
 import sys
+import asyncio
 import logging
 import argparse
 import uvicorn
@@ -101,17 +102,24 @@ def run_api(args):
 
 def run_telephony(args):
     """Run the telephony server."""
-    from src.telephony.call_handler import CallHandler
+    from src.telephony.server import TelephonyServer
+    from src.model_registry import get_model_registry
     
     # Set config path as environment variable
     os.environ["CONFIG_PATH"] = args.config
     
-    # Create call handler
-    call_handler = CallHandler(config_path=args.config)
+    # Load shared models once for all calls
+    registry = get_model_registry(args.config)
+    if registry.warm_on_startup:
+        logger.info("Warming up shared models")
+        registry.warm_up()
+    
+    # All calls share one event loop; inference runs on the registry's executors
+    server = TelephonyServer(registry)
     
     # Start telephony server
     logger.info("Starting telephony server")
-    call_handler.start()
+    asyncio.run(server.serve_forever())
 
 
 def main():
@@ -0,0 +1,380 @@
+"""
+Process-wide registry of shared models.
+Loads the heavy STT, TTS and LLM components once per process and shares
+them across concurrent calls behind per-model concurrency limits.
+"""
+import os
+import asyncio
+import logging
+import functools
+import threading
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Callable, Iterable
+
+from src.voice.stt import SpeechToText
+from src.voice.tts import TextToSpeech
+from src.llm.ollama_client import OllamaClient
+from src.workflow.actions import ActionHandler
+from src.voice.batch_scheduler import TranscriptionBatchScheduler
+from src.llm.semantic_cache import SemanticCache
+from src.llm.dispatcher import GenerationDispatcher
+from src.performance_config import get_performance_config
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Holds one shared instance of each heavy component. Blocking work for
+    each component runs on its own executor, whose worker count is the
+    component's concurrency limit, so the event loop never waits on
+    inference and excess work queues on the executor.
+    """
+    
+    # Default number of concurrent users per shared component
+    DEFAULT_CONCURRENCY = {
+        'stt': 1,
+        'tts': 4,
+        'llm': 8,
+        'actions': 8
+    }
+    
+    def __init__(self, config_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the registry.
+        
+        Args:
+            config_path: Path to the configuration file
+            config: Already parsed configuration; skips reading config_path
+        """
+        self.config_path = config_path or os.path.join(
+            os.path.dirname(__file__),
+            "../config/default.yml"
+        )
+        
+        # Parse the configuration once for the whole process
+        self.config = config if config is not None else self._load_config()
+        
+        models_config = self.config.get('models', {}) or {}
+        self.warm_on_startup = bool(models_config.get('warm_on_startup', False))
+        
+        self.concurrency = dict(self.DEFAULT_CONCURRENCY)
+        self.concurrency.update({
+            kind: int(limit) for kind, limit in (models_config.get('max_concurrency') or {}).items()
+        })
+        
+        self._factories: Dict[str, Callable[[], Any]] = {
+            'stt': lambda: SpeechToText(self.config_path),
+            'tts': lambda: TextToSpeech(self.config_path),
+            'llm': lambda: OllamaClient(self.config_path),
+            'actions': lambda: ActionHandler(self.config_path)
+        }
+        self._instances: Dict[str, Any] = {}
+        self._stt_scheduler: Optional[TranscriptionBatchScheduler] = None
+        self._semantic_cache: Optional[SemanticCache] = None
+        self._llm_dispatcher: Optional[GenerationDispatcher] = None
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        
+        logger.info(f"Model registry initialized with concurrency limits: {self.concurrency}")
+    
+    def _load_config(self) -> Dict[str, Any]:
+        """
+        Load configuration from YAML file.
+        
+        Returns:
+            The parsed configuration, or an empty dict if it could not be read
+        """
+        try:
+            with open(self.config_path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+            
+            logger.info(f"Loaded model registry configuration from {self.config_path}")
+            return config
+        except Exception as e:
+            logger.error(f"Error loading configuration: {str(e)}", exc_info=True)
+            return {}
+    
+    def get(self, kind: str) -> Any:
+        """
+        Get the shared instance of a component, creating it on first use.
+        
+        Args:
+            kind: Component kind ('stt', 'tts', 'llm' or 'actions')
+        
+        Returns:
+            The shared component instance
+        """
+        instance = self._instances.get(kind)
+        if instance is not None:
+            return instance
+        
+        with self._lock:
+            instance = self._instances.get(kind)
+            if instance is None:
+                if kind not in self._factories:
+                    raise KeyError(f"Unknown model kind: {kind}")
+                
+                logger.info(f"Creating shared {kind} instance")
+                instance = self._factories[kind]()
+                self._instances[kind] = instance
+        
+        return instance
+    
+    def register(self, kind: str, instance: Any) -> None:
+        """
+        Register an existing instance as the shared component of a kind.
+        
+        Args:
+            kind: Component kind
+            instance: The instance to share
+        """
+        with self._lock:
+            self._instances[kind] = instance
+    
+    def get_stt(self) -> SpeechToText:
+        """Get the shared speech-to-text engine."""
+        return self.get('stt')
+    
+    def get_tts(self) -> TextToSpeech:
+        """Get the shared text-to-speech engine."""
+        return self.get('tts')
+    
+    def get_llm(self) -> OllamaClient:
+        """Get the shared LLM client."""
+        return self.get('llm')
+    
+    def get_action_handler(self) -> ActionHandler:
+        """Get the shared action handler."""
+        return self.get('actions')
+    
+    def get_stt_scheduler(self) -> Optional[TranscriptionBatchScheduler]:
+        """
+        Get the cross-call transcription batch scheduler.
+        
+        Returns:
+            The shared scheduler, or None if voice.stt.batching is disabled
+        """
+        batching_config = (self.config.get('voice', {}) or {}).get('stt', {}).get('batching', {}) or {}
+        if not batching_config.get('enabled', False):
+            return None
+        
+        if self._stt_scheduler is None:
+            stt = self.get_stt()
+            executor = self.get_executor('stt')
+            with self._lock:
+                if self._stt_scheduler is None:
+                    self._stt_scheduler = TranscriptionBatchScheduler.from_config(
+                        stt, batching_config, executor=executor
+                    )
+        
+        return self._stt_scheduler
+    
+    def get_semantic_cache(self) -> Optional[SemanticCache]:
+        """
+        Get the semantic cache of FAQ answers.
+        
+        Returns:
+            The shared cache, or None if llm.semantic_cache is disabled
+        """
+        cache_config = (self.config.get('llm', {}) or {}).get('semantic_cache', {}) or {}
+        if not cache_config.get('enabled', False):
+            return None
+        
+        if self._semantic_cache is None:
+            llm = self.get_llm()
+            with self._lock:
+                if self._semantic_cache is None:
+                    self._semantic_cache = SemanticCache.from_config(llm.embed_text, cache_config)
+        
+        return self._semantic_cache
+    
+    def get_llm_dispatcher(self) -> Optional[GenerationDispatcher]:
+        """
+        Get the dispatcher that bounds and orders requests to the LLM backend.
+        
+        Returns:
+            The shared dispatcher, or None if LLM batching is disabled
+        """
+        llm_config = get_performance_config().llm
+        if not llm_config.batching_enabled:
+            return None
+        
+        if self._llm_dispatcher is None:
+            with self._lock:
+                if self._llm_dispatcher is None:
+                    self._llm_dispatcher = GenerationDispatcher.from_config(llm_config)
+        
+        return self._llm_dispatcher
+    
+    def get_executor(self, kind: str) -> ThreadPoolExecutor:
+        """
+        Get the bounded executor for a component's blocking work.
+        
+        Args:
+            kind: Component kind
+        
+        Returns:
+            Executor with one worker per concurrency slot of the component
+        """
+        executor = self._executors.get(kind)
+        if executor is not None:
+            return executor
+        
+        with self._lock:
+            executor = self._executors.get(kind)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.concurrency.get(kind, 1)),
+                    thread_name_prefix=f"{kind}-worker"
+                )
+                self._executors[kind] = executor
+        
+        return executor
+    
+    async def run(self, kind: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking call on a component's executor without blocking the event loop.
+        
+        Calls beyond the component's concurrency limit queue on the executor.
+        
+        Args:
+            kind: Component kind whose executor should run the call
+            func: The blocking callable
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            The callable's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.get_executor(kind),
+            functools.partial(func, *args, **kwargs)
+        )
+    
+    async def run_llm(self, priority: int, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking LLM call through the dispatcher at the given priority.
+        
+        The call runs on the 'llm' executor and cannot be aborted once
+        started, so it is never preempted. Offline work such as post-call
+        summaries should use agenerate instead.
+        
+        Args:
+            priority: GenerationDispatcher.PRIORITY_LIVE or PRIORITY_BACKGROUND
+            func: The blocking LLM callable
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            The callable's return value
+        """
+        dispatcher = self.get_llm_dispatcher()
+        if dispatcher is None:
+            return await self.run('llm', func, *args, **kwargs)
+        
+        return await dispatcher.submit_blocking(priority, self.run, 'llm', func, *args, **kwargs)
+    
+    async def agenerate(self, priority: int, messages: List[Dict[str, str]],
+                        options: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Generate a response with the async LLM client through the dispatcher.
+        
+        A background request made this way is preempted by live turns:
+        cancelling it aborts the backend request, and it is retried once a
+        slot is free.
+        
+        Args:
+            priority: GenerationDispatcher.PRIORITY_LIVE or PRIORITY_BACKGROUND
+            messages: List of message dictionaries with 'role' and 'content' keys
+            options: Additional options for the generation
+        
+        Returns:
+            Generated response text or None if generation failed
+        """
+        llm = self.get_llm()
+        dispatcher = self.get_llm_dispatcher()
+        if dispatcher is None:
+            return await llm.agenerate_response(messages, options)
+        
+        return await dispatcher.generate(llm, messages, options, priority=priority)
+    
+    def shutdown(self) -> None:
+        """
+        Stop the component executors and close the LLM client's connections
+        and availability refresher.
+        """
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors = {}
+            llm = self._instances.get('llm')
+        
+        for executor in executors:
+            executor.shutdown(wait=False)
+        
+        if llm is not None and hasattr(llm, 'close'):
+            try:
+                llm.close()
+            except Exception as e:
+                logger.error(f"Error closing LLM client: {str(e)}", exc_info=True)
+        
+        logger.info("Model registry executors shut down")
+    
+    async def ashutdown(self) -> None:
+        """
+        Shut down like shutdown(), also closing the LLM client's async
+        connections on the running event loop.
+        """
+        llm = self._instances.get('llm')
+        if llm is not None and asyncio.iscoroutinefunction(getattr(llm, 'aclose', None)):
+            try:
+                await llm.aclose()
+            except Exception as e:
+                logger.error(f"Error closing LLM client: {str(e)}", exc_info=True)
+        
+        self.shutdown()
+    
+    def warm_up(self, kinds: Optional[Iterable[str]] = None) -> None:
+        """
+        Load models ahead of the first call.
+        
+        Args:
+            kinds: Component kinds to warm; defaults to all of them
+        """
+        for kind in kinds or ('stt', 'tts', 'llm', 'actions'):
+            try:
+                instance = self.get(kind)
+                
+                if kind == 'stt':
+                    instance._ensure_model_loaded()
+                elif kind == 'llm':
+                    instance._pull_model_if_needed()
+                
+                logger.info(f"Warmed up {kind}")
+            except Exception as e:
+                logger.error(f"Error warming up {kind}: {str(e)}", exc_info=True)
+
+
+# Process-wide registry
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_model_registry(config_path: Optional[str] = None) -> ModelRegistry:
+    """
+    Get the process-wide model registry, creating it on first use.
+    
+    Args:
+        config_path: Path to the configuration file (used on first call only)
+    
+    Returns:
+        The shared model registry
+    """
+    global _registry
+    
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(config_path)
+    
+    return _registry
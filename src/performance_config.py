@@ -30,7 +30,8 @@ class CacheConfig(BaseModel):
         "message": "msg:",
         "appointment": "appt:",
         "status": "status:",
-        "user": "user:"
+        "user": "user:",
+        "llm": "llm:"
     }
     
     # Endpoints to exclude from caching
@@ -96,6 +97,9 @@ class LlmOptimizationConfig(BaseModel):
     # Cache TTL for LLM responses in seconds
     cache_ttl: int = 3600  # 1 hour
     
+    # Only cache requests at or below this temperature (deterministic prompts)
+    cache_max_temperature: float = 0.3
+    
     # Maximum tokens per request
     max_tokens: int = 1024
     
@@ -110,6 +114,12 @@ class LlmOptimizationConfig(BaseModel):
     
     # Maximum waiting time for batch completion in seconds
     max_batch_wait: float = 0.5
+    
+    # Maximum background (post-call, analytics) requests in flight at once
+    background_max_in_flight: int = 2
+    
+    # Cancel and requeue background requests when a live turn needs a slot
+    preempt_background: bool = True
 
 
 class WebOptimizationConfig(BaseModel):
@@ -7,13 +7,17 @@ import logging
 import asyncio
 import json
 import os
-from typing import Dict, List, Optional, Any
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Any, Tuple, Awaitable, Callable
 
-from src.voice.stt import SpeechToText
-from src.voice.tts import TextToSpeech
+from src.voice.sentence_splitter import SentenceSplitter
+from src.voice.audio import pcm_to_float32, resample
+from src.voice.vad import VoiceActivityDetector, Endpointer
 from src.llm.context import ConversationContext
-from src.llm.ollama_client import OllamaClient
-from src.workflow.actions import ActionHandler
+from src.llm.dispatcher import GenerationDispatcher
+from src.llm.prompt_session import PromptSession
+from src.model_registry import ModelRegistry, get_model_registry
 
 logger = logging.getLogger(__name__)
 
@@ -23,27 +27,66 @@ class CallHandler:
     the various components (STT, LLM, TTS).
     """
     
-    def __init__(self, call_metadata: Dict[str, Any]):
+    def __init__(self, call_metadata: Dict[str, Any], streaming: Optional[bool] = None,
+                 registry: Optional[ModelRegistry] = None):
         """
         Initialize the call handler with call metadata.
         
         Args:
             call_metadata: Dictionary containing call information like caller ID, timestamp, etc.
+            streaming: Stream LLM output sentence by sentence into TTS playback
+                instead of waiting for the complete reply (defaults to
+                telephony.streaming_turns in the configuration)
+            registry: Model registry providing the shared components
+                (defaults to the process-wide registry)
         """
         self.call_metadata = call_metadata
         self.call_id = call_metadata.get('call_id', 'unknown')
         self.caller_number = call_metadata.get('caller_number', 'unknown')
         self.caller_name = call_metadata.get('caller_name', 'Unknown')
         
-        # Initialize components
-        self.stt = SpeechToText()
-        self.tts = TextToSpeech()
-        self.llm = OllamaClient()
-        self.context = ConversationContext()
-        self.action_handler = ActionHandler()
+        # Shared components come from the registry; only the context is per call
+        self.registry = registry or get_model_registry()
+        self.stt = self.registry.get_stt()
+        self.tts = self.registry.get_tts()
+        self.llm = self.registry.get_llm()
+        self.action_handler = self.registry.get_action_handler()
+        self.stt_scheduler = self.registry.get_stt_scheduler()
+        self.semantic_cache = self.registry.get_semantic_cache()
+        # FAQ answers are generated with this caller's details in the prompt,
+        # so they are only reused within this call
+        self.faq_namespace = f"faq_answering:{self.call_id}"
+        self.context = ConversationContext(self.registry.config_path, config=self.registry.config)
+        
+        # Reuse the prompt prefix Ollama already processed for this call
+        self.prompt_session: Optional[PromptSession] = None
+        if (self.registry.config.get('llm', {}) or {}).get('prefix_reuse', False):
+            self.prompt_session = PromptSession(self.context)
+        
+        if streaming is None:
+            streaming = bool(self.registry.config.get('telephony', {}).get('streaming_turns', False))
+        self.streaming = streaming
+        
+        # Turn capture: raw PCM format of the telephony leg and endpointing
+        voice_config = self.registry.config.get('voice', {}) or {}
+        stt_config = voice_config.get('stt', {}) or {}
+        self.input_sample_rate = int(stt_config.get('input_sample_rate', 8000))
+        self.input_sample_width = int(stt_config.get('input_sample_width', 2))
+        self.vad_config = voice_config.get('vad', {}) or {}
+        self.vad_enabled = bool(self.vad_config.get('enabled', True))
+        self.vad = VoiceActivityDetector.from_config(self.vad_config, self.input_sample_rate)
+        
+        # Barge-in: keep listening while the assistant speaks
+        barge_in_config = self.registry.config.get('telephony', {}).get('barge_in', {}) or {}
+        self.barge_in_enabled = bool(barge_in_config.get('enabled', True))
+        self.barge_in_min_speech_ms = int(barge_in_config.get('min_speech_ms', 300))
         
         # Call state
         self.conversation_history = []
+        self._summary_task: Optional[asyncio.Future] = None
+        # Speech heard while the assistant was talking that was too short to
+        # barge in; the next capture continues from it
+        self._pending_speech: Optional[np.ndarray] = None
         self.call_duration = 0
         self.start_time = time.time()
         
@@ -53,6 +96,21 @@ class CallHandler:
         """
         Main method to process a call from start to finish.
         
+        Blocking entry point for callers without an event loop (such as the
+        FreeSWITCH mod_python script); runs handle_call to completion.
+        
+        Args:
+            session: The telephony session object
+        """
+        asyncio.run(self.handle_call(session))
+    
+    async def handle_call(self, session) -> None:
+        """
+        Process a call from start to finish on the running event loop.
+        
+        Blocking STT, LLM and TTS work runs on the registry's bounded
+        executors, so many calls can share one event loop.
+        
         Args:
             session: The telephony session object
         """
@@ -66,20 +124,25 @@ class CallHandler:
             
             # Play welcome greeting
             initial_greeting = "Hello, this is your AI assistant. How can I help you today?"
-            self._play_response(session, initial_greeting)
+            _, _, pending_audio = await self._speak(session, self._play_response(session, initial_greeting))
             
             # Main conversation loop
             continue_call = True
-            while continue_call:
-                # Listen for user input
-                user_audio = self._capture_audio(session)
-                if not user_audio:
+            while continue_call and getattr(session, 'active', True):
+                # Listen for user input, unless the caller already spoke over the assistant
+                if pending_audio is not None:
+                    user_audio, pending_audio = pending_audio, None
+                else:
+                    user_audio = await self._capture_audio(session)
+                if user_audio is None or len(user_audio) == 0:
                     continue
                 
                 # Convert speech to text
-                user_text = self.stt.transcribe(user_audio)
+                user_text = await self._transcribe(user_audio)
                 if not user_text or user_text.strip() == "":
-                    self._play_response(session, "I didn't catch that. Could you please repeat?")
+                    _, _, pending_audio = await self._speak(
+                        session, self._play_response(session, "I didn't catch that. Could you please repeat?")
+                    )
                     continue
                 
                 logger.info(f"User said: {user_text}")
@@ -87,96 +150,497 @@ class CallHandler:
                 
                 # Check for call-ending phrases
                 if self._should_end_call(user_text):
-                    self._play_response(session, "Thank you for calling. Goodbye!")
+                    await self._speak(session, self._play_response(session, "Thank you for calling. Goodbye!"))
                     continue_call = False
                     break
                 
-                # Process with LLM
+                # Process with LLM, unless a paraphrase of the question was already answered
                 self.context.add_user_message(user_text)
-                llm_response = self.llm.generate_response(self.context.get_context())
+                faq_answer = await self._lookup_faq(user_text)
+                if faq_answer is not None:
+                    llm_response = faq_answer
+                elif self.streaming:
+                    # Sentences are spoken as they are generated
+                    spoken = []
+                    llm_response, interrupted, pending_audio = await self._speak(
+                        session, self._stream_and_play_response(session, spoken)
+                    )
+                    if interrupted:
+                        # Only keep what the caller actually heard
+                        heard = " ".join(spoken)
+                        logger.info(f"AI response interrupted after: {heard}")
+                        if heard:
+                            self.conversation_history.append({"role": "assistant", "content": heard})
+                            self.context.add_assistant_message(heard, interrupted=True)
+                            self._maybe_summarize()
+                        continue
+                else:
+                    llm_response = await self._run_llm(self._generate)
                 
                 if not llm_response:
-                    self._play_response(session, "I apologize, but I'm having trouble processing your request.")
+                    _, _, pending_audio = await self._speak(
+                        session, self._play_response(session, "I apologize, but I'm having trouble processing your request.")
+                    )
                     continue
                 
                 logger.info(f"AI response: {llm_response}")
                 self.conversation_history.append({"role": "assistant", "content": llm_response})
                 self.context.add_assistant_message(llm_response)
+                self._maybe_summarize()
                 
                 # Check for actions to perform
                 actions = self.action_handler.extract_actions(llm_response)
+                if faq_answer is None and not actions:
+                    await self._remember_faq(user_text, llm_response)
                 for action in actions:
-                    action_result = self.action_handler.execute_action(action)
+                    action_result = await self.registry.run(
+                        'actions', self.action_handler.execute_action, action
+                    )
                     if action_result:
                         self.context.add_action_result(action, action_result)
                 
-                # Speak the response
-                self._play_response(session, llm_response)
+                # Speak the response (already played when streaming)
+                if faq_answer is not None or not self.streaming:
+                    _, _, pending_audio = await self._speak(session, self._play_response(session, llm_response))
             
+        except asyncio.CancelledError:
+            logger.info(f"Call {self.call_id} cancelled")
+            raise
         except Exception as e:
             logger.error(f"Error processing call: {str(e)}", exc_info=True)
-            self._play_response(session, "I apologize, but there was an error processing your call. Please try again later.")
+            await self._speak(
+                session,
+                self._play_response(session, "I apologize, but there was an error processing your call. Please try again later.")
+            )
         finally:
             # Call cleanup
+            if self._summary_task is not None:
+                self._summary_task.cancel()
+            if self.semantic_cache is not None:
+                self.semantic_cache.clear(self.faq_namespace)
             self.call_duration = time.time() - self.start_time
-            self._save_call_record()
+            await asyncio.get_running_loop().run_in_executor(None, self._save_call_record)
             logger.info(f"Call {self.call_id} completed. Duration: {self.call_duration:.2f} seconds")
     
-    def _capture_audio(self, session, max_duration: int = 10) -> Optional[bytes]:
+    async def _capture_audio(self, session, max_duration: int = 10,
+                             speech_started: Optional[asyncio.Event] = None,
+                             endpointer: Optional[Endpointer] = None) -> Optional[Any]:
         """
-        Captures audio from the call session.
+        Captures one caller turn from the call session.
+        
+        Sessions that provide an async read_audio() are read in small chunks
+        until the endpointer detects the end of the turn. Leading and
+        trailing silence is trimmed, and silence-only captures are dropped
+        before they reach speech recognition. Speech left over from a
+        barge-in listener is fed first, so the turn starts where the caller
+        started talking.
         
         Args:
             session: The telephony session object
             max_duration: Maximum recording duration in seconds
+            speech_started: Set as soon as the caller has started speaking
+            endpointer: Endpointer to feed, so the caller can read its state
+                if the capture is cancelled; created from the config if None
             
         Returns:
-            Audio data as bytes or None if capture failed
+            Audio for speech recognition (a 16 kHz float32 waveform when
+            captured from the session), or None if no speech was captured
         """
-        # Implementation depends on the specific telephony system
-        # For FreeSWITCH, we would use record or audio_fork
         try:
-            # For now, we'll simulate audio capture
-            # In production, this would interact with the session object
-            logger.debug(f"Capturing audio for up to {max_duration} seconds")
+            read_audio = getattr(session, 'read_audio', None)
+            if not asyncio.iscoroutinefunction(read_audio):
+                # This is a placeholder for sessions without an audio feed
+                logger.debug(f"Capturing audio for up to {max_duration} seconds")
+                
+                # Simulating recording delay
+                await asyncio.sleep(2)  # Pretend user spoke for 2 seconds
+                
+                return b"SIMULATED_AUDIO_DATA"
+            
+            if endpointer is None:
+                endpointer = self._create_endpointer(max_duration, barge_in=speech_started is not None)
             
-            # This is a placeholder - actual implementation would use FreeSWITCH APIs
-            # Example: session.execute("record", f"/tmp/{self.call_id}.wav {max_duration}")
+            if self.vad_enabled and self._pending_speech is not None:
+                endpointer.process(self._pending_speech)
+                self._pending_speech = None
             
-            # Simulating recording delay
-            time.sleep(2)  # Pretend user spoke for 2 seconds
+            captured = []
+            capture_start = time.time()
             
-            # In a real implementation, we would return the captured audio bytes
-            return b"SIMULATED_AUDIO_DATA"
+            while getattr(session, 'active', True):
+                chunk = await read_audio()
+                if not chunk:
+                    break
+                
+                samples = pcm_to_float32(chunk, self.input_sample_width)
+                if not self.vad_enabled:
+                    captured.append(samples)
+                    if sum(len(c) for c in captured) >= max_duration * self.input_sample_rate:
+                        break
+                    continue
+                
+                ended = endpointer.process(samples)
+                if speech_started is not None and endpointer.speech_started:
+                    speech_started.set()
+                if ended:
+                    break
+            
+            if self.vad_enabled:
+                audio = endpointer.get_audio()
+                if audio is None:
+                    logger.debug("No speech detected in captured audio")
+                    return None
+            else:
+                audio = np.concatenate(captured) if captured else None
+                if audio is None:
+                    return None
+            
+            logger.debug(f"Captured {len(audio) / self.input_sample_rate:.2f}s of speech "
+                         f"in {time.time() - capture_start:.2f}s")
+            return resample(audio, self.input_sample_rate)
         except Exception as e:
             logger.error(f"Error capturing audio: {str(e)}", exc_info=True)
             return None
     
-    def _play_response(self, session, text: str) -> None:
+    def _create_endpointer(self, max_duration: int = 10, barge_in: bool = False) -> Endpointer:
+        """
+        Create an endpointer for one caller turn.
+        
+        Args:
+            max_duration: Maximum recording duration in seconds
+            barge_in: Whether it listens while the assistant speaks
+            
+        Returns:
+            The endpointer
+        """
+        min_speech_ms = int(self.vad_config.get('min_speech_ms', 200))
+        if barge_in:
+            # Coughs and backchannel noises should not interrupt the assistant
+            min_speech_ms = max(min_speech_ms, self.barge_in_min_speech_ms)
+        
+        return Endpointer(
+            self.vad,
+            trailing_silence_ms=int(self.vad_config.get('trailing_silence_ms', 700)),
+            min_speech_ms=min_speech_ms,
+            max_duration=max_duration,
+            padding_ms=int(self.vad_config.get('padding_ms', 100))
+        )
+    
+    async def _speak(self, session, speaking: Awaitable[Any]) -> Tuple[Any, bool, Optional[Any]]:
+        """
+        Speak to the caller while listening for them to barge in.
+        
+        If the caller starts talking, playback and any in-flight generation
+        are cancelled and the caller's utterance is captured in full. Speech
+        still too short to barge in when playback ends is kept for the next
+        capture.
+        
+        Args:
+            session: The telephony session object
+            speaking: Coroutine that plays the assistant's turn
+            
+        Returns:
+            Tuple of (result of speaking or None if interrupted, whether the
+            caller interrupted, the caller's captured audio if interrupted)
+        """
+        speak_task = asyncio.ensure_future(speaking)
+        
+        read_audio = getattr(session, 'read_audio', None)
+        if not self.barge_in_enabled or not asyncio.iscoroutinefunction(read_audio):
+            return await speak_task, False, None
+        
+        speech_started = asyncio.Event()
+        endpointer = self._create_endpointer(barge_in=True)
+        listen_task = asyncio.ensure_future(
+            self._capture_audio(session, speech_started=speech_started, endpointer=endpointer)
+        )
+        barge_in = asyncio.ensure_future(speech_started.wait())
+        
+        try:
+            await asyncio.wait({speak_task, barge_in}, return_when=asyncio.FIRST_COMPLETED)
+            
+            if not speech_started.is_set():
+                # The listener only touches the endpointer between reads
+                listen_task.cancel()
+                self._pending_speech = endpointer.pending_speech()
+                return speak_task.result(), False, None
+            
+            logger.info(f"Caller barged in on call {self.call_id}")
+            speak_task.cancel()
+            await self._stop_playback(session)
+            
+            return None, True, await listen_task
+        finally:
+            for task in (speak_task, listen_task, barge_in):
+                if not task.done():
+                    task.cancel()
+    
+    async def _stop_playback(self, session) -> None:
+        """
+        Stop any audio the session is playing to the caller.
+        
+        Args:
+            session: The telephony session object
+        """
+        stop_playback = getattr(session, 'stop_playback', None)
+        if not asyncio.iscoroutinefunction(stop_playback):
+            return
+        
+        try:
+            await stop_playback()
+        except Exception as e:
+            logger.error(f"Error stopping playback: {str(e)}", exc_info=True)
+    
+    async def _transcribe(self, audio: Any) -> str:
+        """
+        Transcribe a captured turn.
+        
+        When batching is enabled the utterance is decoded together with
+        those of other concurrent calls.
+        
+        Args:
+            audio: The captured audio
+            
+        Returns:
+            Transcription text
+        """
+        if self.stt_scheduler is not None:
+            return await self.stt_scheduler.transcribe(audio)
+        return await self.registry.run('stt', self.stt.transcribe, audio)
+    
+    async def _run_llm(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking LLM call as a live-call request.
+        
+        With the dispatcher enabled the call waits for a backend slot, ahead
+        of any background work.
+        
+        Args:
+            func: The blocking LLM callable
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            The callable's return value
+        """
+        return await self.registry.run_llm(GenerationDispatcher.PRIORITY_LIVE, func, *args, **kwargs)
+    
+    def _generate(self) -> Optional[str]:
+        """
+        Generate the reply to the conversation so far (blocking).
+        
+        Returns:
+            The generated reply, or None if generation failed
+        """
+        if self.prompt_session is not None:
+            return self.llm.generate_response(self.context.get_context(), session=self.prompt_session)
+        return self.llm.generate_response(self.context.get_context())
+    
+    def _maybe_summarize(self) -> None:
+        """
+        Start folding old turns into the running summary, if due.
+        
+        The summary is generated as background LLM work, so it never
+        delays the caller's next turn.
+        """
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        if not self.context.needs_summary():
+            return
+        
+        self._summary_task = asyncio.ensure_future(self.context.summarize(self._generate_summary))
+    
+    async def _generate_summary(self, messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Generate a conversation summary at background priority.
+        
+        Uses the async client, so a live turn needing the slot aborts the
+        summary request instead of waiting for it.
+        
+        Args:
+            messages: The summary request
+            
+        Returns:
+            The summary text, or None if generation failed
+        """
+        return await self.registry.agenerate(
+            GenerationDispatcher.PRIORITY_BACKGROUND, messages, {"temperature": 0.2}
+        )
+    
+    async def _lookup_faq(self, question: str) -> Optional[str]:
+        """
+        Look up the answer to a paraphrase of a FAQ already answered in this call.
+        
+        Only used while the conversation runs the faq_answering prompt. The
+        question is embedded as a live-call request through the dispatcher.
+        
+        Args:
+            question: The caller's question
+            
+        Returns:
+            The cached answer, or None
+        """
+        if self.semantic_cache is None or self.context.context_type != 'faq_answering':
+            return None
+        
+        answer = await self._run_llm(self.semantic_cache.get, question, namespace=self.faq_namespace)
+        if answer is not None:
+            logger.info("Answered FAQ from semantic cache")
+        return answer
+    
+    async def _remember_faq(self, question: str, answer: str) -> None:
+        """
+        Cache a generated FAQ answer for later paraphrases in this call.
+        
+        Args:
+            question: The caller's question
+            answer: The generated answer
+        """
+        if self.semantic_cache is None or self.context.context_type != 'faq_answering':
+            return
+        
+        await self._run_llm(self.semantic_cache.put, question, answer, namespace=self.faq_namespace)
+    
+    async def _play_response(self, session, text: str, audio_data: Optional[bytes] = None) -> None:
         """
         Converts text to speech and plays it to the caller.
         
         Args:
             session: The telephony session object
             text: The text to speak
+            audio_data: Already synthesized audio for the text, if available
         """
         try:
             # Convert text to speech
-            audio_data = self.tts.synthesize(text)
+            if audio_data is None:
+                audio_data = await self.registry.run('tts', self.tts.synthesize, text)
             
-            # In a real implementation, we would play this audio through the session
-            # Example: session.execute("playback", f"/tmp/{self.call_id}_response.wav")
-            
-            # This is a placeholder - actual implementation would use FreeSWITCH APIs
             logger.info(f"Playing response: {text}")
             
+            # Sessions from the telephony server play audio asynchronously
+            play_audio = getattr(session, 'play_audio', None)
+            if asyncio.iscoroutinefunction(play_audio):
+                await play_audio(audio_data)
+                return
+            
             # Simulate playback delay based on text length
             play_time = len(text.split()) * 0.3  # Rough estimate: 0.3 seconds per word
-            time.sleep(min(play_time, 10))  # Cap at 10 seconds for simulation
+            await asyncio.sleep(min(play_time, 10))  # Cap at 10 seconds for simulation
             
         except Exception as e:
             logger.error(f"Error playing response: {str(e)}", exc_info=True)
     
+    async def _stream_and_play_response(self, session, spoken: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Generates the LLM reply as a stream and plays each sentence as soon
+        as it is complete, while the rest of the reply is still generating.
+        Later sentences are synthesized while earlier ones play.
+        
+        Args:
+            session: The telephony session object
+            spoken: List the sentences are appended to once played, so the
+                spoken part is known even if the turn is cancelled
+            
+        Returns:
+            The full spoken response text, or None if nothing was generated
+        """
+        loop = asyncio.get_running_loop()
+        sentences: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        splitter = SentenceSplitter()
+        turn_start = time.time()
+        cancelled = threading.Event()
+        started = threading.Event()
+        
+        def on_chunk(chunk_text: str) -> None:
+            # Runs on the LLM worker thread
+            for sentence in splitter.feed(chunk_text):
+                loop.call_soon_threadsafe(sentences.put_nowait, sentence)
+        
+        def generate() -> bool:
+            started.set()
+            try:
+                if self.prompt_session is not None:
+                    return self.llm.stream_response(
+                        self.context.get_context(), on_chunk, cancel_event=cancelled, session=self.prompt_session
+                    )
+                return self.llm.stream_response(self.context.get_context(), on_chunk, cancel_event=cancelled)
+            except Exception as e:
+                logger.error(f"Error streaming response: {str(e)}", exc_info=True)
+                return False
+            finally:
+                remainder = splitter.flush()
+                if remainder:
+                    loop.call_soon_threadsafe(sentences.put_nowait, remainder)
+                # Sentinel: generation finished
+                loop.call_soon_threadsafe(sentences.put_nowait, None)
+        
+        synthesized: asyncio.Queue = asyncio.Queue()
+        syntheses: List[asyncio.Future] = []
+        
+        async def synthesize_sentences() -> None:
+            # Start synthesis as soon as each sentence arrives so the next
+            # sentence is ready by the time the current one finishes playing
+            while True:
+                sentence = await sentences.get()
+                if sentence is None:
+                    await synthesized.put(None)
+                    return
+                synthesis = asyncio.ensure_future(self.registry.run('tts', self.tts.synthesize, sentence))
+                syntheses.append(synthesis)
+                await synthesized.put((sentence, synthesis))
+        
+        def on_generation_done(_) -> None:
+            # generate() queues the sentinel itself once it has run; if the
+            # request failed or was cancelled before that, queue it here
+            if not started.is_set():
+                sentences.put_nowait(None)
+        
+        generation = asyncio.ensure_future(self._run_llm(generate))
+        generation.add_done_callback(on_generation_done)
+        feeder = asyncio.ensure_future(synthesize_sentences())
+        
+        if spoken is None:
+            spoken = []
+        try:
+            while True:
+                item = await synthesized.get()
+                if item is None:
+                    break
+                
+                sentence, synthesis = item
+                audio_data = await synthesis
+                if not spoken:
+                    logger.info(f"Time to first audio: {time.time() - turn_start:.2f}s")
+                
+                await self._play_response(session, sentence, audio_data=audio_data)
+                spoken.append(sentence)
+            
+            completed = False
+            if generation.cancelled():
+                logger.warning(f"Streaming generation was cancelled for call {self.call_id}")
+            else:
+                try:
+                    completed = await generation
+                except Exception as e:
+                    logger.error(f"Error dispatching streaming generation: {str(e)}", exc_info=True)
+            if not completed:
+                logger.warning(f"Streaming generation did not complete for call {self.call_id}")
+        finally:
+            # Also stops the worker thread if the turn was interrupted
+            cancelled.set()
+            feeder.cancel()
+            generation.cancel()
+            
+            # Drop synthesis of sentences that will never be played; jobs
+            # still queued on the TTS executor are removed from it
+            for synthesis in syntheses:
+                if not synthesis.done():
+                    synthesis.cancel()
+        
+        if not spoken:
+            return None
+        return " ".join(spoken)
+    
     def _should_end_call(self, text: str) -> bool:
         """
         Determines if the call should be ended based on the user's input.
@@ -43,8 +43,9 @@ def handler(session, args):
         session.execute("sleep", "500")
         session.execute("playback", "ivr/ivr-hello.wav")
         
-        # Start audio stream to our STT system
-        session.execute("audio_fork", "start api:127.0.0.1:8021 fork_uuid")
+        # Start audio stream to the media server
+        api = freeswitch.API()
+        api.executeString(f"uuid_audio_fork {call_id} start ws://127.0.0.1:8085/calls/{call_id} mono 8k")
         
         # Create the call handler instance
         handler = CallHandler(call_metadata)
@@ -58,7 +59,7 @@ def handler(session, args):
         session.execute("playback", "ivr/ivr-call_cannot_be_completed_as_dialed.wav")
     finally:
         # Cleanup
-        session.execute("audio_fork", "stop")
+        freeswitch.API().executeString(f"uuid_audio_fork {call_id} stop")
         freeswitch.consoleLog("info", f"Call completed: {call_id}\n")
 
 # This is the entry point that FreeSWITCH calls
@@ -0,0 +1,304 @@
+"""
+Live call media ingestion.
+Receives audio forked from FreeSWITCH channels (mod_audio_fork over
+WebSocket, or a plain TCP stream) and demultiplexes it by call UUID into
+per-call ring buffers that call handlers read from.
+"""
+import json
+import asyncio
+import logging
+from typing import Dict, Optional, Any
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+class MediaStream:
+    """
+    Byte ring buffer of one call's inbound audio.
+    
+    Readers get memoryview slices of the buffer rather than copies. A slice
+    is only valid until the next await, since the writer reuses the storage;
+    decode it before yielding to the event loop.
+    """
+    
+    def __init__(self, call_id: str, capacity: int = 160000, frame_size: int = 2):
+        """
+        Initialize the stream.
+        
+        Args:
+            call_id: UUID of the call the audio belongs to
+            capacity: Buffer size in bytes (default: 10 s of 8 kHz 16-bit mono)
+            frame_size: Bytes per sample frame; reads are aligned to it
+        """
+        self.call_id = call_id
+        self.capacity = capacity - (capacity % frame_size)
+        self.frame_size = frame_size
+        
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        
+        # Absolute byte positions; the buffered bytes are [read_pos, write_pos)
+        self.write_pos = 0
+        self.read_pos = 0
+        self.dropped_bytes = 0
+        
+        self.closed = False
+        self._data_available = asyncio.Event()
+    
+    @property
+    def available(self) -> int:
+        """Number of buffered bytes that have not been read."""
+        return self.write_pos - self.read_pos
+    
+    def write(self, data: bytes) -> None:
+        """
+        Append inbound audio.
+        
+        If the reader falls more than a buffer behind, the oldest audio is
+        dropped.
+        
+        Args:
+            data: Raw audio bytes
+        """
+        if self.closed or not data:
+            return
+        
+        data = memoryview(data)
+        if len(data) > self.capacity:
+            # Only the newest audio fits; the overrun check below accounts for the rest
+            self.write_pos += len(data) - self.capacity
+            data = data[-self.capacity:]
+        
+        start = self.write_pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        self._view[:len(data) - first] = data[first:]
+        self.write_pos += len(data)
+        
+        overrun = self.available - self.capacity
+        if overrun > 0:
+            # Keep reads frame aligned when skipping ahead
+            overrun += (-overrun) % self.frame_size
+            self.read_pos += overrun
+            self.dropped_bytes += overrun
+            logger.warning(f"Media buffer overrun on call {self.call_id}, dropped {overrun} bytes")
+        
+        self._data_available.set()
+    
+    async def read(self, max_bytes: int) -> memoryview:
+        """
+        Wait for audio and return a view of up to max_bytes of it.
+        
+        Args:
+            max_bytes: Maximum number of bytes to return
+        
+        Returns:
+            A frame-aligned memoryview into the buffer, or an empty view once
+            the stream is closed and drained
+        """
+        while self.available < self.frame_size:
+            if self.closed:
+                return memoryview(b"")
+            self._data_available.clear()
+            await self._data_available.wait()
+        
+        start = self.read_pos % self.capacity
+        # Contiguous region only; a read never wraps around the buffer end
+        length = min(max_bytes, self.available, self.capacity - start)
+        length -= length % self.frame_size
+        
+        self.read_pos += length
+        return self._view[start:start + length]
+    
+    def close(self) -> None:
+        """
+        Mark the end of the stream and wake any reader.
+        """
+        self.closed = True
+        self._data_available.set()
+
+
+class MediaServer:
+    """
+    Accepts forked call audio from many channels on one event loop.
+    
+    WebSocket clients identify the call by the last path segment of the URL
+    (ws://host:port/calls/<uuid>) or by a 'uuid'/'call_id' field in an initial
+    JSON text frame, then send binary frames of 16-bit linear PCM. TCP
+    clients send the call UUID on the first line followed by raw PCM.
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the media server.
+        
+        Args:
+            config: The telephony.media configuration section
+        """
+        config = config or {}
+        self.host = config.get('host', '127.0.0.1')
+        self.websocket_port = int(config.get('websocket_port', 8085))
+        self.tcp_port = config.get('tcp_port', 8086)
+        self.sample_rate = int(config.get('sample_rate', 8000))
+        self.buffer_seconds = float(config.get('buffer_seconds', 10.0))
+        
+        self.streams: Dict[str, MediaStream] = {}
+        self._servers = []
+    
+    @property
+    def fork_url_template(self) -> str:
+        """URL mod_audio_fork should stream a call to ({call_id} is filled in)."""
+        return f"ws://{self.host}:{self.websocket_port}/calls/{{call_id}}"
+    
+    def get_stream(self, call_id: str) -> MediaStream:
+        """
+        Get the media stream of a call, creating it if needed.
+        
+        Either side may arrive first: the call handler asking for audio or
+        the fork connection delivering it.
+        
+        Args:
+            call_id: UUID of the call
+        
+        Returns:
+            The call's media stream
+        """
+        stream = self.streams.get(call_id)
+        if stream is None:
+            capacity = int(self.sample_rate * self.buffer_seconds) * 2
+            stream = MediaStream(call_id, capacity=capacity)
+            self.streams[call_id] = stream
+        return stream
+    
+    def release(self, call_id: str) -> None:
+        """
+        Close and forget the media stream of a finished call.
+        
+        Args:
+            call_id: UUID of the call
+        """
+        stream = self.streams.pop(call_id, None)
+        if stream is not None:
+            stream.close()
+    
+    async def start(self) -> None:
+        """
+        Start the WebSocket and TCP listeners.
+        """
+        self._servers.append(await websockets.serve(self._handle_websocket, self.host, self.websocket_port))
+        logger.info(f"Media server accepting audio forks on ws://{self.host}:{self.websocket_port}")
+        
+        if self.tcp_port:
+            self._servers.append(await asyncio.start_server(self._handle_tcp, self.host, int(self.tcp_port)))
+            logger.info(f"Media server accepting raw audio on tcp://{self.host}:{self.tcp_port}")
+    
+    async def stop(self) -> None:
+        """
+        Stop the listeners and close all streams.
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        
+        for call_id in list(self.streams):
+            self.release(call_id)
+    
+    async def _handle_websocket(self, websocket, path: Optional[str] = None) -> None:
+        """
+        Receive one forked channel over WebSocket.
+        
+        Args:
+            websocket: The WebSocket connection
+            path: Request path (only passed by older websockets versions)
+        """
+        if path is None:
+            request = getattr(websocket, 'request', None)
+            path = getattr(request, 'path', None) or getattr(websocket, 'path', '') or ''
+        
+        parts = path.split('?', 1)[0].strip('/').split('/')
+        call_id = parts[1] if len(parts) == 2 and parts[0] == 'calls' else None
+        stream = self.get_stream(call_id) if call_id else None
+        
+        try:
+            async for message in websocket:
+                if isinstance(message, (bytes, bytearray, memoryview)):
+                    if stream is None:
+                        logger.warning("Dropping audio from fork without a call UUID")
+                        continue
+                    stream.write(message)
+                elif stream is None:
+                    # mod_audio_fork sends its metadata as the first text frame
+                    call_id = self._call_id_from_metadata(message)
+                    if call_id:
+                        stream = self.get_stream(call_id)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"Error receiving forked audio: {str(e)}", exc_info=True)
+        finally:
+            if stream is not None:
+                logger.info(f"Audio fork for call {stream.call_id} closed")
+                self._close_stream(stream)
+    
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Receive one call's audio over a raw TCP connection.
+        
+        Args:
+            reader: Stream reader of the connection
+            writer: Stream writer of the connection
+        """
+        stream = None
+        try:
+            call_id = (await reader.readline()).decode('utf-8').strip()
+            if not call_id:
+                return
+            stream = self.get_stream(call_id)
+            
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                stream.write(data)
+        except Exception as e:
+            logger.error(f"Error receiving TCP audio: {str(e)}", exc_info=True)
+        finally:
+            if stream is not None:
+                self._close_stream(stream)
+            writer.close()
+    
+    def _close_stream(self, stream: MediaStream) -> None:
+        """
+        Close the stream of a finished fork connection and stop tracking it.
+        
+        The call handler keeps its own reference and can still drain the
+        buffered audio.
+        
+        Args:
+            stream: The connection's media stream
+        """
+        stream.close()
+        if self.streams.get(stream.call_id) is stream:
+            del self.streams[stream.call_id]
+    
+    @staticmethod
+    def _call_id_from_metadata(message: str) -> Optional[str]:
+        """
+        Extract the call UUID from a fork metadata frame.
+        
+        Args:
+            message: Text frame contents
+        
+        Returns:
+            The call UUID, if present
+        """
+        try:
+            metadata = json.loads(message)
+        except (TypeError, ValueError):
+            return None
+        
+        if not isinstance(metadata, dict):
+            return None
+        return metadata.get('uuid') or metadata.get('call_id')
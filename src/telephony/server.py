@@ -0,0 +1,579 @@
+"""
+Asyncio telephony server.
+Accepts FreeSWITCH outbound event socket connections (one per call) and
+runs every call's CallHandler on a single event loop, with admission
+control so the box never takes on more calls than it can serve.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from urllib.parse import unquote
+from typing import Deque, Dict, Optional, Any, Tuple
+
+from src.telephony.call_handler import CallHandler
+from src.telephony.media_server import MediaServer, MediaStream
+from src.model_registry import ModelRegistry, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+class EslSession:
+    """
+    One call's FreeSWITCH outbound event socket connection.
+    """
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 audio_dir: str = "/tmp/ai-call-secretary"):
+        """
+        Initialize the session.
+        
+        Args:
+            reader: Stream reader of the socket connection
+            writer: Stream writer of the socket connection
+            audio_dir: Directory for synthesized audio handed to FreeSWITCH
+        """
+        self.reader = reader
+        self.writer = writer
+        self.audio_dir = audio_dir
+        
+        self.channel: Dict[str, str] = {}
+        self.active = False
+        
+        # Inbound audio, fed by the media server once the fork is running
+        self.media: Optional[MediaStream] = None
+        self.read_chunk_bytes = 320  # 20 ms of 8 kHz 16-bit mono
+        
+        # One future per command sent, resolved by the replies in order;
+        # replies read before their command was registered wait in _unclaimed
+        self._replies: Deque[asyncio.Future] = deque()
+        self._unclaimed: Deque[str] = deque()
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._command_lock = asyncio.Lock()
+        self._reader_task: Optional[asyncio.Task] = None
+    
+    @property
+    def call_id(self) -> str:
+        """The FreeSWITCH channel UUID."""
+        return self.channel.get('Unique-ID', 'unknown')
+    
+    async def connect(self) -> None:
+        """
+        Perform the outbound socket handshake and subscribe to channel events.
+        """
+        self.writer.write(b"connect\n\n")
+        await self.writer.drain()
+        
+        # The reply to "connect" carries the channel data
+        self.channel, _ = await self._read_message()
+        self.active = True
+        
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        
+        await self.command("myevents")
+        await self.command("linger")
+        
+        logger.info(f"Event socket connected for call {self.call_id}")
+    
+    def call_metadata(self) -> Dict[str, Any]:
+        """
+        Build CallHandler metadata from the channel data.
+        
+        Returns:
+            Call metadata dictionary
+        """
+        return {
+            'call_id': self.call_id,
+            'caller_number': self.channel.get('Caller-Caller-ID-Number', 'unknown'),
+            'caller_name': self.channel.get('Caller-Caller-ID-Name') or 'Unknown',
+            'timestamp': time.time(),
+            'direction': 'inbound'
+        }
+    
+    async def command(self, command: str, headers: Optional[Dict[str, str]] = None) -> str:
+        """
+        Send a command and wait for its reply.
+        
+        The reply slot is queued with the command, so a command cancelled
+        while waiting still consumes its own reply and later commands are
+        not handed replies meant for earlier ones.
+        
+        Args:
+            command: The event socket command
+            headers: Additional command headers
+        
+        Returns:
+            The Reply-Text of the command
+        """
+        lines = [command]
+        for key, value in (headers or {}).items():
+            lines.append(f"{key}: {value}")
+        payload = "\n".join(lines) + "\n\n"
+        
+        if self._reader_task is not None and self._reader_task.done():
+            # The socket is gone; no reply would ever arrive
+            return "-ERR disconnected"
+        
+        reply = asyncio.get_running_loop().create_future()
+        async with self._command_lock:
+            if self._unclaimed:
+                reply.set_result(self._unclaimed.popleft())
+            else:
+                self._replies.append(reply)
+            self.writer.write(payload.encode('utf-8'))
+            await self.writer.drain()
+        return await reply
+    
+    async def execute(self, app: str, arg: str = "", wait: bool = True) -> bool:
+        """
+        Execute a dialplan application on the channel.
+        
+        Args:
+            app: Application name (e.g. 'answer', 'playback')
+            arg: Application argument
+            wait: Wait until the application has finished
+        
+        Returns:
+            True if the application was accepted, False otherwise
+        """
+        event_uuid = str(uuid.uuid4())
+        waiter = None
+        if wait:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[event_uuid] = waiter
+        
+        try:
+            reply = await self.command("sendmsg", {
+                'call-command': 'execute',
+                'execute-app-name': app,
+                'execute-app-arg': arg,
+                'Event-UUID': event_uuid
+            })
+            
+            if not reply.startswith('+OK'):
+                logger.warning(f"Failed to execute {app} on call {self.call_id}: {reply}")
+                return False
+            
+            if waiter is not None:
+                await waiter
+            return True
+        finally:
+            # Completed waiters are removed by the event; cancelled ones here
+            self._waiters.pop(event_uuid, None)
+    
+    async def start_audio_fork(self, url: str, sample_rate: int = 8000) -> bool:
+        """
+        Start forking the caller's audio to the media server.
+        
+        Args:
+            url: WebSocket URL for this call on the media server
+            sample_rate: Sample rate to fork at
+            
+        Returns:
+            True if the fork was started
+        """
+        self.read_chunk_bytes = int(sample_rate * 0.02) * 2
+        reply = await self.command(f"api uuid_audio_fork {self.call_id} start {url} mono {sample_rate // 1000}k")
+        if not reply.startswith('+OK'):
+            logger.error(f"Failed to start audio fork for call {self.call_id}: {reply}")
+            return False
+        return True
+    
+    async def read_audio(self) -> memoryview:
+        """
+        Read the next chunk of the caller's audio.
+        
+        Returns:
+            A view of up to 20 ms of 16-bit PCM from the call's media buffer;
+            empty once the audio feed has ended. Valid until the next await.
+        """
+        if self.media is not None:
+            chunk = await self.media.read(self.read_chunk_bytes)
+            if chunk:
+                return chunk
+        
+        # No audio feed; pace callers to real time instead of spinning
+        await asyncio.sleep(0.02)
+        return memoryview(b"")
+    
+    async def play_audio(self, audio_data: bytes) -> None:
+        """
+        Play synthesized audio to the caller and wait until it has finished.
+        
+        Args:
+            audio_data: WAV audio data
+        """
+        if not audio_data or not self.active:
+            return
+        
+        path = os.path.join(self.audio_dir, f"{self.call_id}-{uuid.uuid4().hex}.wav")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_file, path, audio_data)
+        
+        try:
+            await self.execute("playback", path)
+        finally:
+            await loop.run_in_executor(None, self._remove_file, path)
+    
+    async def stop_playback(self) -> None:
+        """
+        Interrupt whatever is playing on the channel.
+        """
+        if not self.active:
+            return
+        
+        reply = await self.command(f"api uuid_break {self.call_id} all")
+        if not reply.startswith('+OK'):
+            logger.warning(f"Failed to stop playback on call {self.call_id}: {reply}")
+    
+    async def hangup(self, cause: str = "NORMAL_CLEARING") -> None:
+        """
+        Hang up the call.
+        
+        Args:
+            cause: FreeSWITCH hangup cause
+        """
+        if not self.active:
+            return
+        
+        try:
+            await self.command("sendmsg", {'call-command': 'hangup', 'hangup-cause': cause})
+        except Exception as e:
+            logger.error(f"Error hanging up call {self.call_id}: {str(e)}", exc_info=True)
+        self.active = False
+    
+    async def close(self) -> None:
+        """
+        Close the socket connection.
+        """
+        self.active = False
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+    
+    async def _read_message(self) -> Tuple[Dict[str, str], bytes]:
+        """
+        Read one event socket message.
+        
+        Returns:
+            Tuple of (headers, body)
+        """
+        headers: Dict[str, str] = {}
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("Event socket closed")
+            
+            line = line.decode('utf-8').rstrip('\r\n')
+            if not line:
+                if headers:
+                    break
+                continue
+            
+            key, _, value = line.partition(':')
+            headers[key.strip()] = unquote(value.strip())
+        
+        body = b""
+        length = int(headers.get('Content-Length', 0))
+        if length:
+            body = await self.reader.readexactly(length)
+        
+        return headers, body
+    
+    async def _read_loop(self) -> None:
+        """
+        Dispatch command replies and channel events until the socket closes.
+        """
+        try:
+            while True:
+                headers, body = await self._read_message()
+                content_type = headers.get('Content-Type')
+                
+                if content_type in ('command/reply', 'api/response'):
+                    text = headers.get('Reply-Text') or body.decode('utf-8', 'replace')
+                    if not self._replies:
+                        self._unclaimed.append(text)
+                        continue
+                    
+                    reply = self._replies.popleft()
+                    # Cancelled commands still take their reply off the line
+                    if not reply.done():
+                        reply.set_result(text)
+                elif content_type == 'text/event-plain':
+                    self._handle_event(self._parse_event(body))
+                elif content_type == 'text/disconnect-notice':
+                    self._set_inactive()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading event socket for call {self.call_id}: {str(e)}", exc_info=True)
+        finally:
+            self._set_inactive()
+            
+            # Unblock commands waiting for replies that will never come
+            while self._replies:
+                reply = self._replies.popleft()
+                if not reply.done():
+                    reply.set_result("-ERR disconnected")
+    
+    def _handle_event(self, event: Dict[str, str]) -> None:
+        """
+        Handle a channel event.
+        
+        Args:
+            event: Event headers
+        """
+        event_name = event.get('Event-Name')
+        
+        if event_name == 'CHANNEL_EXECUTE_COMPLETE':
+            waiter = self._waiters.pop(event.get('Application-UUID', ''), None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(event)
+        elif event_name in ('CHANNEL_HANGUP', 'CHANNEL_HANGUP_COMPLETE'):
+            logger.info(f"Call {self.call_id} hung up: {event.get('Hangup-Cause', 'unknown')}")
+            self._set_inactive()
+    
+    def _set_inactive(self) -> None:
+        """
+        Mark the channel as gone and release anything waiting on it.
+        """
+        self.active = False
+        if self.media is not None:
+            self.media.close()
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters = {}
+    
+    @staticmethod
+    def _parse_event(body: bytes) -> Dict[str, str]:
+        """
+        Parse a text/event-plain body.
+        
+        Args:
+            body: Raw event body
+        
+        Returns:
+            Event headers
+        """
+        event = {}
+        for line in body.decode('utf-8', 'replace').split('\n'):
+            if not line.strip():
+                break
+            key, _, value = line.partition(':')
+            event[key.strip()] = unquote(value.strip())
+        return event
+    
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+class CallScheduler:
+    """
+    Admission control for concurrent calls.
+    
+    At most max_active_calls run at once. Up to max_pending_calls more may
+    wait admission_timeout seconds for a slot; anything beyond that is
+    rejected immediately so callers get a busy signal instead of silence.
+    """
+    
+    def __init__(self, max_active_calls: int = 50, max_pending_calls: int = 10,
+                 admission_timeout: float = 2.0):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            max_active_calls: Maximum number of calls handled concurrently
+            max_pending_calls: Maximum number of calls waiting for a slot
+            admission_timeout: Seconds a call may wait for a slot
+        """
+        self.max_active_calls = max_active_calls
+        self.max_pending_calls = max_pending_calls
+        self.admission_timeout = admission_timeout
+        
+        self.active_calls = 0
+        self.pending_calls = 0
+        self.rejected_calls = 0
+        
+        self._slots = asyncio.Semaphore(max_active_calls)
+    
+    async def admit(self) -> bool:
+        """
+        Wait for a call slot.
+        
+        Returns:
+            True if the call was admitted, False if it should be rejected
+        """
+        if self._slots.locked() and self.pending_calls >= self.max_pending_calls:
+            self.rejected_calls += 1
+            return False
+        
+        self.pending_calls += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_calls += 1
+            return False
+        finally:
+            self.pending_calls -= 1
+        
+        self.active_calls += 1
+        return True
+    
+    def release(self) -> None:
+        """
+        Release the slot of a finished call.
+        """
+        self.active_calls -= 1
+        self._slots.release()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get current admission statistics.
+        
+        Returns:
+            Dictionary of active, pending and rejected call counts
+        """
+        return {
+            'active_calls': self.active_calls,
+            'pending_calls': self.pending_calls,
+            'rejected_calls': self.rejected_calls
+        }
+
+
+class TelephonyServer:
+    """
+    Runs many CallHandler sessions concurrently on one event loop.
+    """
+    
+    def __init__(self, registry: Optional[ModelRegistry] = None, config_path: Optional[str] = None):
+        """
+        Initialize the telephony server.
+        
+        Args:
+            registry: Model registry shared by all calls
+            config_path: Path to the configuration file (if no registry is given)
+        """
+        self.registry = registry or get_model_registry(config_path)
+        
+        server_config = self.registry.config.get('telephony', {}).get('server', {}) or {}
+        self.host = server_config.get('host', '127.0.0.1')
+        self.port = int(server_config.get('port', 8084))
+        self.max_active_calls = int(server_config.get('max_active_calls', 50))
+        self.max_pending_calls = int(server_config.get('max_pending_calls', 10))
+        self.admission_timeout = float(server_config.get('admission_timeout', 2.0))
+        self.audio_dir = server_config.get('audio_dir', '/tmp/ai-call-secretary')
+        
+        # Caller audio arrives separately, forked from each channel
+        self.media = MediaServer(self.registry.config.get('telephony', {}).get('media', {}))
+        
+        self.scheduler: Optional[CallScheduler] = None
+        self.calls: Dict[str, asyncio.Task] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self) -> None:
+        """
+        Start listening for call connections.
+        """
+        self.scheduler = CallScheduler(
+            max_active_calls=self.max_active_calls,
+            max_pending_calls=self.max_pending_calls,
+            admission_timeout=self.admission_timeout
+        )
+        await self.media.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(
+            f"Telephony server listening on {self.host}:{self.port} "
+            f"(max {self.max_active_calls} active calls)"
+        )
+    
+    async def serve_forever(self) -> None:
+        """
+        Start the server and run until cancelled.
+        """
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+    
+    async def stop(self) -> None:
+        """
+        Stop accepting calls and cancel the calls in progress.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        
+        for task in list(self.calls.values()):
+            task.cancel()
+        if self.calls:
+            await asyncio.gather(*self.calls.values(), return_exceptions=True)
+        
+        await self.media.stop()
+        await self.registry.ashutdown()
+        logger.info("Telephony server stopped")
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Handle one call connection from FreeSWITCH.
+        
+        Args:
+            reader: Stream reader of the connection
+            writer: Stream writer of the connection
+        """
+        session = EslSession(reader, writer, self.audio_dir)
+        try:
+            await session.connect()
+        except Exception as e:
+            logger.error(f"Event socket handshake failed: {str(e)}", exc_info=True)
+            await session.close()
+            return
+        
+        if not await self.scheduler.admit():
+            logger.warning(f"Rejecting call {session.call_id}: at capacity {self.scheduler.get_stats()}")
+            await session.hangup("USER_BUSY")
+            await session.close()
+            return
+        
+        call_id = session.call_id
+        self.calls[call_id] = asyncio.current_task()
+        try:
+            await session.execute("answer")
+            
+            session.media = self.media.get_stream(call_id)
+            await session.start_audio_fork(
+                self.media.fork_url_template.format(call_id=call_id), self.media.sample_rate
+            )
+            
+            handler = CallHandler(session.call_metadata(), registry=self.registry)
+            await handler.handle_call(session)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error handling call {call_id}: {str(e)}", exc_info=True)
+        finally:
+            self.calls.pop(call_id, None)
+            self.media.release(call_id)
+            self.scheduler.release()
+            await session.hangup()
+            await session.close()
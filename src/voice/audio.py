@@ -0,0 +1,295 @@
+"""
+In-memory audio decoding for the speech pipeline.
+Turns WAV or raw PCM bytes from the telephony leg into the float32 16 kHz
+mono waveform Whisper expects, without temp files or an ffmpeg subprocess.
+"""
+import struct
+import logging
+import numpy as np
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sample rate Whisper models are trained on
+WHISPER_SAMPLE_RATE = 16000
+
+# WAVE format tags
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_ALAW = 6
+WAVE_FORMAT_MULAW = 7
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def _build_mulaw_table() -> np.ndarray:
+    """Build the G.711 mu-law to float32 lookup table."""
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    values = np.where(sign != 0, -magnitude, magnitude)
+    return (values / 32768.0).astype(np.float32)
+
+def _build_alaw_table() -> np.ndarray:
+    """Build the G.711 A-law to float32 lookup table."""
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0)
+    )
+    values = np.where(sign != 0, magnitude, -magnitude)
+    return (values / 32768.0).astype(np.float32)
+
+_MULAW_TABLE = _build_mulaw_table()
+_ALAW_TABLE = _build_alaw_table()
+
+def pcm_to_float32(data: bytes, sample_width: int = 2, format_tag: int = WAVE_FORMAT_PCM) -> np.ndarray:
+    """
+    Convert interleaved PCM samples to a float32 array in [-1.0, 1.0].
+    
+    The bytes are viewed in place with np.frombuffer; the only copy made is
+    the conversion to float32.
+    
+    Args:
+        data: Raw sample bytes (little-endian)
+        sample_width: Bytes per sample
+        format_tag: WAVE format tag of the samples
+    
+    Returns:
+        Float32 samples
+    """
+    # Drop a trailing partial sample rather than failing on it
+    usable = len(data) - (len(data) % sample_width)
+    buffer = memoryview(data)[:usable]
+    
+    if format_tag == WAVE_FORMAT_MULAW:
+        return _MULAW_TABLE[np.frombuffer(buffer, dtype=np.uint8)]
+    if format_tag == WAVE_FORMAT_ALAW:
+        return _ALAW_TABLE[np.frombuffer(buffer, dtype=np.uint8)]
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        dtype = '<f4' if sample_width == 4 else '<f8'
+        return np.frombuffer(buffer, dtype=dtype).astype(np.float32)
+    
+    if sample_width == 1:
+        # 8-bit WAV is unsigned
+        samples = np.frombuffer(buffer, dtype=np.uint8)
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    if sample_width == 2:
+        samples = np.frombuffer(buffer, dtype='<i2')
+        return samples.astype(np.float32) / 32768.0
+    if sample_width == 3:
+        raw = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = np.where(samples & 0x800000, samples - 0x1000000, samples)
+        return samples.astype(np.float32) / 8388608.0
+    if sample_width == 4:
+        samples = np.frombuffer(buffer, dtype='<i4')
+        return samples.astype(np.float32) / 2147483648.0
+    
+    raise ValueError(f"Unsupported sample width: {sample_width}")
+
+def is_wav(data: bytes) -> bool:
+    """
+    Check whether the bytes hold a RIFF/WAVE file.
+    
+    Args:
+        data: Audio bytes
+    
+    Returns:
+        True if the data starts with a WAVE header
+    """
+    return len(data) >= 12 and data[:4] == b'RIFF' and data[8:12] == b'WAVE'
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decode a WAV file held in memory.
+    
+    Args:
+        data: WAV file bytes
+    
+    Returns:
+        Tuple of (float32 mono samples, sample rate)
+    """
+    view = memoryview(data)
+    offset = 12
+    fmt = None
+    samples = None
+    
+    while offset + 8 <= len(data):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from('<I', data, offset + 4)[0]
+        body_start = offset + 8
+        
+        if chunk_id == b'fmt ':
+            format_tag, channels, sample_rate = struct.unpack_from('<HHI', data, body_start)
+            bits_per_sample = struct.unpack_from('<H', data, body_start + 14)[0]
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # The real format tag leads the sub-format GUID
+                format_tag = struct.unpack_from('<H', data, body_start + 24)[0]
+            fmt = (format_tag, channels, sample_rate, bits_per_sample // 8)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("WAV data chunk precedes fmt chunk")
+            # Streamed WAVs may carry a placeholder size; clamp to what we have
+            samples = view[body_start:min(body_start + chunk_size, len(data))]
+            break
+        
+        # Chunks are word aligned
+        offset = body_start + chunk_size + (chunk_size & 1)
+    
+    if fmt is None or samples is None:
+        raise ValueError("Invalid WAV data: missing fmt or data chunk")
+    
+    format_tag, channels, sample_rate, sample_width = fmt
+    audio = pcm_to_float32(samples, sample_width, format_tag)
+    return to_mono(audio, channels), sample_rate
+
+def to_mono(audio: np.ndarray, channels: int) -> np.ndarray:
+    """
+    Downmix interleaved samples to mono.
+    
+    Args:
+        audio: Interleaved float32 samples
+        channels: Number of channels
+    
+    Returns:
+        Mono float32 samples
+    """
+    if channels <= 1:
+        return audio
+    
+    frames = len(audio) // channels
+    return audio[:frames * channels].reshape(frames, channels).mean(axis=1, dtype=np.float32)
+
+def resample(audio: np.ndarray, orig_rate: int, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample audio with vectorized linear interpolation.
+    
+    Telephony audio is band-limited to well under the 8 kHz Nyquist limit
+    of the 16 kHz target, so interpolation is sufficient for upsampling.
+    
+    Args:
+        audio: Float32 mono samples
+        orig_rate: Sample rate of the input
+        target_rate: Desired sample rate
+    
+    Returns:
+        Resampled float32 samples
+    """
+    if orig_rate == target_rate or len(audio) == 0:
+        return audio
+    
+    target_length = int(round(len(audio) * target_rate / orig_rate))
+    positions = np.arange(target_length, dtype=np.float64) * (orig_rate / target_rate)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+def decode_audio(data: bytes, sample_rate: int = 8000, sample_width: int = 2,
+                 channels: int = 1, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode WAV or raw PCM bytes into a float32 mono waveform at target_rate.
+    
+    Args:
+        data: WAV file bytes, or raw little-endian PCM
+        sample_rate: Sample rate of raw PCM input
+        sample_width: Bytes per sample of raw PCM input
+        channels: Channel count of raw PCM input
+        target_rate: Sample rate of the returned waveform
+    
+    Returns:
+        Float32 waveform
+    """
+    if is_wav(data):
+        audio, sample_rate = decode_wav(data)
+    else:
+        audio = to_mono(pcm_to_float32(data, sample_width), channels)
+    
+    return resample(audio, sample_rate, target_rate)
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity float32 ring buffer holding the most recent audio.
+    
+    Writes copy into preallocated storage, so a long-running stream never
+    reallocates; once full, the oldest samples are overwritten.
+    """
+    
+    def __init__(self, capacity: int):
+        """
+        Initialize the ring buffer.
+        
+        Args:
+            capacity: Maximum number of samples held
+        """
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self._start = 0
+        self._size = 0
+        
+        # Samples written since creation, including overwritten ones
+        self.total_written = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def start_offset(self) -> int:
+        """Stream position (in samples) of the oldest buffered sample."""
+        return self.total_written - self._size
+    
+    def write(self, samples: np.ndarray) -> None:
+        """
+        Append samples, overwriting the oldest ones when full.
+        
+        Args:
+            samples: Float32 samples to append
+        """
+        count = len(samples)
+        self.total_written += count
+        if count >= self.capacity:
+            samples = samples[-self.capacity:]
+            count = self.capacity
+        
+        end = (self._start + self._size) % self.capacity
+        first = min(count, self.capacity - end)
+        self._buffer[end:end + first] = samples[:first]
+        self._buffer[:count - first] = samples[first:]
+        
+        self._size += count
+        if self._size > self.capacity:
+            overflow = self._size - self.capacity
+            self._start = (self._start + overflow) % self.capacity
+            self._size = self.capacity
+    
+    def read(self) -> np.ndarray:
+        """
+        Get the buffered samples, oldest first.
+        
+        Returns:
+            Contiguous copy of the buffered samples
+        """
+        end = self._start + self._size
+        if end <= self.capacity:
+            return self._buffer[self._start:end].copy()
+        return np.concatenate((self._buffer[self._start:], self._buffer[:end - self.capacity]))
+    
+    def discard(self, count: int) -> None:
+        """
+        Drop the oldest samples.
+        
+        Args:
+            count: Number of samples to drop
+        """
+        count = max(0, min(count, self._size))
+        self._start = (self._start + count) % self.capacity
+        self._size -= count
+    
+    def clear(self) -> None:
+        """
+        Drop all buffered samples.
+        """
+        self.discard(self._size)
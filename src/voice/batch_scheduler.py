@@ -0,0 +1,142 @@
+"""
+Cross-call micro-batching for speech recognition.
+Collects utterances from concurrent calls for a short window and
+transcribes them with one batched Whisper pass.
+"""
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TranscriptionBatchScheduler:
+    """
+    Queues utterances and decodes them together.
+    
+    The first utterance of a batch starts a max_batch_wait timer; the batch
+    is flushed when the timer fires or max_batch_size utterances are
+    waiting, whichever comes first. Each caller awaits its own future.
+    """
+    
+    def __init__(self, stt, max_batch_size: int = 4, max_batch_wait: float = 0.05,
+                 executor: Optional[Executor] = None):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            stt: Speech-to-text engine providing transcribe_batch()
+            max_batch_size: Maximum number of utterances per batch
+            max_batch_wait: Seconds to wait for more utterances before decoding
+            executor: Executor the batched decode runs on
+        """
+        self.stt = stt
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_wait = max_batch_wait
+        self.executor = executor
+        
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        
+        # Statistics
+        self.batches = 0
+        self.utterances = 0
+    
+    @classmethod
+    def from_config(cls, stt, batching_config: Dict[str, Any],
+                    executor: Optional[Executor] = None) -> "TranscriptionBatchScheduler":
+        """
+        Create a scheduler from the voice.stt.batching configuration section.
+        
+        Args:
+            stt: Speech-to-text engine
+            batching_config: The voice.stt.batching configuration
+            executor: Executor the batched decode runs on
+        
+        Returns:
+            Configured scheduler
+        """
+        return cls(
+            stt,
+            max_batch_size=int(batching_config.get('max_batch_size', 4)),
+            max_batch_wait=float(batching_config.get('max_batch_wait', 0.05)),
+            executor=executor
+        )
+    
+    async def transcribe(self, audio_data: Any) -> str:
+        """
+        Queue an utterance and wait for its transcription.
+        
+        Args:
+            audio_data: Utterance in any format accepted by SpeechToText.transcribe
+        
+        Returns:
+            Transcription text
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((audio_data, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_batch_wait, self._flush)
+        
+        return await future
+    
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Get batching statistics.
+        
+        Returns:
+            Dictionary with batch and utterance counts and the mean batch size
+        """
+        return {
+            'batches': self.batches,
+            'utterances': self.utterances,
+            'mean_batch_size': self.utterances / self.batches if self.batches else 0.0
+        }
+    
+    def _flush(self) -> None:
+        """
+        Start decoding the queued utterances as one batch.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending:
+            # Overflow starts the next batch window
+            self._timer = asyncio.get_running_loop().call_later(self.max_batch_wait, self._flush)
+        
+        batch = [(audio, future) for audio, future in batch if not future.cancelled()]
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+    
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """
+        Decode a batch and resolve each caller's future.
+        
+        Args:
+            batch: Queued (audio, future) pairs
+        """
+        loop = asyncio.get_running_loop()
+        start_time = time.time()
+        
+        try:
+            texts = await loop.run_in_executor(
+                self.executor, self.stt.transcribe_batch, [audio for audio, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Error transcribing batch: {str(e)}", exc_info=True)
+            texts = [""] * len(batch)
+        
+        self.batches += 1
+        self.utterances += len(batch)
+        logger.debug(f"Decoded batch of {len(batch)} utterances in {time.time() - start_time:.2f}s")
+        
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
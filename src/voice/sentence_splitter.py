@@ -0,0 +1,114 @@
+"""
+Incremental sentence splitting for streamed LLM output.
+Turns a stream of text deltas into complete sentences so speech synthesis
+can start on the first sentence while the rest is still being generated.
+"""
+import re
+from typing import List, Optional, Set
+
+# Sentence terminator, optional closing quotes/brackets, then whitespace
+_BOUNDARY_PATTERN = re.compile(r'([.!?]+)(["\')\]]*)(\s+)')
+
+# Tokens ending in a period that do not end a sentence
+DEFAULT_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "ave", "blvd",
+    "rd", "no", "vs", "etc", "e.g", "i.e", "a.m", "p.m", "approx", "dept",
+    "inc", "ltd", "co", "corp", "mt", "ft", "jan", "feb", "mar", "apr",
+    "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec"
+}
+
+
+class SentenceSplitter:
+    """
+    Accumulates streamed text and emits complete sentences as they appear.
+    """
+    
+    def __init__(self, min_length: int = 1, abbreviations: Optional[Set[str]] = None):
+        """
+        Initialize the splitter.
+        
+        Args:
+            min_length: Minimum sentence length in characters; shorter
+                sentences are merged into the following one
+            abbreviations: Lowercase tokens (without the trailing period)
+                that should not be treated as sentence endings
+        """
+        self.min_length = min_length
+        self.abbreviations = abbreviations if abbreviations is not None else DEFAULT_ABBREVIATIONS
+        self._buffer = ""
+        self._scan_from = 0
+    
+    def feed(self, text: str) -> List[str]:
+        """
+        Add a chunk of text and return any sentences completed by it.
+        
+        Args:
+            text: The next text delta from the stream
+        
+        Returns:
+            List of complete sentences (possibly empty)
+        """
+        if not text:
+            return []
+        
+        self._buffer += text
+        sentences = []
+        start = 0
+        
+        for match in _BOUNDARY_PATTERN.finditer(self._buffer, self._scan_from):
+            end = match.end(2)
+            if not self._is_boundary(match):
+                continue
+            
+            candidate = self._buffer[start:end].strip()
+            if len(candidate) < self.min_length:
+                continue
+            
+            sentences.append(candidate)
+            start = match.end()
+        
+        self._buffer = self._buffer[start:]
+        # Only rescan the tail that could still hold a boundary split across chunks
+        self._scan_from = max(0, len(self._buffer) - 8)
+        
+        return sentences
+    
+    def flush(self) -> Optional[str]:
+        """
+        Return whatever text remains once the stream is finished.
+        
+        Returns:
+            The trailing partial sentence, or None if nothing is buffered
+        """
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        self._scan_from = 0
+        return remainder or None
+    
+    def _is_boundary(self, match: "re.Match") -> bool:
+        """
+        Check whether a terminator match really ends a sentence.
+        
+        Args:
+            match: Boundary match within the buffer
+        
+        Returns:
+            True if the text should be split here
+        """
+        # Question and exclamation marks always end a sentence
+        if match.group(1) != ".":
+            return True
+        
+        # Find the word immediately before the period
+        prefix = self._buffer[:match.start(1)]
+        word = prefix.rsplit(None, 1)[-1] if prefix.strip() else ""
+        word = word.lstrip("\"'([").lower()
+        
+        if word in self.abbreviations:
+            return False
+        
+        # Single letters are usually initials ("J. Smith")
+        if len(word) == 1 and word.isalpha():
+            return False
+        
+        return True
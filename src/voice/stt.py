@@ -3,13 +3,17 @@ Speech-to-Text module using Whisper.
 Converts audio to text using the Whisper ASR model.
 """
 import os
+import asyncio
 import logging
-import tempfile
+import threading
 import yaml
 import numpy as np
-from typing import Optional, Dict, Any, Union
+from concurrent.futures import Executor
+from typing import Optional, Dict, Any, Union, List, AsyncIterator
 import whisper
 
+from src.voice.audio import decode_audio, AudioRingBuffer, WHISPER_SAMPLE_RATE
+
 logger = logging.getLogger(__name__)
 
 class SpeechToText:
@@ -35,11 +39,17 @@ class SpeechToText:
         self.device = "cpu"
         self.compute_type = "int8"
         
+        # Format of raw PCM bytes from the telephony leg (WAV bytes carry their own)
+        self.input_sample_rate = 8000
+        self.input_sample_width = 2
+        self.input_channels = 1
+        
         # Load configuration
         self._load_config()
         
         # Load model - defer until first use to save memory
         self.model = None
+        self._model_lock = threading.Lock()
         
         logger.info(f"STT initialized with model: {self.model_name}, language: {self.language}")
     
@@ -66,6 +76,15 @@ class SpeechToText:
                 if 'compute_type' in stt_config:
                     self.compute_type = stt_config['compute_type']
                 
+                if 'input_sample_rate' in stt_config:
+                    self.input_sample_rate = int(stt_config['input_sample_rate'])
+                
+                if 'input_sample_width' in stt_config:
+                    self.input_sample_width = int(stt_config['input_sample_width'])
+                
+                if 'input_channels' in stt_config:
+                    self.input_channels = int(stt_config['input_channels'])
+                
             logger.info(f"Loaded STT configuration from {self.config_path}")
         except Exception as e:
             logger.error(f"Error loading configuration: {str(e)}", exc_info=True)
@@ -74,7 +93,14 @@ class SpeechToText:
         """
         Ensure the Whisper model is loaded.
         """
-        if self.model is None:
+        if self.model is not None:
+            return
+        
+        # The instance may be shared between calls, so only one thread loads
+        with self._model_lock:
+            if self.model is not None:
+                return
+            
             try:
                 logger.info(f"Loading Whisper model: {self.model_name}")
                 self.model = whisper.load_model(
@@ -94,7 +120,7 @@ class SpeechToText:
         
         Args:
             audio_data: The audio data to transcribe. Can be:
-                - bytes: Raw audio data (will be saved to temporary file)
+                - bytes: WAV or raw PCM audio data (decoded in memory)
                 - str: Path to an audio file
                 - np.ndarray: Audio waveform data
             options: Additional options for the transcription
@@ -118,23 +144,15 @@ class SpeechToText:
             
             # Handle different types of audio input
             audio_input = audio_data
-            temp_file = None
             
-            if isinstance(audio_data, bytes):
-                # Save bytes to temporary file
-                temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-                temp_file.write(audio_data)
-                temp_file.close()
-                audio_input = temp_file.name
+            if isinstance(audio_data, (bytes, bytearray, memoryview)):
+                # Decode in memory to the 16 kHz float32 waveform Whisper expects
+                audio_input = self._decode_audio(audio_data)
             
             # Transcribe the audio
             result = self.model.transcribe(audio_input, **transcribe_options)
             transcription = result.get("text", "").strip()
             
-            # Clean up the temporary file if created
-            if temp_file:
-                os.unlink(temp_file.name)
-            
             logger.info(f"Transcribed audio: {transcription[:50]}{'...' if len(transcription) > 50 else ''}")
             return transcription
             
@@ -142,31 +160,308 @@ class SpeechToText:
             logger.error(f"Error transcribing audio: {str(e)}", exc_info=True)
             return ""
     
-    def stream_transcribe(self, audio_stream, chunk_duration_ms: int = 1000,
-                         options: Optional[Dict[str, Any]] = None) -> str:
+    def _decode_audio(self, audio_data: bytes) -> np.ndarray:
         """
-        Transcribe streaming audio in chunks.
+        Decode WAV or raw PCM bytes into a Whisper-ready waveform.
         
         Args:
-            audio_stream: A stream of audio data
-            chunk_duration_ms: Duration of each chunk in milliseconds
-            options: Additional options for the transcription
+            audio_data: WAV file bytes or raw PCM in the configured input format
             
         Returns:
-            Transcription text
+            Float32 mono waveform at 16 kHz
         """
-        # NOTE: This is a simplified streaming transcription implementation
-        # In a production system, this would be more sophisticated, handling
-        # partial results, timeouts, etc.
+        return decode_audio(
+            audio_data,
+            sample_rate=self.input_sample_rate,
+            sample_width=self.input_sample_width,
+            channels=self.input_channels
+        )
+    
+    def transcribe_batch(self, audio_batch: List[Union[bytes, str, np.ndarray]],
+                         options: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Transcribe several utterances with one batched model pass.
+        
+        Each utterance is padded to Whisper's 30 second window, the log-mel
+        spectrograms are stacked, and the batch is encoded and decoded
+        together. Utterances longer than one window, or a failed batch,
+        fall back to transcribe().
+        
+        Args:
+            audio_batch: Utterances in any format accepted by transcribe()
+            options: Additional decoding options
+            
+        Returns:
+            Transcription text for each utterance, in order
+        """
+        results = [""] * len(audio_batch)
+        
         try:
-            # Ensure model is loaded
             self._ensure_model_loaded()
+        except Exception as e:
+            logger.error(f"Error transcribing batch: {str(e)}", exc_info=True)
+            return results
+        
+        batch_indices = []
+        mels = []
+        for index, audio_data in enumerate(audio_batch):
+            try:
+                if isinstance(audio_data, (bytes, bytearray, memoryview)):
+                    audio = self._decode_audio(audio_data)
+                elif isinstance(audio_data, str):
+                    audio = whisper.load_audio(audio_data)
+                else:
+                    audio = audio_data
+                
+                if len(audio) > whisper.audio.N_SAMPLES:
+                    # Long-form audio needs the sliding-window transcribe path
+                    results[index] = self.transcribe(audio, options)
+                    continue
+                
+                audio = whisper.pad_or_trim(np.asarray(audio, dtype=np.float32))
+                mels.append(whisper.log_mel_spectrogram(audio, n_mels=self.model.dims.n_mels))
+                batch_indices.append(index)
+            except Exception as e:
+                logger.error(f"Error preparing audio for batch transcription: {str(e)}", exc_info=True)
+        
+        if not mels:
+            return results
+        
+        decode_options = {
+            "language": self.language,
+            "task": "transcribe",
+            "without_timestamps": True,
+            "fp16": self.device != "cpu"
+        }
+        if options:
+            decode_options.update(options)
+        
+        try:
+            # torch comes with openai-whisper; only the batched path needs it directly
+            import torch
+            
+            mel_batch = torch.stack(mels).to(self.model.device)
+            decoded = whisper.decode(self.model, mel_batch, whisper.DecodingOptions(**decode_options))
+            for index, result in zip(batch_indices, decoded):
+                results[index] = result.text.strip()
             
-            # In a real implementation, we would accumulate audio and transcribe in chunks
-            # For now, we'll just assume the audio_stream has a read() method to get all data
-            audio_data = audio_stream.read()
-            return self.transcribe(audio_data, options)
+            logger.info(f"Transcribed batch of {len(batch_indices)} utterances")
+        except Exception as e:
+            logger.error(f"Error in batched transcription, falling back to sequential: {str(e)}", exc_info=True)
+            for index in batch_indices:
+                results[index] = self.transcribe(audio_batch[index], options)
+        
+        return results
+    
+    async def stream_transcribe(self, audio_stream, chunk_duration_ms: int = 1000,
+                               options: Optional[Dict[str, Any]] = None,
+                               executor: Optional[Executor] = None,
+                               max_window_seconds: float = 30.0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Transcribe streaming audio incrementally.
+        
+        Audio accumulates in a rolling ring buffer that is re-decoded every
+        chunk_duration_ms of new audio. A segment is finalized once two
+        consecutive decodes agree on it and speech has continued past it;
+        its audio is then dropped from the buffer so later decodes stay short.
+        
+        Args:
+            audio_stream: Raw PCM or WAV audio in the configured input format.
+                Either an async iterable of byte chunks or an object with a
+                read(size) method (plain or coroutine).
+            chunk_duration_ms: Amount of new audio between decodes
+            options: Additional options for the transcription
+            executor: Executor to decode on (defaults to the loop's executor)
+            max_window_seconds: Maximum audio held for a single decode
             
+        Yields:
+            Dictionaries with 'text', 'is_final', and 'start'/'end' times in
+            seconds from the start of the stream. Partial hypotheses cover the
+            audio after the last final segment and may still change.
+        """
+        loop = asyncio.get_running_loop()
+        
+        try:
+            await loop.run_in_executor(executor, self._ensure_model_loaded)
         except Exception as e:
             logger.error(f"Error in streaming transcription: {str(e)}", exc_info=True)
-            return ""
\ No newline at end of file
+            return
+            
+        ring = AudioRingBuffer(int(max_window_seconds * WHISPER_SAMPLE_RATE))
+        step = int(chunk_duration_ms * WHISPER_SAMPLE_RATE / 1000)
+        new_samples = 0
+        previous: List[Dict[str, Any]] = []
+        last_partial = ""
+        committed = []
+        
+        async for chunk in self._iter_audio_stream(audio_stream, chunk_duration_ms, executor):
+            samples = self._decode_audio(chunk)
+            ring.write(samples)
+            new_samples += len(samples)
+            
+            if new_samples < step:
+                continue
+            new_samples = 0
+            
+            # Force finalization before the next step overflows the window
+            window_full = len(ring) + step > ring.capacity
+            
+            segments = await loop.run_in_executor(
+                executor, self._decode_window, ring.read(), options, " ".join(committed)
+            )
+            stable = self._count_stable_segments(previous, segments, window_full)
+            
+            offset = ring.start_offset / WHISPER_SAMPLE_RATE
+            for segment in segments[:stable]:
+                committed.append(segment['text'])
+                yield self._segment_event(segment, offset, is_final=True)
+            
+            if stable:
+                ring.discard(int(segments[stable - 1]['end'] * WHISPER_SAMPLE_RATE))
+                last_partial = ""
+            elif window_full and not segments:
+                # A full window of silence: nothing to keep
+                ring.clear()
+            previous = segments[stable:]
+            
+            partial = " ".join(segment['text'] for segment in previous)
+            if partial and partial != last_partial:
+                last_partial = partial
+                yield {
+                    'text': partial,
+                    'is_final': False,
+                    'start': offset + previous[0]['start'],
+                    'end': offset + previous[-1]['end']
+                }
+        
+        # The stream has ended; whatever is left is final
+        if len(ring):
+            segments = await loop.run_in_executor(
+                executor, self._decode_window, ring.read(), options, " ".join(committed)
+            )
+            offset = ring.start_offset / WHISPER_SAMPLE_RATE
+            for segment in segments:
+                yield self._segment_event(segment, offset, is_final=True)
+            
+    async def _iter_audio_stream(self, audio_stream, chunk_duration_ms: int,
+                                 executor: Optional[Executor] = None) -> AsyncIterator[bytes]:
+        """
+        Iterate over an audio stream in chunks.
+        
+        Args:
+            audio_stream: Async iterable of byte chunks, or object with read(size)
+            chunk_duration_ms: Duration of each chunk read with read(size)
+            executor: Executor for blocking read() calls
+        
+        Yields:
+            Audio byte chunks
+        """
+        if hasattr(audio_stream, '__aiter__'):
+            async for chunk in audio_stream:
+                if chunk:
+                    yield chunk
+            return
+        
+        frame_size = self.input_sample_width * self.input_channels
+        chunk_size = int(self.input_sample_rate * chunk_duration_ms / 1000) * frame_size
+        read = audio_stream.read
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            if asyncio.iscoroutinefunction(read):
+                chunk = await read(chunk_size)
+            else:
+                chunk = await loop.run_in_executor(executor, read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    
+    def _decode_window(self, audio: np.ndarray, options: Optional[Dict[str, Any]] = None,
+                       prompt: str = "") -> List[Dict[str, Any]]:
+        """
+        Decode a window of buffered audio into timed segments.
+        
+        Args:
+            audio: Float32 16 kHz waveform
+            options: Additional options for the transcription
+            prompt: Previously finalized text, used as decoding context
+        
+        Returns:
+            List of segments with 'text', 'start' and 'end' (seconds into the window)
+        """
+        transcribe_options = {
+            "language": self.language,
+            "task": "transcribe",
+            "condition_on_previous_text": False
+        }
+        if prompt:
+            # Whisper only uses the tail of the prompt
+            transcribe_options["initial_prompt"] = prompt[-200:]
+        if options:
+            transcribe_options.update(options)
+        
+        try:
+            result = self.model.transcribe(audio, **transcribe_options)
+        except Exception as e:
+            logger.error(f"Error transcribing audio window: {str(e)}", exc_info=True)
+            return []
+        
+        segments = result.get("segments")
+        if segments is None:
+            text = result.get("text", "").strip()
+            segments = [{"text": text, "start": 0.0, "end": len(audio) / WHISPER_SAMPLE_RATE}] if text else []
+        
+        return [
+            {"text": segment["text"].strip(), "start": float(segment["start"]), "end": float(segment["end"])}
+            for segment in segments
+            if segment["text"].strip()
+        ]
+    
+    @staticmethod
+    def _count_stable_segments(previous: List[Dict[str, Any]], current: List[Dict[str, Any]],
+                               force: bool = False) -> int:
+        """
+        Count leading segments that can be finalized.
+        
+        A segment is stable when the previous decode produced the same text
+        at the same position and it is not the last segment (which may still
+        be growing). When forced, everything but the last segment is
+        finalized, or the only segment if there is just one.
+        
+        Args:
+            previous: Unfinalized segments of the previous decode
+            current: Segments of the current decode
+            force: Finalize regardless of agreement
+        
+        Returns:
+            Number of leading segments of current to finalize
+        """
+        if force:
+            return max(len(current) - 1, min(len(current), 1))
+        
+        stable = 0
+        for before, after in zip(previous, current[:-1]):
+            if before['text'].lower() != after['text'].lower():
+                break
+            stable += 1
+        return stable
+    
+    @staticmethod
+    def _segment_event(segment: Dict[str, Any], offset: float, is_final: bool) -> Dict[str, Any]:
+        """
+        Build a transcription event for a segment.
+        
+        Args:
+            segment: Segment with times relative to the decoded window
+            offset: Stream time of the start of the window
+            is_final: Whether the segment is final
+        
+        Returns:
+            Transcription event
+        """
+        return {
+            'text': segment['text'],
+            'is_final': is_final,
+            'start': offset + segment['start'],
+            'end': offset + segment['end']
+        }
@@ -0,0 +1,306 @@
+"""
+Voice activity detection and endpointing.
+Classifies 20 ms frames as speech or silence from their energy and
+spectral flatness, ends a turn after trailing silence, and trims the
+silence around captured speech.
+"""
+import logging
+import numpy as np
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+class VoiceActivityDetector:
+    """
+    Frame-level speech detector using NumPy.
+    
+    A frame is speech when its energy is above both an absolute threshold
+    and a margin over the tracked noise floor, and (optionally) when its
+    spectrum is peaky rather than flat like noise.
+    """
+    
+    def __init__(self, sample_rate: int = 8000, frame_ms: int = 20,
+                 energy_threshold_db: float = -45.0, noise_margin_db: float = 10.0,
+                 use_spectral: bool = True, flatness_threshold: float = 0.4):
+        """
+        Initialize the detector.
+        
+        Args:
+            sample_rate: Sample rate of the analysed audio
+            frame_ms: Frame length in milliseconds
+            energy_threshold_db: Minimum frame energy (dBFS) for speech
+            noise_margin_db: Required margin over the noise floor for speech
+            use_spectral: Also require a non-flat spectrum for speech
+            flatness_threshold: Spectral flatness (0-1) above which a frame is noise
+        """
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.energy_threshold_db = energy_threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.use_spectral = use_spectral
+        self.flatness_threshold = flatness_threshold
+        
+        # Running noise floor estimate, adapted on non-speech frames
+        self.noise_floor_db = energy_threshold_db - noise_margin_db
+    
+    @classmethod
+    def from_config(cls, vad_config: Dict[str, Any], sample_rate: int = 8000) -> "VoiceActivityDetector":
+        """
+        Create a detector from the voice.vad configuration section.
+        
+        Args:
+            vad_config: The voice.vad configuration
+            sample_rate: Sample rate of the analysed audio
+        
+        Returns:
+            Configured detector
+        """
+        return cls(
+            sample_rate=sample_rate,
+            frame_ms=int(vad_config.get('frame_ms', 20)),
+            energy_threshold_db=float(vad_config.get('energy_threshold_db', -45.0)),
+            noise_margin_db=float(vad_config.get('noise_margin_db', 10.0)),
+            use_spectral=bool(vad_config.get('use_spectral', True)),
+            flatness_threshold=float(vad_config.get('flatness_threshold', 0.4))
+        )
+    
+    def frames(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Split audio into non-overlapping frames, dropping a partial last frame.
+        
+        Args:
+            audio: Float32 mono samples
+        
+        Returns:
+            Array of shape (n_frames, frame_length)
+        """
+        count = len(audio) // self.frame_length
+        return audio[:count * self.frame_length].reshape(count, self.frame_length)
+    
+    def frame_features(self, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute energy and spectral flatness of each frame.
+        
+        Args:
+            frames: Array of shape (n_frames, frame_length)
+        
+        Returns:
+            Tuple of (energy in dBFS, spectral flatness in 0-1) per frame
+        """
+        power = np.mean(np.square(frames, dtype=np.float64), axis=1)
+        energy_db = 10.0 * np.log10(power + 1e-12)
+        
+        if not self.use_spectral:
+            return energy_db, np.zeros(len(frames))
+        
+        spectrum = np.square(np.abs(np.fft.rfft(frames * np.hanning(self.frame_length), axis=1))) + 1e-12
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+        return energy_db, flatness
+    
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Classify frames as speech or silence, updating the noise floor.
+        
+        Args:
+            frames: Array of shape (n_frames, frame_length)
+        
+        Returns:
+            Boolean array, True for speech frames
+        """
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool)
+        
+        energy_db, flatness = self.frame_features(frames)
+        threshold = max(self.energy_threshold_db, self.noise_floor_db + self.noise_margin_db)
+        
+        speech = energy_db > threshold
+        if self.use_spectral:
+            speech &= flatness < self.flatness_threshold
+        
+        # Track the noise floor on silence so the threshold follows line noise
+        silence = energy_db[~speech]
+        if len(silence):
+            self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * float(np.mean(silence))
+        
+        return speech
+    
+    def is_speech(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Classify each frame of a buffer.
+        
+        Args:
+            audio: Float32 mono samples
+        
+        Returns:
+            Boolean array, True for speech frames
+        """
+        return self.classify(self.frames(audio))
+    
+    def trim(self, audio: np.ndarray, padding_ms: int = 100) -> Optional[np.ndarray]:
+        """
+        Remove leading and trailing silence.
+        
+        Args:
+            audio: Float32 mono samples
+            padding_ms: Silence kept around the speech
+        
+        Returns:
+            The trimmed audio, or None if it contains no speech
+        """
+        speech = self.is_speech(audio)
+        indices = np.flatnonzero(speech)
+        if len(indices) == 0:
+            return None
+        
+        padding = int(self.sample_rate * padding_ms / 1000)
+        start = max(0, indices[0] * self.frame_length - padding)
+        end = min(len(audio), (indices[-1] + 1) * self.frame_length + padding)
+        return audio[start:end]
+
+
+class Endpointer:
+    """
+    Decides when a caller's turn has ended.
+    
+    Audio is fed incrementally; the turn ends once speech has been heard
+    and is followed by enough trailing silence, or when the maximum
+    duration is reached.
+    """
+    
+    def __init__(self, vad: VoiceActivityDetector, trailing_silence_ms: int = 700,
+                 min_speech_ms: int = 200, max_duration: float = 10.0, padding_ms: int = 100):
+        """
+        Initialize the endpointer.
+        
+        Args:
+            vad: Frame classifier
+            trailing_silence_ms: Silence after speech that ends the turn
+            min_speech_ms: Continuous speech needed before a turn counts as started
+            max_duration: Maximum turn length in seconds
+            padding_ms: Silence kept around the speech when trimming
+        """
+        self.vad = vad
+        self.trailing_silence_frames = max(1, trailing_silence_ms // vad.frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // vad.frame_ms)
+        self.max_frames = int(max_duration * 1000 / vad.frame_ms)
+        self.padding_ms = padding_ms
+        
+        self.reset()
+    
+    def reset(self) -> None:
+        """
+        Start a new turn.
+        """
+        self._chunks = []
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._speech = []
+        self.frame_count = 0
+        self.speech_run = 0
+        self.silence_run = 0
+        self.start_frame = None
+        self.done = False
+    
+    @property
+    def speech_started(self) -> bool:
+        """Whether enough continuous speech has been heard to count as a turn."""
+        return self.start_frame is not None
+    
+    def process(self, samples: np.ndarray) -> bool:
+        """
+        Feed audio to the endpointer.
+        
+        Args:
+            samples: Float32 mono samples at the detector's sample rate
+        
+        Returns:
+            True once the turn has ended
+        """
+        if self.done:
+            return True
+        
+        audio = np.concatenate((self._remainder, samples)) if len(self._remainder) else samples
+        frames = self.vad.frames(audio)
+        self._remainder = audio[len(frames) * self.vad.frame_length:]
+        if len(frames) == 0:
+            return False
+        
+        self._chunks.append(frames.reshape(-1))
+        speech = self.vad.classify(frames)
+        self._speech.append(speech)
+        
+        for is_speech in speech:
+            self.frame_count += 1
+            if is_speech:
+                self.speech_run += 1
+                self.silence_run = 0
+                if self.start_frame is None and self.speech_run >= self.min_speech_frames:
+                    self.start_frame = self.frame_count - self.speech_run
+            else:
+                # Clicks and short noises do not add up to a turn
+                self.speech_run = 0
+                self.silence_run += 1
+            
+            if self.speech_started and self.silence_run >= self.trailing_silence_frames:
+                self.done = True
+                break
+            if self.frame_count >= self.max_frames:
+                self.done = True
+                break
+        
+        return self.done
+    
+    def pending_speech(self) -> Optional[np.ndarray]:
+        """
+        Get the audio of an utterance that has started but not yet ended.
+        
+        Lets a capture that is stopped early hand the caller's words so far
+        to the next capture instead of dropping them.
+        
+        Returns:
+            The utterance so far with its leading padding, or None if the
+            caller is not speaking
+        """
+        if self.done or not self._speech or self.silence_run >= self.trailing_silence_frames:
+            return None
+        
+        speech = np.concatenate(self._speech)
+        
+        # The utterance starts after the last silence long enough to end a turn
+        start = None
+        silence = 0
+        for index in range(len(speech) - 1, -1, -1):
+            if speech[index]:
+                start = index
+                silence = 0
+            elif start is not None:
+                silence += 1
+                if silence >= self.trailing_silence_frames:
+                    break
+        if start is None:
+            return None
+        
+        audio = np.concatenate(self._chunks)
+        padding = int(self.vad.sample_rate * self.padding_ms / 1000)
+        begin = max(0, start * self.vad.frame_length - padding)
+        return np.concatenate((audio[begin:], self._remainder))
+    
+    def get_audio(self) -> Optional[np.ndarray]:
+        """
+        Get the captured turn with surrounding silence trimmed.
+        
+        Returns:
+            The speech audio, or None if the turn contained no speech
+        """
+        if not self.speech_started:
+            return None
+        
+        audio = np.concatenate(self._chunks)
+        speech = np.concatenate(self._speech)
+        indices = np.flatnonzero(speech)
+        
+        frame_length = self.vad.frame_length
+        padding = int(self.vad.sample_rate * self.padding_ms / 1000)
+        start = max(0, self.start_frame * frame_length - padding)
+        end = min(len(audio), (indices[-1] + 1) * frame_length + padding)
+        return audio[start:end]
@@ -4,6 +4,8 @@ Contains components for managing conversation flows and executing actions.
 """
 from src.workflow.actions import ActionHandler, ActionExecutor, extract_entities_from_text
 from src.workflow.flows.flow_manager import FlowManager
+from src.workflow.flows.intent_speculator import IntentSpeculator
+from src.workflow.intent_matcher import IntentMatcher
 from src.workflow.flows import (
     GeneralFlow,
     AppointmentFlow,
@@ -17,6 +19,8 @@ __all__ = [
     'ActionExecutor',
     'extract_entities_from_text',
     'FlowManager',
+    'IntentSpeculator',
+    'IntentMatcher',
     'GeneralFlow',
     'AppointmentFlow',
     'MessageFlow',
@@ -8,6 +8,7 @@ import datetime
 from typing import Dict, List, Optional, Any, Union, Tuple
 
 from src.workflow.flows.base_flow import BaseFlow
+from src.workflow.intent_matcher import scan
 
 logger = logging.getLogger(__name__)
 
@@ -365,22 +366,8 @@ class AppointmentFlow(BaseFlow):
         Returns:
             Intent: 'schedule', 'cancel', 'reschedule', or 'inquire'
         """
-        message = message.lower()
-        
-        # Check for cancellation
-        if re.search(r'(cancel|remove|delete|forget|never mind)', message):
-            return 'cancel'
-        
-        # Check for rescheduling
-        if re.search(r'(reschedule|change|move|different time|different day)', message):
-            return 'reschedule'
-        
-        # Check for inquiry
-        if re.search(r'(check|find out|when is|do I have|confirm)', message):
-            return 'inquire'
-        
-        # Default to scheduling
-        return 'schedule'
+        # Cancellation before rescheduling before inquiry; default to scheduling
+        return scan(message).first('appointment_action', 'schedule')
     
     def _extract_duration(self, message: str) -> Optional[int]:
         """
@@ -426,17 +413,8 @@ class AppointmentFlow(BaseFlow):
         Returns:
             True if it's a confirmation, False otherwise
         """
-        message = message.lower()
-        confirmation_patterns = [
-            r'\b(yes|yeah|sure|confirm|correct|right|ok|okay|fine|good|perfect|sounds good|that works)\b',
-            r'\b(book it|schedule it|make it|do it|proceed|go ahead)\b'
-        ]
-        
-        for pattern in confirmation_patterns:
-            if re.search(pattern, message):
-                return True
-        
-        return False
+        result = scan(message)
+        return result.has('confirmation', 'yes') or result.has('confirmation', 'appointment')
     
     def _is_denial(self, message: str) -> bool:
         """
@@ -448,17 +426,7 @@ class AppointmentFlow(BaseFlow):
         Returns:
             True if it's a denial, False otherwise
         """
-        message = message.lower()
-        denial_patterns = [
-            r'\b(no|nope|not|don\'t|do not|cancel|stop|forget|won\'t|will not|never mind)\b',
-            r'\b(incorrect|wrong|bad|invalid|mistaken|error|mistake)\b'
-        ]
-        
-        for pattern in denial_patterns:
-            if re.search(pattern, message):
-                return True
-        
-        return False
+        return scan(message).has('denial')
     
     def cleanup(self, flow_data: Dict[str, Any]) -> None:
         """
@@ -6,11 +6,78 @@ import os
 import logging
 import yaml
 import importlib
+import threading
 import time
 from typing import Dict, List, Optional, Any, Union, Tuple, Callable
 
+from src.llm.prompts import get_prompt_template, compile_conversation_prompt, PROMPT_DEFAULTS
+
 logger = logging.getLogger(__name__)
 
+# Prompt type used by the conversation once each flow is running
+FLOW_PROMPTS = {
+    'appointment': 'appointment_scheduling',
+    'message': 'voicemail',
+    'info': 'faq_answering'
+}
+
+# Module each built-in flow is implemented in
+FLOW_MODULES = {
+    'general': 'src.workflow.flows.general_flow',
+    'appointment': 'src.workflow.flows.appointment_flow',
+    'message': 'src.workflow.flows.message_flow',
+    'info': 'src.workflow.flows.information_flow',
+    'escalation': 'src.workflow.flows.escalation_flow'
+}
+
+# Flow classes resolved so far, shared by all flow managers; None marks a
+# class that could not be found, so failed imports are not retried
+_flow_classes: Dict[Tuple[Tuple[str, ...], str], Optional[type]] = {}
+_flow_classes_lock = threading.Lock()
+
+def resolve_flow_class(flow_id: str, class_name: str, module_name: Optional[str] = None) -> Optional[type]:
+    """
+    Resolve the class implementing a flow, importing its module on first use.
+    
+    Args:
+        flow_id: ID of the flow
+        class_name: Name of the flow class
+        module_name: Module the class is defined in; if not given, the
+            modules src.workflow.flows.<flow_id>_flow and
+            src.workflow.flows.flow_<flow_id> are tried
+        
+    Returns:
+        The flow class, or None if it could not be found
+    """
+    if module_name:
+        module_names = (module_name,)
+    else:
+        module_names = (f"src.workflow.flows.{flow_id}_flow", f"src.workflow.flows.flow_{flow_id}")
+    key = (module_names, class_name)
+    
+    if key in _flow_classes:
+        return _flow_classes[key]
+    
+    with _flow_classes_lock:
+        if key in _flow_classes:
+            return _flow_classes[key]
+        
+        flow_class = None
+        for name in module_names:
+            try:
+                module = importlib.import_module(name)
+            except ImportError:
+                continue
+            
+            flow_class = getattr(module, class_name, None)
+            break
+        
+        if flow_class is None:
+            logger.error(f"Could not import flow class {class_name} for {flow_id}")
+        
+        _flow_classes[key] = flow_class
+        return flow_class
+
 class FlowManager:
     """
     Manages conversation flows and transitions between them.
@@ -34,12 +101,20 @@ class FlowManager:
         # Initialize flow registry
         self.flow_registry = {}
         self._register_flows()
+        self._compile_transitions()
         
         # Initialize flow state
         self.current_flow = None
+        self.current_flow_id: Optional[str] = None
         self.flow_stack = []  # For nested flows
         self.flow_data = {}   # Shared data between flows
         
+        # Flow set up ahead of time by prepare_flow, as (flow ID, instance)
+        self.prepared_flow: Optional[Tuple[str, Any]] = None
+        
+        # Reused instances of flows that keep all their state in flow data
+        self._flow_instances: Dict[str, Any] = {}
+        
         logger.info("Flow manager initialized")
     
     def _load_config(self) -> None:
@@ -56,11 +131,19 @@ class FlowManager:
             # Set default flow
             self.default_flow = self.config.get('default_flow', 'general')
             
+            # Reuse flow instances across transitions
+            self.pool_instances = bool(self.config.get('pool_instances', True))
+            
+            # Maximum number of suspended flows
+            self.max_stack_depth = max(1, int(self.config.get('max_stack_depth', 4)))
+            
             logger.info(f"Loaded flow configuration from {self.config_path}")
         except Exception as e:
             logger.error(f"Error loading configuration: {str(e)}", exc_info=True)
             self.config = {}
             self.default_flow = 'general'
+            self.pool_instances = True
+            self.max_stack_depth = 4
     
     def _register_flows(self) -> None:
         """
@@ -70,31 +153,41 @@ class FlowManager:
         self.flow_registry['general'] = {
             'name': 'General Flow',
             'description': 'General conversation flow for basic interactions',
-            'class': 'GeneralFlow'
+            'class': 'GeneralFlow',
+            'module': FLOW_MODULES['general'],
+            'pool': True
         }
         
         self.flow_registry['appointment'] = {
             'name': 'Appointment Flow',
             'description': 'Flow for scheduling and managing appointments',
-            'class': 'AppointmentFlow'
+            'class': 'AppointmentFlow',
+            'module': FLOW_MODULES['appointment'],
+            'pool': True
         }
         
         self.flow_registry['message'] = {
             'name': 'Message Flow',
             'description': 'Flow for taking and managing messages',
-            'class': 'MessageFlow'
+            'class': 'MessageFlow',
+            'module': FLOW_MODULES['message'],
+            'pool': True
         }
         
         self.flow_registry['info'] = {
             'name': 'Information Flow',
             'description': 'Flow for providing information and answering questions',
-            'class': 'InformationFlow'
+            'class': 'InformationFlow',
+            'module': FLOW_MODULES['info'],
+            'pool': True
         }
         
         self.flow_registry['escalation'] = {
             'name': 'Escalation Flow',
             'description': 'Flow for escalating calls to a human operator',
-            'class': 'EscalationFlow'
+            'class': 'EscalationFlow',
+            'module': FLOW_MODULES['escalation'],
+            'pool': True
         }
         
         # Register custom flows from configuration
@@ -103,11 +196,59 @@ class FlowManager:
             self.flow_registry[flow_id] = {
                 'name': flow_config.get('name', flow_id),
                 'description': flow_config.get('description', ''),
-                'class': flow_config.get('class', '')
+                'class': flow_config.get('class', ''),
+                'module': flow_config.get('module'),
+                'pool': bool(flow_config.get('pool', False))
             }
         
         logger.info(f"Registered {len(self.flow_registry)} flows")
     
+    def _compile_transitions(self) -> None:
+        """
+        Compile allowed_transitions into a bitmask of allowed targets per flow.
+        
+        Each registered flow gets one bit; a transition is allowed if the
+        target's bit is set in the source's mask. Flows without an entry
+        may start any flow.
+        """
+        self._flow_bits: Dict[str, int] = {
+            flow_id: 1 << index for index, flow_id in enumerate(self.flow_registry)
+        }
+        self._transitions: Dict[str, int] = {}
+        
+        for rule in self.config.get('allowed_transitions', []) or []:
+            source = rule.get('from')
+            mask = self._transitions.get(source, 0)
+            for target in rule.get('to', []) or []:
+                bit = self._flow_bits.get(target)
+                if bit is None:
+                    logger.warning(f"Unknown flow {target} in allowed transitions from {source}")
+                    continue
+                mask |= bit
+            self._transitions[source] = mask
+        
+        logger.info(f"Compiled transitions for {len(self._transitions)} flows")
+    
+    def can_transition(self, from_flow: Optional[str], to_flow: str) -> bool:
+        """
+        Check whether a flow may start another flow.
+        
+        Args:
+            from_flow: ID of the running flow, or None if no flow is running
+            to_flow: ID of the flow to start
+            
+        Returns:
+            True if the transition is allowed, False otherwise
+        """
+        if from_flow is None:
+            return True
+        
+        mask = self._transitions.get(from_flow)
+        if mask is None:
+            return True
+        
+        return bool(mask & self._flow_bits.get(to_flow, 0))
+    
     def get_flow_instance(self, flow_id: str) -> Optional[Any]:
         """
         Get an instance of a flow by ID.
@@ -122,28 +263,22 @@ class FlowManager:
             logger.warning(f"Flow {flow_id} not found in registry")
             return None
         
+        # Pooled flows keep their state in flow data, so one instance serves
+        # every start of the flow
+        flow_instance = self._flow_instances.get(flow_id)
+        if flow_instance is not None:
+            return flow_instance
+        
         try:
             flow_info = self.flow_registry[flow_id]
-            class_name = flow_info['class']
-            
-            # Try to import the flow module
-            module_name = f"src.workflow.flows.{flow_id}_flow"
-            try:
-                module = importlib.import_module(module_name)
-            except ImportError:
-                # Try with a different pattern if the first fails
-                module_name = f"src.workflow.flows.flow_{flow_id}"
-                try:
-                    module = importlib.import_module(module_name)
-                except ImportError:
-                    logger.error(f"Could not import flow module for {flow_id}")
-                    return None
-            
-            # Get the flow class
-            flow_class = getattr(module, class_name)
+            flow_class = resolve_flow_class(flow_id, flow_info['class'], flow_info.get('module'))
+            if flow_class is None:
+                return None
             
             # Instantiate the flow
             flow_instance = flow_class(self)
+            if self.pool_instances and flow_info.get('pool', False):
+                self._flow_instances[flow_id] = flow_instance
             
             logger.info(f"Created flow instance: {flow_id}")
             return flow_instance
@@ -163,25 +298,24 @@ class FlowManager:
         Returns:
             True if flow started successfully, False otherwise
         """
-        # If a flow is already running, push it onto the stack
-        if self.current_flow is not None:
-            self.flow_stack.append({
-                'flow': self.current_flow,
-                'data': self.flow_data
-            })
+        if self.current_flow is not None and not self.can_transition(self.current_flow_id, flow_id):
+            logger.warning(f"Transition from {self.current_flow_id} to {flow_id} is not allowed")
+            return False
         
-        # Start the new flow
-        flow_instance = self.get_flow_instance(flow_id)
+        # Get the new flow, using the prepared instance if it is this flow
+        flow_instance = self._take_prepared_flow(flow_id)
+        if flow_instance is None:
+            flow_instance = self.get_flow_instance(flow_id)
         if flow_instance is None:
-            if self.flow_stack:
-                # Restore previous flow
-                prev_flow = self.flow_stack.pop()
-                self.current_flow = prev_flow['flow']
-                self.flow_data = prev_flow['data']
             return False
         
+        # If a flow is already running, suspend it
+        if self.current_flow is not None:
+            self._suspend_current(flow_id)
+        
         # Initialize the flow data
         self.current_flow = flow_instance
+        self.current_flow_id = flow_id
         self.flow_data = input_data or {}
         
         # Call flow initialization
@@ -191,6 +325,121 @@ class FlowManager:
         logger.info(f"Started flow: {flow_id}")
         return True
     
+    def _suspend_current(self, flow_id: str) -> None:
+        """
+        Push the current flow onto the stack before another flow starts.
+        
+        If the flow being started is already running or suspended, the
+        stack is unwound to below it instead, so each flow is on the stack
+        at most once. The oldest suspended flow is dropped once the stack
+        exceeds max_stack_depth.
+        
+        Args:
+            flow_id: ID of the flow being started
+        """
+        stack_ids = [entry.get('flow_id') for entry in self.flow_stack]
+        if flow_id == self.current_flow_id or flow_id in stack_ids:
+            self._cleanup_flow(self.current_flow, self.flow_data)
+            
+            if flow_id in stack_ids:
+                index = stack_ids.index(flow_id)
+                for entry in reversed(self.flow_stack[index:]):
+                    self._cleanup_flow(entry['flow'], entry['data'])
+                del self.flow_stack[index:]
+            
+            logger.info(f"Unwound flow stack to restart flow: {flow_id}")
+            return
+        
+        self.flow_stack.append({
+            'flow': self.current_flow,
+            'data': self.flow_data,
+            'flow_id': self.current_flow_id
+        })
+        
+        if len(self.flow_stack) > self.max_stack_depth:
+            dropped = self.flow_stack.pop(0)
+            self._cleanup_flow(dropped['flow'], dropped['data'])
+            logger.warning(f"Flow stack exceeded {self.max_stack_depth} flows, dropped flow: {dropped.get('flow_id')}")
+    
+    def _cleanup_flow(self, flow: Any, flow_data: Dict[str, Any]) -> None:
+        """
+        Clean up a flow that is being discarded.
+        
+        Args:
+            flow: The flow instance
+            flow_data: The flow's data
+        """
+        if hasattr(flow, 'cleanup'):
+            try:
+                flow.cleanup(flow_data)
+            except Exception as e:
+                logger.error(f"Error cleaning up flow: {str(e)}", exc_info=True)
+    
+    def prepare_flow(self, flow_id: str, variables: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Set up a flow that is likely to start next, without starting it.
+        
+        Imports and instantiates the flow and renders its prompt so the
+        template caches are warm; start_flow then uses the prepared
+        instance. The flow state and stack are not touched, so a wrong
+        guess is rolled back by discard_prepared().
+        
+        Args:
+            flow_id: ID of the flow to prepare
+            variables: Prompt variables (e.g. caller_name) to render with
+            
+        Returns:
+            True if the flow is prepared, False otherwise
+        """
+        if self.prepared_flow is not None and self.prepared_flow[0] == flow_id:
+            return True
+        
+        self.discard_prepared()
+        flow_instance = self.get_flow_instance(flow_id)
+        if flow_instance is None:
+            return False
+        
+        prompt_type = FLOW_PROMPTS.get(flow_id)
+        if prompt_type:
+            try:
+                compile_conversation_prompt(
+                    get_prompt_template(prompt_type, self.config_path), prompt_type
+                ).render({**PROMPT_DEFAULTS, **(variables or {})})
+            except Exception as e:
+                logger.error(f"Error rendering prompt for flow {flow_id}: {str(e)}", exc_info=True)
+        
+        self.prepared_flow = (flow_id, flow_instance)
+        logger.info(f"Prepared flow: {flow_id}")
+        return True
+    
+    def discard_prepared(self) -> None:
+        """
+        Drop the flow set up by prepare_flow, if any.
+        """
+        if self.prepared_flow is not None:
+            logger.info(f"Discarded prepared flow: {self.prepared_flow[0]}")
+            self.prepared_flow = None
+    
+    def _take_prepared_flow(self, flow_id: str) -> Optional[Any]:
+        """
+        Take the prepared instance of a flow that is being started.
+        
+        Args:
+            flow_id: ID of the flow being started
+            
+        Returns:
+            The prepared instance, or None if a different flow (or none) was prepared
+        """
+        if self.prepared_flow is None:
+            return None
+        
+        prepared_id, flow_instance = self.prepared_flow
+        self.prepared_flow = None
+        if prepared_id != flow_id:
+            logger.info(f"Discarded prepared flow: {prepared_id}")
+            return None
+        return flow_instance
+    
     def end_flow(self, output_data: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
         End the current flow and return to the previous flow if any.
@@ -215,6 +464,7 @@ class FlowManager:
         if self.flow_stack:
             prev_flow = self.flow_stack.pop()
             self.current_flow = prev_flow['flow']
+            self.current_flow_id = prev_flow.get('flow_id')
             self.flow_data = prev_flow['data']
             
             # Update flow data with output from ended flow
@@ -230,6 +480,7 @@ class FlowManager:
         else:
             # No previous flow
             self.current_flow = None
+            self.current_flow_id = None
             self.flow_data = {}
             return None
     
@@ -289,16 +540,15 @@ class FlowManager:
         Clear all flows and reset the flow manager.
         """
         # Clean up current flow if any
-        if self.current_flow is not None and hasattr(self.current_flow, 'cleanup'):
-            try:
-                self.current_flow.cleanup(self.flow_data)
-            except Exception as e:
-                logger.error(f"Error cleaning up flow: {str(e)}", exc_info=True)
+        if self.current_flow is not None:
+            self._cleanup_flow(self.current_flow, self.flow_data)
         
         # Reset flow state
         self.current_flow = None
+        self.current_flow_id = None
         self.flow_stack = []
         self.flow_data = {}
+        self.prepared_flow = None
         
         logger.info("Cleared all flows")
     
@@ -3,14 +3,37 @@ General conversation flow for basic interactions.
 This flow handles general inquiries and routes to more specific flows as needed.
 """
 import logging
-import re
 import time
 from typing import Dict, List, Optional, Any, Union, Tuple
 
 from src.workflow.flows.base_flow import BaseFlow
+from src.workflow.intent_matcher import scan
 
 logger = logging.getLogger(__name__)
 
+# Flow each intent transitions to
+INTENT_FLOWS = {
+    'appointment': 'appointment',
+    'message': 'message',
+    'information': 'info',
+    'escalation': 'escalation'
+}
+
+def classify_intent(message: str) -> str:
+    """
+    Classify the intent of a message.
+    
+    This is a simple rule-based intent classification; in a real
+    implementation, this would use an NLU model or service.
+    
+    Args:
+        message: The message to classify
+        
+    Returns:
+        Intent category, or 'general' if no specific intent is detected
+    """
+    return scan(message).first('intent', 'general')
+
 class GeneralFlow(BaseFlow):
     """
     General conversation flow for basic interactions.
@@ -104,29 +127,7 @@ class GeneralFlow(BaseFlow):
         Returns:
             Intent category
         """
-        # This is a simple rule-based intent classification
-        # In a real implementation, this would use an NLU model or service
-        
-        message = message.lower()
-        
-        # Appointment-related
-        if re.search(r'(appointment|schedule|book|meeting|consultation|session)', message):
-            return 'appointment'
-        
-        # Message-related
-        if re.search(r'(message|tell|let .* know|pass along|relay)', message):
-            return 'message'
-        
-        # Information-related
-        if re.search(r'(information|details|tell me about|what is|how do|hours|location|address|phone|website|email)', message):
-            return 'information'
-        
-        # Escalation-related
-        if re.search(r'(speak to .* human|speak to .* person|real person|supervisor|manager|speak to someone else|transfer|operator)', message):
-            return 'escalation'
-        
-        # If no specific intent is detected
-        return 'general'
+        return classify_intent(message)
     
     def _handle_message(self, message: str, intent: str, metadata: Dict[str, Any], flow_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -148,25 +149,13 @@ class GeneralFlow(BaseFlow):
             flow_data['state'] = 'conversation'
             
         # Handle based on intent - transition to specialized flow if needed
-        if intent == 'appointment' and intent != flow_data.get('current_intent'):
-            # Transition to appointment flow
-            self.flow_manager.start_flow('appointment', flow_data)
-            return {'transitioned_to': 'appointment'}
-            
-        elif intent == 'message' and intent != flow_data.get('current_intent'):
-            # Transition to message flow
-            self.flow_manager.start_flow('message', flow_data)
-            return {'transitioned_to': 'message'}
-            
-        elif intent == 'information' and intent != flow_data.get('current_intent'):
-            # Transition to information flow
-            self.flow_manager.start_flow('info', flow_data)
-            return {'transitioned_to': 'information'}
+        flow_id = INTENT_FLOWS.get(intent)
+        if flow_id and intent != flow_data.get('current_intent'):
+            if self.flow_manager.start_flow(flow_id, flow_data):
+                return {'transitioned_to': intent}
             
-        elif intent == 'escalation' and intent != flow_data.get('current_intent'):
-            # Transition to escalation flow
-            self.flow_manager.start_flow('escalation', flow_data)
-            return {'transitioned_to': 'escalation'}
+            # The flow could not be started, so answer as a general message
+            logger.warning(f"Could not transition to flow {flow_id}, staying in general flow")
         
         # Update current intent
         flow_data['current_intent'] = intent
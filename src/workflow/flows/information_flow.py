@@ -2,11 +2,11 @@
 Information flow for providing information and answering questions.
 """
 import logging
-import re
 import time
 from typing import Dict, List, Optional, Any, Union, Tuple
 
 from src.workflow.flows.base_flow import BaseFlow
+from src.workflow.intent_matcher import scan
 
 logger = logging.getLogger(__name__)
 
@@ -106,38 +106,9 @@ class InformationFlow(BaseFlow):
         Returns:
             Category of information
         """
-        message = message.lower()
-        
-        # Check for hours
-        if re.search(r'(hours|open|close|time|schedule|when|day)', message):
-            return self.INFO_CATEGORIES['HOURS']
-        
-        # Check for location
-        if re.search(r'(location|address|where|place|direction|map|find you)', message):
-            return self.INFO_CATEGORIES['LOCATION']
-        
-        # Check for services
-        if re.search(r'(service|offer|provide|do you|can you|what.*do|available)', message):
-            return self.INFO_CATEGORIES['SERVICES']
-        
-        # Check for pricing
-        if re.search(r'(price|cost|fee|rate|charge|how much|payment)', message):
-            return self.INFO_CATEGORIES['PRICING']
-        
-        # Check for contact
-        if re.search(r'(contact|email|phone|call_|number|reach)', message):
-            return self.INFO_CATEGORIES['CONTACT']
-        
-        # Check for staff
-        if re.search(r'(staff|employee|person|people|team|expert|specialist|doctor|provider)', message):
-            return self.INFO_CATEGORIES['STAFF']
-        
-        # Check for policies
-        if re.search(r'(policy|rule|guideline|requirement|cancel|reschedule|insurance)', message):
-            return self.INFO_CATEGORIES['POLICIES']
-        
-        # Default to general
-        return self.INFO_CATEGORIES['GENERAL']
+        # Categories are checked in order: hours, location, services,
+        # pricing, contact, staff, policies; default to general
+        return scan(message).first('info_category', self.INFO_CATEGORIES['GENERAL'])
     
     def _lookup_information(self, query: str, category: str) -> Dict[str, Any]:
         """
@@ -197,20 +168,7 @@ class InformationFlow(BaseFlow):
         Returns:
             True if followup questions are indicated, False otherwise
         """
-        message = message.lower()
-        
-        # Check for indications of more questions
-        followup_patterns = [
-            r'(also|another question|one more thing|follow up|followup|additionally|next|more)',
-            r'(what about|how about|tell me about)',
-            r'(and|plus)'
-        ]
-        
-        for pattern in followup_patterns:
-            if re.search(pattern, message):
-                return True
-        
-        return False
+        return scan(message).has('followup')
     
     def cleanup(self, flow_data: Dict[str, Any]) -> None:
         """
@@ -0,0 +1,143 @@
+"""
+Speculative intent classification from partial transcripts.
+Classifies the caller's words while they are still speaking and prepares
+the flow they are likely to need, so flow setup overlaps with speech.
+
+This is a building block: the call path does not drive it yet, since
+CallHandler transcribes whole endpointed turns and runs no FlowManager.
+A caller consuming SpeechToText.stream_transcribe passes each partial
+event's text to feed() and the final transcript to finalize().
+"""
+import logging
+from typing import Dict, Optional, Any
+
+from src.workflow.flows.general_flow import GeneralFlow, classify_intent, INTENT_FLOWS
+
+logger = logging.getLogger(__name__)
+
+class IntentSpeculator:
+    """
+    Feeds partial STT hypotheses to the intent classifier.
+    
+    Once the same flow-starting intent has been seen in stable_partials
+    consecutive hypotheses of at least min_words words, the matching flow
+    is prepared through FlowManager.prepare_flow. A later hypothesis or the
+    final transcript with a different intent discards the prepared flow;
+    since preparing never touches the flow state, that is a full rollback.
+    """
+    
+    def __init__(self, flow_manager, min_words: int = 3, stable_partials: int = 2):
+        """
+        Initialize the speculator.
+        
+        Args:
+            flow_manager: FlowManager to prepare flows on
+            min_words: Minimum words in a hypothesis before it is trusted
+            stable_partials: Consecutive hypotheses that must agree on an intent
+        """
+        self.flow_manager = flow_manager
+        self.min_words = max(1, min_words)
+        self.stable_partials = max(1, stable_partials)
+        
+        self._intent: Optional[str] = None
+        self._streak = 0
+        self._prepared: Optional[str] = None
+        
+        # Statistics
+        self.prepared = 0
+        self.confirmed = 0
+        self.rolled_back = 0
+    
+    def feed(self, partial: str, variables: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Classify a partial hypothesis and prepare the likely next flow.
+        
+        Args:
+            partial: Partial transcript of the current utterance
+            variables: Prompt variables for preparing the flow
+        
+        Returns:
+            ID of the prepared flow, or None if none is prepared
+        """
+        if not self._speculating() or len(partial.split()) < self.min_words:
+            return self._prepared
+        
+        intent = classify_intent(partial)
+        if intent == self._intent:
+            self._streak += 1
+        else:
+            self._intent = intent
+            self._streak = 1
+        
+        if self._streak < self.stable_partials:
+            return self._prepared
+        
+        flow_id = INTENT_FLOWS.get(intent)
+        if flow_id != self._prepared:
+            self._rollback()
+            if flow_id is not None and self.flow_manager.prepare_flow(flow_id, variables):
+                self._prepared = flow_id
+                self.prepared += 1
+                logger.info(f"Speculatively prepared {flow_id} flow from partial transcript")
+        
+        return self._prepared
+    
+    def finalize(self, text: str) -> Optional[str]:
+        """
+        Check the prediction against the final transcript and reset for the next utterance.
+        
+        Args:
+            text: Final transcript of the utterance
+        
+        Returns:
+            ID of the prepared flow if the prediction held, otherwise None
+        """
+        prepared = self._prepared
+        flow_id = INTENT_FLOWS.get(classify_intent(text))
+        
+        if prepared is not None and prepared == flow_id:
+            self.confirmed += 1
+            result = prepared
+        else:
+            self._rollback()
+            result = None
+        
+        self._prepared = None
+        self._intent = None
+        self._streak = 0
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get speculation statistics.
+        
+        Returns:
+            Dictionary with the number of prepared, confirmed and rolled back flows
+        """
+        return {
+            'prepared': self.prepared,
+            'confirmed': self.confirmed,
+            'rolled_back': self.rolled_back
+        }
+    
+    def _speculating(self) -> bool:
+        """
+        Check whether the next message goes through intent detection.
+        
+        Returns:
+            True if no flow or the general flow is active
+        """
+        current_flow = self.flow_manager.current_flow
+        return current_flow is None or isinstance(current_flow, GeneralFlow)
+    
+    def _rollback(self) -> None:
+        """
+        Discard the flow prepared for a prediction that did not hold.
+        """
+        if self._prepared is None:
+            return
+        
+        logger.info(f"Rolled back speculative {self._prepared} flow")
+        self.flow_manager.discard_prepared()
+        self._prepared = None
+        self.rolled_back += 1
@@ -2,11 +2,11 @@
 Message flow for taking and managing messages.
 """
 import logging
-import re
 import time
 from typing import Dict, List, Optional, Any, Union, Tuple
 
 from src.workflow.flows.base_flow import BaseFlow
+from src.workflow.intent_matcher import scan
 
 logger = logging.getLogger(__name__)
 
@@ -260,22 +260,8 @@ class MessageFlow(BaseFlow):
         Returns:
             Urgency level: 'low', 'normal', 'high', or 'critical'
         """
-        message = message.lower()
-        
-        # Check for critical urgency
-        if re.search(r'(emergency|urgent|critical|asap|immediately|right away|life or death|crisis)', message):
-            return 'critical'
-        
-        # Check for high urgency
-        if re.search(r'(important|priority|pressing|significant|soon|quickly)', message):
-            return 'high'
-        
-        # Check for low urgency
-        if re.search(r'(whenever|no rush|low priority|not urgent|can wait|eventually|not important)', message):
-            return 'low'
-        
-        # Default to normal
-        return 'normal'
+        # Critical before high before low; default to normal
+        return scan(message).first('urgency', 'normal')
     
     def _determine_callback_preference(self, message: str) -> bool:
         """
@@ -287,14 +273,14 @@ class MessageFlow(BaseFlow):
         Returns:
             True if callback is requested, False otherwise
         """
-        message = message.lower()
+        result = scan(message)
         
         # Check for callback request
-        if re.search(r'(call back|callback|return call|call me|reach me|get back to me|reach out|contact me)', message):
+        if result.has('callback', 'requested'):
             return True
         
         # Check for no callback
-        if re.search(r'(no need to call|don\'t call|do not call|won\'t be available|not necessary to call)', message):
+        if result.has('callback', 'declined'):
             return False
         
         # Look for affirmative responses
@@ -318,17 +304,8 @@ class MessageFlow(BaseFlow):
         Returns:
             True if it's a confirmation, False otherwise
         """
-        message = message.lower()
-        confirmation_patterns = [
-            r'\b(yes|yeah|sure|confirm|correct|right|ok|okay|fine|good|perfect|sounds good|that works)\b',
-            r'\b(save it|send it|deliver it|record it|take it|proceed|go ahead)\b'
-        ]
-        
-        for pattern in confirmation_patterns:
-            if re.search(pattern, message):
-                return True
-        
-        return False
+        result = scan(message)
+        return result.has('confirmation', 'yes') or result.has('confirmation', 'message')
     
     def _is_denial(self, message: str) -> bool:
         """
@@ -340,17 +317,7 @@ class MessageFlow(BaseFlow):
         Returns:
             True if it's a denial, False otherwise
         """
-        message = message.lower()
-        denial_patterns = [
-            r'\b(no|nope|not|don\'t|do not|cancel|stop|forget|won\'t|will not|never mind)\b',
-            r'\b(incorrect|wrong|bad|invalid|mistaken|error|mistake)\b'
-        ]
-        
-        for pattern in denial_patterns:
-            if re.search(pattern, message):
-                return True
-        
-        return False
+        return scan(message).has('denial')
     
     def cleanup(self, flow_data: Dict[str, Any]) -> None:
         """
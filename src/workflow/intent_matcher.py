@@ -0,0 +1,262 @@
+"""
+Shared keyword matcher for the workflow flows.
+Scans an utterance once for the vocabulary of every flow (intents,
+information categories, urgency, confirmations, ...) so flows read their
+classifications from one result instead of running their own searches.
+"""
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prefix marking a keyword as a regular expression rather than a literal phrase
+REGEX_PREFIX = "re:"
+
+# Matching rules as (group, value, keywords, whole_words). Within a group,
+# earlier rules take priority. Keywords are matched anywhere in the
+# lowercased text unless whole_words is set.
+DEFAULT_RULES: List[Tuple[str, str, List[str], bool]] = [
+    # General flow: which specialized flow to start
+    ('intent', 'appointment', ['appointment', 'schedule', 'book', 'meeting', 'consultation', 'session'], False),
+    ('intent', 'message', ['message', 'tell', 're:let .* know', 'pass along', 'relay'], False),
+    ('intent', 'information', ['information', 'details', 'tell me about', 'what is', 'how do', 'hours',
+                               'location', 'address', 'phone', 'website', 'email'], False),
+    ('intent', 'escalation', ['re:speak to .* human', 're:speak to .* person', 'real person', 'supervisor',
+                              'manager', 'speak to someone else', 'transfer', 'operator'], False),
+    
+    # Appointment flow: what to do with the appointment
+    ('appointment_action', 'cancel', ['cancel', 'remove', 'delete', 'forget', 'never mind'], False),
+    ('appointment_action', 'reschedule', ['reschedule', 'change', 'move', 'different time', 'different day'], False),
+    ('appointment_action', 'inquire', ['check', 'find out', 'when is', 'do i have', 'confirm'], False),
+    
+    # Information flow: category of the question
+    ('info_category', 'hours', ['hours', 'open', 'close', 'time', 'schedule', 'when', 'day'], False),
+    ('info_category', 'location', ['location', 'address', 'where', 'place', 'direction', 'map', 'find you'], False),
+    ('info_category', 'services', ['service', 'offer', 'provide', 'do you', 'can you', 're:what.*do', 'available'], False),
+    ('info_category', 'pricing', ['price', 'cost', 'fee', 'rate', 'charge', 'how much', 'payment'], False),
+    ('info_category', 'contact', ['contact', 'email', 'phone', 'call_', 'number', 'reach'], False),
+    ('info_category', 'staff', ['staff', 'employee', 'person', 'people', 'team', 'expert', 'specialist',
+                                'doctor', 'provider'], False),
+    ('info_category', 'policies', ['policy', 'rule', 'guideline', 'requirement', 'cancel', 'reschedule',
+                                   'insurance'], False),
+    
+    # Information flow: more questions are coming
+    ('followup', 'followup', ['also', 'another question', 'one more thing', 'follow up', 'followup',
+                              'additionally', 'next', 'more', 'what about', 'how about', 'tell me about',
+                              'and', 'plus'], False),
+    
+    # Message flow: urgency of the message
+    ('urgency', 'critical', ['emergency', 'urgent', 'critical', 'asap', 'immediately', 'right away',
+                             'life or death', 'crisis'], False),
+    ('urgency', 'high', ['important', 'priority', 'pressing', 'significant', 'soon', 'quickly'], False),
+    ('urgency', 'low', ['whenever', 'no rush', 'low priority', 'not urgent', 'can wait', 'eventually',
+                        'not important'], False),
+    
+    # Message flow: whether the caller wants to be called back
+    ('callback', 'requested', ['call back', 'callback', 'return call', 'call me', 'reach me', 'get back to me',
+                               'reach out', 'contact me'], False),
+    ('callback', 'declined', ['no need to call', "don't call", 'do not call', "won't be available",
+                              'not necessary to call'], False),
+    
+    # Confirmations and denials; the second confirmation rule of each flow
+    # covers phrases that only confirm its own action
+    ('confirmation', 'yes', ['yes', 'yeah', 'sure', 'confirm', 'correct', 'right', 'ok', 'okay', 'fine', 'good',
+                             'perfect', 'sounds good', 'that works'], True),
+    ('confirmation', 'appointment', ['book it', 'schedule it', 'make it', 'do it', 'proceed', 'go ahead'], True),
+    ('confirmation', 'message', ['save it', 'send it', 'deliver it', 'record it', 'take it', 'proceed',
+                                 'go ahead'], True),
+    ('denial', 'no', ['no', 'nope', 'not', "don't", 'do not', 'cancel', 'stop', 'forget', "won't", 'will not',
+                      'never mind', 'incorrect', 'wrong', 'bad', 'invalid', 'mistaken', 'error', 'mistake'], True)
+]
+
+class ScanResult:
+    """
+    Everything an utterance matched, by group in priority order.
+    """
+    
+    __slots__ = ('matches',)
+    
+    def __init__(self, matches: Dict[str, List[str]]):
+        """
+        Initialize the result.
+        
+        Args:
+            matches: Matched values by group, highest priority first
+        """
+        self.matches = matches
+    
+    def first(self, group: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Get the highest-priority match of a group.
+        
+        Args:
+            group: Rule group (e.g. 'intent')
+            default: Value returned if nothing in the group matched
+        
+        Returns:
+            The matched value or default
+        """
+        values = self.matches.get(group)
+        return values[0] if values else default
+    
+    def has(self, group: str, value: Optional[str] = None) -> bool:
+        """
+        Check whether a group (or one value of it) matched.
+        
+        Args:
+            group: Rule group
+            value: Specific value, or None for any value of the group
+        
+        Returns:
+            True if it matched
+        """
+        values = self.matches.get(group)
+        if not values:
+            return False
+        return value is None or value in values
+    
+    def __repr__(self) -> str:
+        return f"ScanResult({self.matches!r})"
+
+
+class IntentMatcher:
+    """
+    Matches all rules in a single scan of the text.
+    
+    Every keyword of every rule is compiled into one alternation. Searching
+    with it, restarting one character after each hit, visits every position
+    where some keyword matches. At each such position the keywords starting
+    with that character are checked, so a keyword hidden behind another one
+    at the same position (e.g. 'call' behind 'call back') is still found.
+    The result equals running each rule's search on its own.
+    """
+    
+    # Scan results kept for repeated lookups of the same utterance
+    CACHE_SIZE = 256
+    
+    def __init__(self, rules: List[Tuple[str, str, List[str], bool]] = DEFAULT_RULES):
+        """
+        Compile the rules.
+        
+        Args:
+            rules: (group, value, keywords, whole_words) rules; within a group,
+                earlier rules take priority
+        """
+        self._rules = [(group, value) for group, value, _, _ in rules]
+        
+        # One entry per distinct keyword pattern: (compiled pattern, rule indexes)
+        alternatives: "OrderedDict[str, List[int]]" = OrderedDict()
+        first_chars: Dict[str, Optional[str]] = {}
+        for index, (_, _, keywords, whole_words) in enumerate(rules):
+            for keyword in keywords:
+                if keyword.startswith(REGEX_PREFIX):
+                    pattern = keyword[len(REGEX_PREFIX):]
+                    first_char = pattern[0] if pattern[:1].isalnum() else None
+                else:
+                    pattern = re.escape(keyword.lower())
+                    first_char = keyword[0].lower()
+                if whole_words:
+                    pattern = rf"\b{pattern}\b"
+                
+                alternatives.setdefault(pattern, []).append(index)
+                first_chars[pattern] = first_char
+        
+        self._combined = re.compile("|".join(f"(?:{pattern})" for pattern in alternatives))
+        
+        # Keywords bucketed by their first character; None means any character
+        self._buckets: Dict[Optional[str], List[Tuple[Any, List[int]]]] = {}
+        for pattern, indexes in alternatives.items():
+            self._buckets.setdefault(first_chars[pattern], []).append((re.compile(pattern), indexes))
+        self._anywhere = self._buckets.pop(None, [])
+        
+        self._cache: "OrderedDict[str, ScanResult]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def scan(self, text: str) -> ScanResult:
+        """
+        Match all rules against a text.
+        
+        Args:
+            text: The utterance
+        
+        Returns:
+            The matches by group
+        """
+        with self._lock:
+            result = self._cache.get(text)
+            if result is not None:
+                self._cache.move_to_end(text)
+                return result
+        
+        result = self._scan(text.lower())
+        
+        with self._lock:
+            self._cache[text] = result
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+    
+    def _scan(self, text: str) -> ScanResult:
+        """
+        Match all rules against a lowercased text.
+        
+        Args:
+            text: The lowercased utterance
+        
+        Returns:
+            The matches by group
+        """
+        matched = set()
+        position = 0
+        while True:
+            hit = self._combined.search(text, position)
+            if hit is None:
+                break
+            
+            start = hit.start()
+            for pattern, indexes in self._buckets.get(text[start], []) + self._anywhere:
+                if pattern.match(text, start):
+                    matched.update(indexes)
+            position = start + 1
+        
+        matches: Dict[str, List[str]] = {}
+        for index in sorted(matched):
+            group, value = self._rules[index]
+            matches.setdefault(group, []).append(value)
+        return ScanResult(matches)
+
+
+# Shared matcher for the default rules
+_matcher: Optional[IntentMatcher] = None
+_matcher_lock = threading.Lock()
+
+def get_intent_matcher() -> IntentMatcher:
+    """
+    Get the shared matcher of the default rules, compiling it on first use.
+    
+    Returns:
+        The shared matcher
+    """
+    global _matcher
+    
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = IntentMatcher()
+    
+    return _matcher
+
+def scan(text: str) -> ScanResult:
+    """
+    Match the default rules against a text.
+    
+    Args:
+        text: The utterance
+    
+    Returns:
+        The matches by group
+    """
+    return get_intent_matcher().scan(text)
@@ -6,23 +6,31 @@ import unittest
 import tempfile
 import json
 import yaml
-from unittest.mock import MagicMock, patch, Mock
+import asyncio
+import time
+from unittest.mock import MagicMock, AsyncMock, patch, Mock
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.llm.ollama_client import OllamaClient
-from src.llm.context import ConversationContext
-from src.llm.prompts import get_prompt_template, format_prompt, create_custom_prompt
+from src.llm.ollama_client import OllamaClient, StreamEvent
+from src.llm.response_cache import ResponseCache
+from src.llm.semantic_cache import SemanticCache
+from src.llm.dispatcher import GenerationDispatcher
+from src.llm.context import ConversationContext, count_tokens, TOKENS_PER_MESSAGE
+from src.llm.prompt_session import PromptSession
+from src.llm.prompts import (
+    get_prompt_template, format_prompt, create_custom_prompt, compile_template, PromptStore
+)
 
 class TestOllamaClient(unittest.TestCase):
     """Test cases for the OllamaClient class."""
     
     def setUp(self):
         """Set up test fixtures."""
-        # Mock the requests module
-        self.requests_patcher = patch('requests.post')
-        self.requests_get_patcher = patch('requests.get')
+        # Mock the pooled HTTP client
+        self.requests_patcher = patch('httpx.Client.post')
+        self.requests_get_patcher = patch('httpx.Client.get')
         
         self.mock_post = self.requests_patcher.start()
         self.mock_get = self.requests_get_patcher.start()
@@ -63,6 +71,7 @@ class TestOllamaClient(unittest.TestCase):
     
     def tearDown(self):
         """Tear down test fixtures."""
+        self.client.close()
         self.requests_patcher.stop()
         self.requests_get_patcher.stop()
         os.unlink(self.config_file.name)
@@ -120,8 +129,453 @@ class TestOllamaClient(unittest.TestCase):
         # Check that the POST request was made correctly
         args, kwargs = self.mock_post.call_args
         self.assertEqual(args[0], "http://localhost:11434/api/embeddings")
-        self.assertEqual(kwargs['json']['model'], "mistral")
+        self.assertEqual(kwargs['json']['model'], self.client.embedding_model)
+        self.assertNotEqual(kwargs['json']['model'], self.client.model)
         self.assertEqual(kwargs['json']['prompt'], "Test text")
+    
+    def test_connection_pool_reused(self):
+        """Test that requests share one keep-alive client with the configured limits."""
+        client = self.client._get_client()
+        
+        self.client.generate_response([{"role": "user", "content": "Hello"}])
+        self.client.embed_text("Test text")
+        
+        self.assertIs(self.client._get_client(), client)
+        self.assertEqual(self.client._client_options()['limits'].max_connections, self.client.max_connections)
+        self.client.close()
+        self.assertIsNone(self.client._client)
+    
+    def test_async_client_replaced_per_loop(self):
+        """Test that the async client of a finished event loop is closed when replaced."""
+        async def get_client():
+            return self.client._get_async_client()
+        
+        async def replace_client():
+            client = self.client._get_async_client()
+            await asyncio.sleep(0)
+            return client
+        
+        first = asyncio.run(get_client())
+        second = asyncio.run(replace_client())
+        
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertFalse(second.is_closed)
+    
+    def test_model_availability_cached(self):
+        """Test that model availability is checked once, not on every request."""
+        messages = [{"role": "user", "content": "Hello"}]
+        self.client.generate_response(messages)
+        self.client.generate_response(messages)
+        
+        self.assertEqual(self.mock_get.call_count, 1)
+        self.assertTrue(self.client._model_known_available())
+    
+    def test_model_not_found_invalidates_cache(self):
+        """Test that a 404 from the chat endpoint re-checks the model and retries."""
+        messages = [{"role": "user", "content": "Hello"}]
+        self.client.generate_response(messages)
+        
+        not_found = Mock()
+        not_found.status_code = 404
+        not_found.text = '{"error": "model \'mistral\' not found"}'
+        self.mock_post.side_effect = [not_found, self.mock_response]
+        
+        response = self.client.generate_response(messages)
+        
+        self.assertEqual(response, "This is a test response")
+        self.assertEqual(self.mock_get.call_count, 2)
+        self.assertEqual(self.mock_post.call_count, 3)
+    
+    def test_response_cache(self):
+        """Test that deterministic requests are served from the response cache."""
+        messages = [{"role": "user", "content": "What are your opening hours?"}]
+        
+        first = self.client.generate_response(messages, {"temperature": 0})
+        second = self.client.generate_response(messages, {"temperature": 0})
+        
+        self.assertEqual(first, second)
+        self.assertEqual(self.mock_post.call_count, 1)
+        self.assertEqual(self.client.response_cache.get_stats()['hits'], 1)
+        
+        # Sampled requests always go to the model
+        self.client.generate_response(messages)
+        self.client.generate_response(messages)
+        self.assertEqual(self.mock_post.call_count, 3)
+    
+    def test_response_cache_eviction(self):
+        """Test LRU eviction and TTL expiry of the response cache."""
+        cache = ResponseCache(max_size=2, ttl=60)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+        
+        self.assertEqual(cache.get("a"), "A")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        
+        expired = ResponseCache(ttl=0)
+        expired.set("a", "A")
+        self.assertIsNone(expired.get("a"))
+        
+        key = ResponseCache.make_key("mistral", [{"role": "user", "content": "Hi"}], {"b": 1, "a": 2})
+        self.assertEqual(key, ResponseCache.make_key("mistral", [{"role": "user", "content": "Hi"}], {"a": 2, "b": 1}))
+    
+    def test_iter_stream_events(self):
+        """Test streaming a response as typed events."""
+        stream_response = MagicMock()
+        stream_response.status_code = 200
+        stream_response.iter_lines.return_value = [
+            json.dumps({"message": {"content": "Hello"}, "done": False}),
+            "",
+            json.dumps({"message": {"content": " there"}, "done": False}),
+            json.dumps({"message": {"content": ""}, "done": True, "eval_count": 20, "eval_duration": 500000000})
+        ]
+        
+        with patch('httpx.Client.stream') as mock_stream:
+            mock_stream.return_value.__enter__.return_value = stream_response
+            events = list(self.client.iter_stream([{"role": "user", "content": "Hi"}]))
+        
+        self.assertEqual([event.type for event in events],
+                         [StreamEvent.DELTA, StreamEvent.DELTA, StreamEvent.DONE])
+        self.assertEqual(events[-1].text, "Hello there")
+        self.assertEqual(events[-1].stats['eval_count'], 20)
+        self.assertAlmostEqual(events[-1].stats['tokens_per_second'], 40.0)
+        
+        # The callback API reports the chunks and failure of an incomplete stream
+        chunks = []
+        stream_response.iter_lines.return_value = [json.dumps({"message": {"content": "Hel"}, "done": False})]
+        with patch('httpx.Client.stream') as mock_stream:
+            mock_stream.return_value.__enter__.return_value = stream_response
+            result = self.client.stream_response([{"role": "user", "content": "Hi"}], chunks.append)
+        
+        self.assertFalse(result)
+        self.assertEqual(chunks, ["Hel"])
+    
+    def test_prompt_prefix_reuse(self):
+        """Test that a session only sends new turns while its prefix is unchanged."""
+        context = ConversationContext(config={})
+        context.add_system_message("You are a helpful assistant.")
+        context.add_user_message("Hello")
+        session = PromptSession(context)
+        
+        self.mock_response.json.return_value = {"response": "Hi there", "context": [1, 2, 3]}
+        reply = self.client.generate_response(context.get_context(), session=session)
+        self.assertEqual(reply, "Hi there")
+        
+        args, kwargs = self.mock_post.call_args
+        self.assertEqual(args[0], "http://localhost:11434/api/generate")
+        self.assertEqual(kwargs['json']['system'], "You are a helpful assistant.")
+        self.assertEqual(kwargs['json']['prompt'], "Hello")
+        self.assertNotIn('context', kwargs['json'])
+        
+        # Only the new turn is sent, continuing from the returned context
+        context.add_assistant_message(reply)
+        context.add_user_message("Can I book an appointment?")
+        self.mock_response.json.return_value = {"response": "Sure", "context": [1, 2, 3, 4]}
+        self.client.generate_response(context.get_context(), session=session)
+        
+        _, kwargs = self.mock_post.call_args
+        self.assertEqual(kwargs['json']['context'], [1, 2, 3])
+        self.assertEqual(kwargs['json']['prompt'], "Can I book an appointment?")
+        self.assertNotIn('system', kwargs['json'])
+        
+        # Rewriting the history (here: trimming) falls back to the full prompt
+        context.add_assistant_message("Sure")
+        context.max_history = 3
+        context.add_user_message("Tomorrow at noon")
+        self.client.generate_response(context.get_context(), session=session)
+        
+        _, kwargs = self.mock_post.call_args
+        self.assertNotIn('context', kwargs['json'])
+        self.assertEqual(session.get_stats(), {'reused': 1, 'prefilled': 2})
+    
+    def test_prompt_session_rewrite_during_generation(self):
+        """Test that a history rewrite made while a reply generates invalidates its tokens."""
+        context = ConversationContext(config={})
+        context.add_system_message("You are a helpful assistant.")
+        context.add_user_message("Hello")
+        session = PromptSession(context)
+        
+        messages = context.get_context()
+        session.prepare(messages)
+        # A background summary is folded in before the reply arrives
+        context.revision += 1
+        session.update(messages, "Hi there", [1, 2, 3])
+        
+        context.add_assistant_message("Hi there")
+        context.add_user_message("Can I book an appointment?")
+        _, tokens = session.prepare(context.get_context())
+        self.assertIsNone(tokens)
+    
+    def test_full_prompt_keeps_system_message_order(self):
+        """Test that system messages added mid-conversation stay inline in the full prompt."""
+        context = ConversationContext(config={})
+        context.add_system_message("You are a helpful assistant.")
+        context.add_user_message("Book me for Friday")
+        context.add_assistant_message("Booking now")
+        context.add_system_message("Action result: booked Friday 10am")
+        context.add_user_message("Thanks")
+        
+        self.mock_response.json.return_value = {"response": "You're welcome", "context": [1, 2]}
+        self.client.generate_response(context.get_context(), session=PromptSession(context))
+        
+        _, kwargs = self.mock_post.call_args
+        self.assertEqual(kwargs['json']['system'], "You are a helpful assistant.")
+        self.assertEqual(kwargs['json']['prompt'], "\n".join([
+            "Caller: Book me for Friday",
+            "Assistant: Booking now",
+            "Note: Action result: booked Friday 10am",
+            "Caller: Thanks"
+        ]))
+    
+    def test_async_generate_response(self):
+        """Test generating a response with the async client."""
+        async def scenario():
+            with patch('httpx.AsyncClient.get', new_callable=AsyncMock) as mock_get, \
+                    patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+                mock_get.return_value = self.mock_get_response
+                mock_post.return_value = self.mock_response
+                response = await self.client.agenerate_response([{"role": "user", "content": "Hello"}])
+                return response, mock_post.call_args
+        
+        response, call_args = asyncio.run(scenario())
+        
+        self.assertEqual(response, "This is a test response")
+        self.assertEqual(call_args.args[0], "http://localhost:11434/api/chat")
+        self.assertFalse(call_args.kwargs['json']['stream'])
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Test cases for the SemanticCache class."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        # Paraphrases get nearby vectors, unrelated questions orthogonal ones
+        self.embeddings = {
+            "what are your hours": [1.0, 0.0, 0.0],
+            "when are you open": [0.95, 0.1, 0.0],
+            "where are you located": [0.0, 1.0, 0.0],
+            "do you take insurance": [0.0, 0.0, 1.0]
+        }
+        self.embed_fn = MagicMock(side_effect=lambda text: self.embeddings.get(text))
+        self.cache = SemanticCache(self.embed_fn, threshold=0.9, max_entries=2)
+    
+    def test_paraphrase_hit(self):
+        """Test that a paraphrase of a cached question is answered from the cache."""
+        self.assertTrue(self.cache.put("what are your hours", "9 to 5"))
+        
+        self.assertEqual(self.cache.get("when are you open"), "9 to 5")
+        self.assertIsNone(self.cache.get("where are you located"))
+        self.assertIsNone(self.cache.get("when are you open", namespace="other"))
+        self.assertIsNone(self.cache.get("unknown question"))
+        
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 3)
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used answer is evicted when full."""
+        self.cache.put("what are your hours", "9 to 5")
+        self.cache.put("where are you located", "Main Street")
+        self.cache.get("what are your hours")
+        self.cache.put("do you take insurance", "Yes")
+        
+        self.assertEqual(self.cache.get("when are you open"), "9 to 5")
+        self.assertIsNone(self.cache.get("where are you located"))
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
+        
+        # The lookup embedding is reused by the following put
+        calls = self.embed_fn.call_count
+        self.cache.get("do you take insurance")
+        self.cache.put("do you take insurance", "Most plans")
+        self.assertEqual(self.embed_fn.call_count, calls)
+    
+    def test_clear_namespace(self):
+        """Test that clearing one namespace keeps the answers of the others."""
+        self.cache.put("what are your hours", "9 to 5", namespace="call-a")
+        self.cache.put("what are your hours", "10 to 6", namespace="call-b")
+        
+        self.cache.clear("call-a")
+        
+        self.assertIsNone(self.cache.get("when are you open", namespace="call-a"))
+        self.assertEqual(self.cache.get("when are you open", namespace="call-b"), "10 to 6")
+        self.assertEqual(self.cache.get_stats()['size'], 1)
+
+
+class TestGenerationDispatcher(unittest.TestCase):
+    """Test cases for the GenerationDispatcher class."""
+    
+    def test_bounded_priority_dispatch(self):
+        """Test that in-flight requests are capped and live turns go first."""
+        async def scenario():
+            dispatcher = GenerationDispatcher(max_in_flight=2, max_batch_wait=0.01)
+            release = asyncio.Event()
+            started = []
+            peak = []
+            
+            async def generate(name):
+                started.append(name)
+                peak.append(dispatcher.in_flight)
+                await release.wait()
+                return name.upper()
+            
+            requests = [
+                asyncio.ensure_future(dispatcher.submit(GenerationDispatcher.PRIORITY_LIVE, generate, "live1")),
+                asyncio.ensure_future(dispatcher.submit(GenerationDispatcher.PRIORITY_LIVE, generate, "live2")),
+                asyncio.ensure_future(dispatcher.submit(GenerationDispatcher.PRIORITY_BACKGROUND, generate, "summary")),
+                asyncio.ensure_future(dispatcher.submit(GenerationDispatcher.PRIORITY_LIVE, generate, "live3"))
+            ]
+            await asyncio.sleep(0.05)
+            stats = dispatcher.get_stats()
+            waiting = stats['live']['queued'] + stats['background']['queued']
+            
+            release.set()
+            results = await asyncio.gather(*requests)
+            return started, max(peak), waiting, results, dispatcher.get_stats()
+        
+        started, peak, waiting, results, stats = asyncio.run(scenario())
+        
+        self.assertEqual(peak, 2)
+        self.assertEqual(waiting, 2)
+        self.assertEqual(started, ["live1", "live2", "live3", "summary"])
+        self.assertEqual(results, ["LIVE1", "LIVE2", "SUMMARY", "LIVE3"])
+        self.assertEqual(stats['live']['completed'], 3)
+        self.assertEqual(stats['background']['completed'], 1)
+    
+    def test_background_preempted_by_live_turn(self):
+        """Test that a live turn preempts running background work, which is retried."""
+        async def scenario():
+            dispatcher = GenerationDispatcher(max_in_flight=1, max_batch_wait=0.01)
+            attempts = []
+            
+            async def summarize():
+                attempts.append("summary")
+                await asyncio.sleep(0.1)
+                return "summary"
+            
+            async def answer():
+                attempts.append("live")
+                return "answer"
+            
+            background = asyncio.ensure_future(dispatcher.submit(GenerationDispatcher.PRIORITY_BACKGROUND, summarize))
+            await asyncio.sleep(0.03)
+            live = await dispatcher.submit(GenerationDispatcher.PRIORITY_LIVE, answer)
+            return live, await background, attempts, dispatcher.get_stats()
+        
+        live, background, attempts, stats = asyncio.run(scenario())
+        
+        self.assertEqual(live, "answer")
+        self.assertEqual(background, "summary")
+        self.assertEqual(attempts, ["summary", "live", "summary"])
+        self.assertEqual(stats['background']['preempted'], 1)
+        self.assertLess(stats['live']['max_wait'], 0.05)
+    
+    def test_preempted_generation_aborted_not_duplicated(self):
+        """Test that preempting an async generation aborts it instead of finishing it twice."""
+        class FakeClient:
+            def __init__(self):
+                self.started = 0
+                self.aborted = 0
+                self.finished = 0
+            
+            async def agenerate_response(self, messages, options=None):
+                self.started += 1
+                try:
+                    await asyncio.sleep(0.1)
+                except asyncio.CancelledError:
+                    self.aborted += 1
+                    raise
+                self.finished += 1
+                return messages[-1]['content']
+        
+        async def scenario():
+            dispatcher = GenerationDispatcher(max_in_flight=1, max_batch_wait=0.01)
+            client = FakeClient()
+            summary = [{"role": "user", "content": "summary"}]
+            turn = [{"role": "user", "content": "answer"}]
+            
+            background = asyncio.ensure_future(
+                dispatcher.generate(client, summary, priority=GenerationDispatcher.PRIORITY_BACKGROUND)
+            )
+            await asyncio.sleep(0.03)
+            live = await dispatcher.generate(client, turn)
+            return live, await background, client
+        
+        live, background, client = asyncio.run(scenario())
+        
+        self.assertEqual(live, "answer")
+        self.assertEqual(background, "summary")
+        self.assertEqual(client.started, 3)
+        self.assertEqual(client.aborted, 1)
+        self.assertEqual(client.finished, 2)
+    
+    def test_blocking_background_not_preempted(self):
+        """Test that work on a worker thread is not preempted and run a second time."""
+        calls = []
+        
+        def summarize():
+            calls.append("summary")
+            time.sleep(0.1)
+            return "summary"
+        
+        async def scenario():
+            dispatcher = GenerationDispatcher(max_in_flight=1, max_batch_wait=0.01)
+            loop = asyncio.get_running_loop()
+            
+            async def run_blocking(func):
+                return await loop.run_in_executor(None, func)
+            
+            background = asyncio.ensure_future(
+                dispatcher.submit_blocking(GenerationDispatcher.PRIORITY_BACKGROUND, run_blocking, summarize)
+            )
+            await asyncio.sleep(0.03)
+            live = await dispatcher.submit_blocking(GenerationDispatcher.PRIORITY_LIVE, run_blocking, lambda: "answer")
+            return live, await background, dispatcher.get_stats()
+        
+        live, background, stats = asyncio.run(scenario())
+        
+        self.assertEqual(live, "answer")
+        self.assertEqual(background, "summary")
+        self.assertEqual(calls, ["summary"])
+        self.assertEqual(stats['background']['preempted'], 0)
+    
+    def test_cancelled_blocking_request_keeps_slot(self):
+        """Test that a cancelled blocking request holds its slot until its thread finishes."""
+        events = []
+        
+        def generate(name, seconds):
+            events.append(f"start {name}")
+            time.sleep(seconds)
+            events.append(f"end {name}")
+            return name
+        
+        async def scenario():
+            dispatcher = GenerationDispatcher(max_in_flight=1)
+            loop = asyncio.get_running_loop()
+            
+            async def run_blocking(*args):
+                return await loop.run_in_executor(None, generate, *args)
+            
+            # The caller hangs up while its generation is running
+            abandoned = asyncio.ensure_future(
+                dispatcher.submit_blocking(GenerationDispatcher.PRIORITY_LIVE, run_blocking, "first", 0.2)
+            )
+            await asyncio.sleep(0.05)
+            abandoned.cancel()
+            await asyncio.sleep(0)
+            in_flight = dispatcher.in_flight
+            
+            result = await dispatcher.submit_blocking(GenerationDispatcher.PRIORITY_LIVE, run_blocking, "second", 0)
+            return result, in_flight, dispatcher.in_flight
+        
+        result, in_flight_after_cancel, in_flight_after = asyncio.run(scenario())
+        
+        self.assertEqual(result, "second")
+        self.assertEqual(in_flight_after_cancel, 1)
+        self.assertEqual(in_flight_after, 0)
+        self.assertEqual(events, ["start first", "end first", "start second", "end second"])
 
 
 class TestConversationContext(unittest.TestCase):
@@ -255,6 +709,56 @@ class TestConversationContext(unittest.TestCase):
         system_messages = [msg for msg in self.context.messages if msg['role'] == 'system']
         self.assertEqual(len(system_messages), 2)  # Initial + added
     
+    def test_token_limit(self):
+        """Test that history is trimmed to the token limit with a running total."""
+        self.context.max_history = 100
+        self.context.token_limit = 120
+        self.context.init_conversation()
+        
+        for i in range(20):
+            self.context.add_user_message(f"User message {i} " + "word " * 10)
+            self.context.add_assistant_message(f"Assistant message {i}")
+        
+        messages = self.context.get_context()
+        recount = sum(count_tokens(msg['content']) + TOKENS_PER_MESSAGE for msg in messages)
+        
+        self.assertEqual(self.context.total_tokens, recount)
+        self.assertLessEqual(self.context.total_tokens, 120)
+        self.assertEqual(messages[0]['role'], "system")
+        self.assertEqual(messages[-1]['content'], "Assistant message 19")
+        self.assertLess(len(messages), 40)
+    
+    def test_rolling_summary(self):
+        """Test folding old turns into a running summary in the background."""
+        self.context.summary_threshold = 4
+        self.context.summary_keep_recent = 2
+        self.context.init_conversation()
+        
+        for i in range(3):
+            self.context.add_user_message(f"User message {i}")
+            self.context.add_assistant_message(f"Assistant message {i}")
+        self.assertTrue(self.context.needs_summary())
+        
+        async def generate(messages):
+            self.assertEqual(messages[0]['role'], "system")
+            self.assertIn("User: User message 0", messages[1]['content'])
+            # A turn arriving while the summary is generated is kept
+            self.context.add_user_message("User message 3")
+            return "The caller asked three questions."
+        
+        self.assertTrue(asyncio.run(self.context.summarize(generate)))
+        
+        messages = self.context.get_context()
+        self.assertEqual([msg['role'] for msg in messages], ["system", "system", "user", "assistant", "user"])
+        self.assertIn("The caller asked three questions.", messages[1]['content'])
+        self.assertEqual(messages[2]['content'], "User message 2")
+        self.assertEqual(self.context.summary, "The caller asked three questions.")
+        self.assertEqual(
+            self.context.total_tokens,
+            sum(count_tokens(msg['content']) + TOKENS_PER_MESSAGE for msg in messages)
+        )
+        self.assertFalse(self.context.needs_summary())
+    
     def test_save_and_load(self):
         """Test saving and loading conversation state."""
         self.context.init_conversation(conversation_id="test-save-load")
@@ -294,10 +798,13 @@ class TestPrompts(unittest.TestCase):
                     'custom_prompt': 'This is a custom prompt for {business_name}.'
                 }
             }, f)
+        self.overlay_file = os.path.splitext(self.config_file.name)[0] + '.prompts.yml'
     
     def tearDown(self):
         """Tear down test fixtures."""
         os.unlink(self.config_file.name)
+        if os.path.exists(self.overlay_file):
+            os.unlink(self.overlay_file)
     
     def test_get_default_prompt(self):
         """Test getting a default prompt template."""
@@ -317,6 +824,42 @@ class TestPrompts(unittest.TestCase):
         prompt = get_prompt_template("call_answering", self.config_file.name)
         self.assertIn("You are an AI call secretary", prompt)
     
+    def test_prompt_store_reload(self):
+        """Test that the prompt store picks up an edited config file."""
+        store = PromptStore(self.config_file.name, poll_interval=0)
+        self.assertEqual(store.get("custom_prompt"), 'This is a custom prompt for {business_name}.')
+        
+        # Lookups do not read the file
+        with patch('builtins.open') as mock_open:
+            store.get("custom_prompt")
+            store.get("nonexistent_type")
+            mock_open.assert_not_called()
+        
+        with open(self.config_file.name, 'w') as f:
+            yaml.dump({'prompts': {'custom_prompt': 'Edited prompt.'}}, f)
+        os.utime(self.config_file.name, ns=(0, 0))
+        self.assertEqual(store.get("custom_prompt"), 'Edited prompt.')
+    
+    def test_conversation_prompt_from_store(self):
+        """Test that conversations use configured prompts only when they can be fully rendered."""
+        with open(self.config_file.name, 'w') as f:
+            yaml.dump({'llm': {'prompts': {
+                'call_answering': 'I am {assistant_name} of {business_name}.',
+                'voicemail': 'Leave a message for {business_name}, {caller_name}.'
+            }}}, f)
+        
+        context = ConversationContext(self.config_file.name)
+        
+        # Configured prompts are used, with defaults for missing variables
+        context.init_conversation(context_type="voicemail", caller_name="Ann")
+        self.assertEqual(context.messages[0]['content'], "Leave a message for the business, Ann.")
+        
+        # A prompt with variables no conversation provides falls back to the built-in one
+        context.init_conversation(context_type="call_answering", business_name="Test Company")
+        system_prompt = context.messages[0]['content']
+        self.assertIn("You are an AI call secretary for Test Company.", system_prompt)
+        self.assertNotIn("{assistant_name}", system_prompt)
+    
     def test_format_prompt(self):
         """Test formatting a prompt template."""
         template = "Hello, {name}! Welcome to {business_name}."
@@ -338,6 +881,29 @@ class TestPrompts(unittest.TestCase):
         result = format_prompt(template, {"name": "Test"})
         self.assertIn("Hello, Test!", result)
     
+    def test_compiled_template(self):
+        """Test rendering a compiled template."""
+        template = compile_template("Hi {caller_name}, call {call_id!r} for {business_name:>5}. {{literal}}")
+        self.assertIs(compile_template(template.text), template)
+        self.assertEqual(template.fields, ("caller_name", "call_id", "business_name"))
+        
+        result = template.render({"caller_name": "Ann", "call_id": "c1", "business_name": "Co"})
+        self.assertEqual(result, "Hi Ann, call 'c1' for    Co. {literal}")
+        
+        # The static variables are bound once; other calls only fill their own fields
+        result = template.render({"caller_name": "Bob", "call_id": "c2", "business_name": "Co"})
+        self.assertEqual(result, "Hi Bob, call 'c2' for    Co. {literal}")
+        self.assertEqual(len(template._bindings), 1)
+        bound = template._bound_segments({"business_name": "Co"})
+        self.assertEqual([segment[0] for segment in bound if not isinstance(segment, str)], ["caller_name", "call_id"])
+        self.assertEqual(bound[-1], " for    Co. {literal}")
+        
+        # Missing variables keep their placeholder
+        result = template.render({"caller_name": "Ann"})
+        self.assertEqual(result, "Hi Ann, call {call_id!r} for {business_name:>5}. {literal}")
+        self.assertEqual(template.validate(), [])
+        self.assertEqual(compile_template("{unknown}").validate(), ["unknown"])
+    
     def test_create_custom_prompt(self):
         """Test creating a custom prompt."""
         result = create_custom_prompt(
@@ -347,12 +913,13 @@ class TestPrompts(unittest.TestCase):
         )
         self.assertTrue(result)
         
-        # Check that the prompt was saved
-        with open(self.config_file.name, 'r') as f:
-            config = yaml.safe_load(f)
+        # Check that the prompt was saved to the overlay, leaving the config as it was
+        with open(self.overlay_file, 'r') as f:
+            overlay = yaml.safe_load(f)
         
-        self.assertIn('test_prompt', config['prompts'])
-        self.assertEqual(config['prompts']['test_prompt'], "This is a test prompt for {name}.")
+        self.assertEqual(overlay['prompts']['test_prompt'], "This is a test prompt for {name}.")
+        with open(self.config_file.name, 'r') as f:
+            self.assertNotIn('test_prompt', yaml.safe_load(f)['prompts'])
         
         # Test that the prompt can be retrieved
         prompt = get_prompt_template("test_prompt", self.config_file.name)
@@ -3,8 +3,11 @@ Tests for telephony functionality.
 """
 import os
 import unittest
+import asyncio
 import time
-from unittest.mock import MagicMock, patch
+import threading
+import numpy as np
+from unittest.mock import MagicMock, AsyncMock, patch
 import yaml
 
 import sys
@@ -12,6 +15,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.telephony.call_router import CallRouter
 from src.telephony.call_handler import CallHandler
+from src.telephony.server import CallScheduler, EslSession
+from src.telephony.media_server import MediaServer, MediaStream
+from src.model_registry import ModelRegistry
 
 class TestCallRouter(unittest.TestCase):
     """Test cases for the CallRouter class."""
@@ -114,6 +120,7 @@ class TestCallHandler(unittest.TestCase):
         self.mock_tts = MagicMock()
         self.mock_llm = MagicMock()
         self.mock_context = MagicMock()
+        self.mock_context.needs_summary.return_value = False
         self.mock_action_handler = MagicMock()
         
         # Create a test call metadata
@@ -124,20 +131,23 @@ class TestCallHandler(unittest.TestCase):
             'timestamp': time.time()
         }
         
+        # Shared components come from the model registry
+        self.registry = ModelRegistry(config={})
+        self.registry.register('stt', self.mock_stt)
+        self.registry.register('tts', self.mock_tts)
+        self.registry.register('llm', self.mock_llm)
+        self.registry.register('actions', self.mock_action_handler)
+        
         # Patch the imports
         self.patches = [
-            patch('src.telephony.call_handler.SpeechToText', return_value=self.mock_stt),
-            patch('src.telephony.call_handler.TextToSpeech', return_value=self.mock_tts),
-            patch('src.telephony.call_handler.OllamaClient', return_value=self.mock_llm),
             patch('src.telephony.call_handler.ConversationContext', return_value=self.mock_context),
-            patch('src.telephony.call_handler.ActionHandler', return_value=self.mock_action_handler),
         ]
         
         for p in self.patches:
             p.start()
         
         # Create handler instance
-        self.handler = CallHandler(self.test_call_metadata)
+        self.handler = CallHandler(self.test_call_metadata, registry=self.registry)
         
         # Mock session
         self.mock_session = MagicMock()
@@ -194,7 +204,428 @@ class TestCallHandler(unittest.TestCase):
         self.mock_llm.generate_response.assert_called_once()
         self.mock_context.add_assistant_message.assert_called_once_with("This is the AI response")
         self.mock_action_handler.extract_actions.assert_called_once_with("This is the AI response")
+    
+    def test_streaming_conversation_flow(self):
+        """Test that streaming mode plays each sentence as it is generated."""
+        self.handler.streaming = True
+        self.mock_stt.transcribe.return_value = "This is a test message"
+        self.mock_action_handler.extract_actions.return_value = []
+        
+        def fake_stream(messages, callback, options=None, cancel_event=None):
+            for chunk in ["Sure", ", I can help. What", " day works", " for you?"]:
+                callback(chunk)
+            return True
+        
+        self.mock_llm.stream_response.side_effect = fake_stream
+        
+        with patch.object(self.handler, '_play_response') as mock_play:
+            with patch.object(self.handler, '_capture_audio') as mock_capture:
+                with patch.object(self.handler, '_should_end_call') as mock_end:
+                    mock_capture.side_effect = [b"AUDIO_DATA", None]
+                    mock_end.return_value = False
+                    
+                    self.handler.process_call(self.mock_session)
+        
+        played = [c.args[1] for c in mock_play.call_args_list]
+        self.assertIn("Sure, I can help.", played)
+        self.assertIn("What day works for you?", played)
+        self.mock_llm.generate_response.assert_not_called()
+        self.mock_context.add_assistant_message.assert_called_once_with(
+            "Sure, I can help. What day works for you?"
+        )
+    
+    def test_interrupted_stream_cancels_pending_synthesis(self):
+        """Test that sentences queued for synthesis are dropped when the turn is cancelled."""
+        release = threading.Event()
+        
+        def slow_synthesize(text):
+            release.wait(5)
+            return b"AUDIO"
+        
+        def fake_stream(messages, callback, options=None, cancel_event=None):
+            callback("First sentence. Second sentence. Third sentence.")
+            return True
         
+        self.registry.concurrency['tts'] = 1
+        self.mock_tts.synthesize.side_effect = slow_synthesize
+        self.mock_llm.stream_response.side_effect = fake_stream
+        
+        async def interrupt_turn():
+            turn = asyncio.ensure_future(self.handler._stream_and_play_response(self.mock_session))
+            await asyncio.sleep(0.2)
+            turn.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await turn
+            await asyncio.sleep(0.05)
+            release.set()
+            
+            # Give queued jobs the chance to run while the loop is still alive
+            await asyncio.sleep(0.2)
+        
+        asyncio.run(interrupt_turn())
+        
+        self.assertEqual(self.mock_tts.synthesize.call_count, 1)
+        self.registry.shutdown()
+    
+    def test_stream_ends_when_generation_fails_to_start(self):
+        """Test that a streaming turn ends if the generation request fails before running."""
+        async def failing_run_llm(func, *args, **kwargs):
+            raise RuntimeError("llm executor shut down")
+        
+        async def run_turn():
+            with patch.object(self.handler, '_run_llm', side_effect=failing_run_llm):
+                return await asyncio.wait_for(self.handler._stream_and_play_response(self.mock_session), 2)
+        
+        self.assertIsNone(asyncio.run(run_turn()))
+        self.mock_llm.stream_response.assert_not_called()
+    
+    def test_capture_audio_endpoints_on_silence(self):
+        """Test that capture stops after trailing silence and returns trimmed 16 kHz audio."""
+        t = np.arange(8000) / 8000
+        speech = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype('<i2').tobytes()
+        silence = bytes(16000)
+        audio = silence + speech + silence * 3
+        chunks = [audio[i:i + 320] for i in range(0, len(audio), 320)]
+        
+        self.mock_session.active = True
+        self.mock_session.read_audio = AsyncMock(side_effect=chunks)
+        
+        captured = asyncio.run(self.handler._capture_audio(self.mock_session))
+        
+        # 1s of speech plus 100ms padding either side, resampled to 16 kHz
+        self.assertEqual(len(captured), int(1.2 * 16000))
+        self.assertLess(self.mock_session.read_audio.await_count, len(chunks))
+    
+    def test_capture_audio_drops_silence(self):
+        """Test that silence-only captures never reach speech recognition."""
+        self.mock_session.active = True
+        self.mock_session.read_audio = AsyncMock(side_effect=[bytes(320)] * 100 + [b""])
+        
+        captured = asyncio.run(self.handler._capture_audio(self.mock_session))
+        
+        self.assertIsNone(captured)
+    
+    def test_barge_in_interrupts_playback(self):
+        """Test that caller speech during playback stops it and is captured."""
+        t = np.arange(8000) / 8000
+        speech = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype('<i2').tobytes()
+        audio = bytes(3200) + speech + bytes(16000)
+        chunks = [audio[i:i + 320] for i in range(0, len(audio), 320)]
+        
+        async def read_audio():
+            await asyncio.sleep(0)
+            return chunks.pop(0) if chunks else b""
+        
+        async def long_playback():
+            await asyncio.sleep(30)
+            return "finished"
+        
+        self.mock_session.active = True
+        self.mock_session.read_audio = read_audio
+        self.mock_session.stop_playback = AsyncMock()
+        
+        result, interrupted, captured = asyncio.run(
+            asyncio.wait_for(self.handler._speak(self.mock_session, long_playback()), 5)
+        )
+        
+        self.assertIsNone(result)
+        self.assertTrue(interrupted)
+        self.assertEqual(len(captured), int(1.2 * 16000))
+        self.mock_session.stop_playback.assert_awaited_once()
+    
+    def test_speech_during_prompt_end_carried_to_next_turn(self):
+        """Test that speech too short to barge in before playback ends starts the next turn."""
+        t = np.arange(8000) / 8000
+        speech = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype('<i2').tobytes()
+        audio = bytes(3200) + speech + bytes(16000)
+        chunks = [audio[i:i + 320] for i in range(0, len(audio), 320)]
+        # Playback ends after 200 ms of silence and 200 ms of speech, below
+        # the barge-in threshold
+        heard_during_playback = 20
+        consumed = []
+        
+        async def read_audio():
+            await asyncio.sleep(0)
+            if not chunks:
+                return b""
+            consumed.append(chunks[0])
+            return chunks.pop(0)
+        
+        async def short_playback():
+            while len(consumed) < heard_during_playback:
+                await asyncio.sleep(0)
+            return "finished"
+        
+        self.mock_session.active = True
+        self.mock_session.read_audio = read_audio
+        
+        async def scenario():
+            spoken = await self.handler._speak(self.mock_session, short_playback())
+            return spoken, await self.handler._capture_audio(self.mock_session)
+        
+        (result, interrupted, pending), captured = asyncio.run(asyncio.wait_for(scenario(), 5))
+        
+        self.assertEqual(result, "finished")
+        self.assertFalse(interrupted)
+        self.assertIsNone(pending)
+        # The whole second of speech plus padding, not just the part after playback
+        self.assertEqual(len(captured), int(1.2 * 16000))
+    
+    def test_faq_answers_scoped_to_call(self):
+        """Test that cached FAQ answers are only reused within the call that generated them."""
+        cache = MagicMock()
+        cache.get.return_value = None
+        self.handler.semantic_cache = cache
+        self.mock_context.context_type = 'faq_answering'
+        other = CallHandler({'call_id': 'test-call-456'}, registry=self.registry)
+        other.semantic_cache = cache
+        
+        asyncio.run(self.handler._remember_faq("What are your hours?", "9 to 5"))
+        asyncio.run(other._lookup_faq("When are you open?"))
+        
+        cache.put.assert_called_once_with("What are your hours?", "9 to 5", namespace="faq_answering:test-call-123")
+        cache.get.assert_called_once_with("When are you open?", namespace="faq_answering:test-call-456")
+    
+    def test_components_shared_between_calls(self):
+        """Test that concurrent calls share the registry's components."""
+        other = CallHandler({'call_id': 'test-call-456'}, registry=self.registry)
+        
+        self.assertIs(other.stt, self.handler.stt)
+        self.assertIs(other.llm, self.handler.llm)
+        self.assertIs(other.tts, self.handler.tts)
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Test cases for the ModelRegistry class."""
+    
+    def test_instances_created_once(self):
+        """Test that each component is built once and then reused."""
+        registry = ModelRegistry(config={'models': {'max_concurrency': {'stt': 2}}})
+        factory = MagicMock(side_effect=lambda: object())
+        registry._factories['stt'] = factory
+        
+        first = registry.get_stt()
+        second = registry.get_stt()
+        
+        self.assertIs(first, second)
+        factory.assert_called_once()
+        self.assertEqual(registry.concurrency['stt'], 2)
+    
+    def test_warm_up_loads_stt_model(self):
+        """Test that warming up loads the Whisper model ahead of time."""
+        registry = ModelRegistry(config={})
+        stt = MagicMock()
+        registry.register('stt', stt)
+        
+        registry.warm_up(['stt'])
+        
+        stt._ensure_model_loaded.assert_called_once()
+    
+    def test_shutdown_closes_llm_client(self):
+        """Test that shutting down closes the LLM client's connections."""
+        registry = ModelRegistry(config={})
+        llm = MagicMock()
+        llm.aclose = AsyncMock()
+        registry.register('llm', llm)
+        
+        asyncio.run(registry.ashutdown())
+        
+        llm.aclose.assert_awaited_once()
+        llm.close.assert_called_once()
+
+
+class TestTelephonyServer(unittest.TestCase):
+    """Test cases for the asyncio telephony server."""
+    
+    def test_scheduler_rejects_beyond_capacity(self):
+        """Test that calls beyond the active and pending limits are rejected."""
+        async def scenario():
+            scheduler = CallScheduler(max_active_calls=1, max_pending_calls=0, admission_timeout=0.1)
+            first = await scheduler.admit()
+            second = await scheduler.admit()
+            scheduler.release()
+            third = await scheduler.admit()
+            return first, second, third, scheduler.get_stats()
+        
+        first, second, third, stats = asyncio.run(scenario())
+        
+        self.assertTrue(first)
+        self.assertFalse(second)
+        self.assertTrue(third)
+        self.assertEqual(stats['rejected_calls'], 1)
+    
+    def test_scheduler_admits_waiting_call_when_slot_frees(self):
+        """Test that a pending call is admitted once a slot is released."""
+        async def scenario():
+            scheduler = CallScheduler(max_active_calls=1, max_pending_calls=1, admission_timeout=1.0)
+            await scheduler.admit()
+            waiting = asyncio.ensure_future(scheduler.admit())
+            await asyncio.sleep(0.01)
+            scheduler.release()
+            return await waiting
+        
+        self.assertTrue(asyncio.run(scenario()))
+    
+    def test_session_handshake_parses_channel_data(self):
+        """Test the outbound event socket handshake."""
+        async def scenario():
+            reader = asyncio.StreamReader()
+            reader.feed_data(
+                b"Content-Type: command/reply\n"
+                b"Reply-Text: +OK\n"
+                b"Unique-ID: abc-123\n"
+                b"Caller-Caller-ID-Number: 15551234567\n"
+                b"Caller-Caller-ID-Name: Test%20Caller\n\n"
+                b"Content-Type: command/reply\nReply-Text: +OK Events Enabled\n\n"
+                b"Content-Type: command/reply\nReply-Text: +OK will linger\n\n"
+            )
+            writer = MagicMock()
+            writer.drain = AsyncMock()
+            
+            session = EslSession(reader, writer)
+            await session.connect()
+            metadata = session.call_metadata()
+            
+            reader.feed_eof()
+            await asyncio.sleep(0)
+            return session, metadata
+        
+        session, metadata = asyncio.run(scenario())
+        
+        self.assertEqual(metadata['call_id'], 'abc-123')
+        self.assertEqual(metadata['caller_number'], '15551234567')
+        self.assertEqual(metadata['caller_name'], 'Test Caller')
+        self.assertFalse(session.active)
+    
+    def test_cancelled_command_keeps_replies_in_step(self):
+        """Test that a command cancelled mid-wait does not hand its reply to the next one."""
+        async def scenario():
+            reader = asyncio.StreamReader()
+            reader.feed_data(
+                b"Content-Type: command/reply\nReply-Text: +OK\nUnique-ID: abc-123\n\n"
+                b"Content-Type: command/reply\nReply-Text: +OK Events Enabled\n\n"
+                b"Content-Type: command/reply\nReply-Text: +OK will linger\n\n"
+            )
+            writer = MagicMock()
+            writer.drain = AsyncMock()
+            
+            session = EslSession(reader, writer)
+            await session.connect()
+            
+            # Barge-in cancels playback while it waits for its reply
+            playback = asyncio.ensure_future(session.execute("playback", "/tmp/reply.wav"))
+            await asyncio.sleep(0.01)
+            playback.cancel()
+            await asyncio.sleep(0)
+            
+            stop = asyncio.ensure_future(session.command("api uuid_break abc-123 all"))
+            await asyncio.sleep(0.01)
+            reader.feed_data(b"Content-Type: command/reply\nReply-Text: +OK playback\n\n")
+            reader.feed_data(b"Content-Type: api/response\nContent-Length: 9\n\n+OK break")
+            reply = await asyncio.wait_for(stop, 1)
+            
+            waiters = dict(session._waiters)
+            reader.feed_eof()
+            await asyncio.sleep(0)
+            return reply, waiters
+        
+        reply, waiters = asyncio.run(scenario())
+        
+        self.assertEqual(reply, "+OK break")
+        self.assertEqual(waiters, {})
+        
+
+
+class TestMediaServer(unittest.TestCase):
+    """Test cases for live call media ingestion."""
+    
+    def test_stream_reads_are_views_in_order(self):
+        """Test that reads return frame-aligned views of the written audio, across the wrap point."""
+        async def scenario():
+            stream = MediaStream('call-1', capacity=8)
+            stream.write(b"\x01\x02\x03\x04\x05\x06")
+            first = await stream.read(4)
+            first_bytes = bytes(first)
+            stream.write(b"\x07\x08\x09\x0a")
+            rest = []
+            while stream.available:
+                rest.append(bytes(await stream.read(8)))
+            stream.close()
+            end = await stream.read(8)
+            return first, first_bytes, rest, end
+        
+        first, first_bytes, rest, end = asyncio.run(scenario())
+        
+        self.assertIsInstance(first, memoryview)
+        self.assertEqual(first_bytes, b"\x01\x02\x03\x04")
+        self.assertEqual(b"".join(rest), b"\x05\x06\x07\x08\x09\x0a")
+        self.assertEqual(len(end), 0)
+    
+    def test_stream_drops_oldest_on_overrun(self):
+        """Test that a lagging reader loses the oldest audio, not the newest."""
+        async def scenario():
+            stream = MediaStream('call-1', capacity=4)
+            stream.write(b"\x01\x02\x03\x04\x05\x06")
+            data = b""
+            while stream.available:
+                data += bytes(await stream.read(4))
+            return data, stream.dropped_bytes
+        
+        data, dropped = asyncio.run(scenario())
+        
+        self.assertEqual(data, b"\x03\x04\x05\x06")
+        self.assertEqual(dropped, 2)
+    
+    def test_streams_demultiplexed_by_call(self):
+        """Test that each call gets its own stream and fork metadata names the call."""
+        server = MediaServer({'sample_rate': 8000, 'buffer_seconds': 1})
+        
+        self.assertIs(server.get_stream('a'), server.get_stream('a'))
+        self.assertIsNot(server.get_stream('a'), server.get_stream('b'))
+        self.assertEqual(server.get_stream('a').capacity, 16000)
+        self.assertEqual(MediaServer._call_id_from_metadata('{"uuid": "abc"}'), 'abc')
+        
+        server.release('a')
+        self.assertNotIn('a', server.streams)
+    
+    def test_closed_fork_forgets_stream(self):
+        """Test that a finished fork connection drops its stream from the server."""
+        class FakeWebSocket:
+            path = '/calls/ws-call'
+            
+            def __aiter__(self):
+                return self._messages()
+            
+            async def _messages(self):
+                yield bytes(320)
+        
+        async def scenario():
+            server = MediaServer({'sample_rate': 8000, 'buffer_seconds': 1})
+            stream = server.get_stream('tcp-call')
+            
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"tcp-call\n" + bytes(640))
+            reader.feed_eof()
+            await server._handle_tcp(reader, MagicMock())
+            await server._handle_websocket(FakeWebSocket())
+            return server, stream, len(await stream.read(1024))
+        
+        server, stream, buffered = asyncio.run(scenario())
+        
+        self.assertEqual(server.streams, {})
+        self.assertTrue(stream.closed)
+        self.assertEqual(buffered, 640)
+    
+    def test_session_reads_call_audio(self):
+        """Test that the event socket session reads its call's media stream."""
+        async def scenario():
+            session = EslSession(asyncio.StreamReader(), MagicMock())
+            session.media = MediaStream('call-1')
+            session.media.write(bytes(640))
+            return len(await session.read_audio())
+        
+        self.assertEqual(asyncio.run(scenario()), 320)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
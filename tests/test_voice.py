@@ -6,6 +6,10 @@ import unittest
 import tempfile
 import json
 import shutil
+import wave
+import io
+import asyncio
+import numpy as np
 from unittest.mock import MagicMock, patch
 
 import sys
@@ -14,6 +18,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.voice.stt import SpeechToText
 from src.voice.tts import TextToSpeech
 from src.voice.voice_clone import VoiceCloner
+from src.voice.sentence_splitter import SentenceSplitter
+from src.voice.audio import decode_audio, resample
+from src.voice.vad import VoiceActivityDetector, Endpointer
+from src.voice.batch_scheduler import TranscriptionBatchScheduler
 
 class TestSpeechToText(unittest.TestCase):
     """Test cases for the SpeechToText class."""
@@ -49,9 +57,10 @@ class TestSpeechToText(unittest.TestCase):
         """Test transcribing from bytes."""
         result = self.stt.transcribe(b"test audio data")
         
-        # Check that a temporary file was created (indirectly by checking the transcribe call)
+        # Bytes are decoded in memory and passed to the model as a waveform
         args, kwargs = self.model_mock.transcribe.call_args
-        self.assertTrue(isinstance(args[0], str))  # Should be a file path
+        self.assertIsInstance(args[0], np.ndarray)
+        self.assertEqual(args[0].dtype, np.float32)
         
         # Check the result
         self.assertEqual(result, "This is a test transcription")
@@ -75,6 +84,161 @@ class TestSpeechToText(unittest.TestCase):
         # Should return empty string on error
         result = self.stt.transcribe(b"test audio data")
         self.assertEqual(result, "")
+    
+    def test_stream_transcribe_partial_and_final(self):
+        """Test that streaming emits partials and finalizes agreed segments."""
+        self.model_mock.transcribe.side_effect = [
+            {"segments": [{"text": " Hello there.", "start": 0.0, "end": 0.9}]},
+            {"segments": [{"text": " Hello there.", "start": 0.0, "end": 0.9},
+                          {"text": " I need", "start": 1.0, "end": 1.8}]},
+            {"segments": [{"text": " I need an appointment.", "start": 0.1, "end": 1.9}]},
+            {"segments": [{"text": " I need an appointment.", "start": 0.1, "end": 1.9}]},
+        ]
+        
+        async def audio_chunks():
+            for _ in range(3):
+                yield bytes(16000)  # One second of 8 kHz 16-bit PCM
+        
+        async def collect():
+            return [event async for event in self.stt.stream_transcribe(audio_chunks(), chunk_duration_ms=1000)]
+        
+        events = asyncio.run(collect())
+        
+        finals = [event for event in events if event['is_final']]
+        partials = [event['text'] for event in events if not event['is_final']]
+        self.assertEqual([event['text'] for event in finals], ["Hello there.", "I need an appointment."])
+        self.assertIn("I need", partials)
+        self.assertAlmostEqual(finals[0]['end'], 0.9)
+        self.assertAlmostEqual(finals[1]['start'], 1.0)
+    
+    def test_stream_transcribe_full_window_keeps_step(self):
+        """Test that a full window is still decoded only once per step."""
+        words = iter(range(100))
+        self.model_mock.transcribe.side_effect = lambda *args, **kwargs: {
+            "segments": [{"text": f" word {next(words)}", "start": 0.0, "end": 0.1}]
+        }
+        
+        async def audio_chunks():
+            for _ in range(24):
+                yield bytes(4000)  # 250 ms of 8 kHz 16-bit PCM
+        
+        async def collect():
+            return [event async for event in self.stt.stream_transcribe(
+                audio_chunks(), chunk_duration_ms=1000, max_window_seconds=2.0
+            )]
+        
+        asyncio.run(collect())
+        
+        # Six seconds of audio: one decode per second plus the final flush
+        self.assertEqual(self.model_mock.transcribe.call_count, 7)
+
+
+class TestAudioDecoding(unittest.TestCase):
+    """Test cases for in-memory audio decoding."""
+    
+    def test_decode_wav_to_whisper_format(self):
+        """Test that a stereo 8 kHz WAV becomes mono 16 kHz float32."""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(np.full(1600, 16384, dtype='<i2').tobytes())
+        
+        audio = decode_audio(buffer.getvalue())
+        
+        self.assertEqual(audio.dtype, np.float32)
+        self.assertEqual(len(audio), 1600)  # 800 frames at 8 kHz -> 1600 at 16 kHz
+        self.assertTrue(np.allclose(audio, 0.5))
+    
+    def test_decode_raw_pcm(self):
+        """Test decoding raw 16-bit PCM at a given sample rate."""
+        pcm = np.array([0, 32767, -32768, 0], dtype='<i2').tobytes()
+        
+        audio = decode_audio(pcm, sample_rate=16000)
+        
+        self.assertEqual(len(audio), 4)
+        self.assertAlmostEqual(float(audio[2]), -1.0)
+    
+    def test_resample_length(self):
+        """Test that resampling scales the number of samples."""
+        audio = np.zeros(8000, dtype=np.float32)
+        self.assertEqual(len(resample(audio, 8000, 16000)), 16000)
+        self.assertEqual(len(resample(audio, 48000, 16000)), 2667)
+
+
+class TestVoiceActivityDetection(unittest.TestCase):
+    """Test cases for voice activity detection and endpointing."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.sample_rate = 8000
+        t = np.arange(self.sample_rate) / self.sample_rate
+        self.speech = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 660 * t)).astype(np.float32)
+        self.silence = np.zeros(self.sample_rate, dtype=np.float32)
+    
+    def test_trim_silence(self):
+        """Test that leading and trailing silence is trimmed."""
+        vad = VoiceActivityDetector(sample_rate=self.sample_rate)
+        audio = np.concatenate([self.silence, self.speech, self.silence])
+        
+        trimmed = vad.trim(audio, padding_ms=100)
+        
+        self.assertEqual(len(trimmed), int(1.2 * self.sample_rate))
+        self.assertIsNone(vad.trim(self.silence))
+    
+    def test_endpointer_ends_turn_after_trailing_silence(self):
+        """Test that the turn ends after the configured trailing silence."""
+        endpointer = Endpointer(VoiceActivityDetector(sample_rate=self.sample_rate), trailing_silence_ms=500)
+        audio = np.concatenate([self.silence[:4000], self.speech, self.silence])
+        
+        ended_at = None
+        for start in range(0, len(audio), 160):
+            if endpointer.process(audio[start:start + 160]):
+                ended_at = (start + 160) / self.sample_rate
+                break
+        
+        self.assertAlmostEqual(ended_at, 2.0, places=1)
+        self.assertEqual(len(endpointer.get_audio()), int(1.2 * self.sample_rate))
+    
+    def test_endpointer_ignores_scattered_clicks(self):
+        """Test that short noise bursts do not add up to the start of a turn."""
+        endpointer = Endpointer(VoiceActivityDetector(sample_rate=self.sample_rate), max_duration=2.0)
+        click = np.concatenate([self.speech[:320], self.silence[:480]])  # 40 ms of noise, 60 ms quiet
+        audio = np.concatenate([np.tile(click, 12), self.silence])
+        
+        for start in range(0, len(audio), 160):
+            endpointer.process(audio[start:start + 160])
+        
+        self.assertFalse(endpointer.speech_started)
+        self.assertIsNone(endpointer.get_audio())
+    
+    def test_endpointer_drops_silence_only_capture(self):
+        """Test that a capture without speech yields no audio."""
+        endpointer = Endpointer(VoiceActivityDetector(sample_rate=self.sample_rate), max_duration=1.0)
+        
+        self.assertTrue(endpointer.process(self.silence))
+        self.assertIsNone(endpointer.get_audio())
+
+
+class TestTranscriptionBatchScheduler(unittest.TestCase):
+    """Test cases for cross-call transcription batching."""
+    
+    def test_concurrent_utterances_are_batched(self):
+        """Test that concurrent utterances share batches and get their own results."""
+        stt = MagicMock()
+        stt.transcribe_batch.side_effect = lambda batch: [f"text {audio}" for audio in batch]
+        scheduler = TranscriptionBatchScheduler(stt, max_batch_size=2, max_batch_wait=0.01)
+        
+        async def scenario():
+            return await asyncio.gather(*(scheduler.transcribe(f"call-{i}") for i in range(3)))
+        
+        results = asyncio.run(scenario())
+        
+        self.assertEqual(results, ["text call-0", "text call-1", "text call-2"])
+        batch_sizes = [len(c.args[0]) for c in stt.transcribe_batch.call_args_list]
+        self.assertEqual(batch_sizes, [2, 1])
+        self.assertEqual(scheduler.get_stats()['batches'], 2)
 
 
 class TestTextToSpeech(unittest.TestCase):
@@ -136,6 +300,28 @@ class TestTextToSpeech(unittest.TestCase):
         self.assertEqual(result, b"")
 
 
+class TestSentenceSplitter(unittest.TestCase):
+    """Test cases for the SentenceSplitter class."""
+    
+    def test_sentences_across_chunks(self):
+        """Test that sentences split across stream chunks are reassembled."""
+        splitter = SentenceSplitter()
+        sentences = []
+        for chunk in ["Hello there", "! How can", " I help? I'm", " listening"]:
+            sentences.extend(splitter.feed(chunk))
+        
+        self.assertEqual(sentences, ["Hello there!", "How can I help?"])
+        self.assertEqual(splitter.flush(), "I'm listening")
+        self.assertIsNone(splitter.flush())
+    
+    def test_abbreviations_and_numbers(self):
+        """Test that abbreviations and decimals do not end a sentence."""
+        splitter = SentenceSplitter()
+        sentences = splitter.feed("Dr. Smith charges 99.50 dollars. See you ")
+        
+        self.assertEqual(sentences, ["Dr. Smith charges 99.50 dollars."])
+
+
 class TestVoiceCloner(unittest.TestCase):
     """Test cases for the VoiceCloner class."""
     
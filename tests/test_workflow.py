@@ -9,6 +9,8 @@ from unittest.mock import patch, MagicMock
 from src.workflow.actions import ActionHandler, ActionExecutor, extract_entities_from_text
 from src.workflow.flows.flow_manager import FlowManager
 from src.workflow.flows.base_flow import BaseFlow
+from src.workflow.flows.intent_speculator import IntentSpeculator
+from src.workflow.intent_matcher import IntentMatcher
 from src.workflow.flows import (
     GeneralFlow,
     AppointmentFlow,
@@ -204,6 +206,87 @@ class TestFlowManager:
         # Verify process was called
         instance.process.assert_called_once()
     
+    def test_speculative_flow_preparation(self):
+        """Test preparing a flow from partial transcripts and rolling back a wrong guess."""
+        manager = FlowManager(CONFIG_PATH)
+        manager.get_flow_instance = MagicMock(side_effect=lambda flow_id: MagicMock(name=flow_id))
+        speculator = IntentSpeculator(manager)
+        
+        for partial in ["I'd like to", "I'd like to book an", "I'd like to book an appointment"]:
+            speculator.feed(partial)
+        assert manager.prepared_flow[0] == 'appointment'
+        prepared = manager.prepared_flow[1]
+        
+        # The prediction held: starting the flow uses the prepared instance
+        assert speculator.finalize("I'd like to book an appointment for Friday") == 'appointment'
+        assert manager.start_flow('appointment') is True
+        assert manager.current_flow is prepared
+        assert manager.get_flow_instance.call_count == 1
+        
+        # A wrong guess is discarded without touching the running flow
+        manager.current_flow = None
+        speculator.feed("can you book a")
+        speculator.feed("can you book a table")
+        assert manager.prepared_flow[0] == 'appointment'
+        assert speculator.finalize("can you pass along a message") is None
+        assert manager.prepared_flow is None
+        assert speculator.get_stats() == {'prepared': 2, 'confirmed': 1, 'rolled_back': 1}
+    
+    def test_flow_class_cache(self):
+        """Test that flow classes are resolved once and flow instances are reused."""
+        manager = FlowManager(CONFIG_PATH)
+        manager.flow_registry['missing'] = {'name': 'Missing', 'description': '', 'class': 'MissingFlow'}
+        
+        info_flow = manager.get_flow_instance('info')
+        assert isinstance(info_flow, InformationFlow)
+        assert manager.get_flow_instance('info') is info_flow
+        assert manager.get_flow_instance('missing') is None
+        
+        # Other managers use the cached classes, including the failed lookup
+        with patch('src.workflow.flows.flow_manager.importlib.import_module') as import_module:
+            other = FlowManager(CONFIG_PATH)
+            other.flow_registry['missing'] = manager.flow_registry['missing']
+            
+            other_flow = other.get_flow_instance('info')
+            assert isinstance(other_flow, InformationFlow)
+            assert other_flow is not info_flow
+            assert other.get_flow_instance('missing') is None
+            import_module.assert_not_called()
+    
+    def test_flow_transitions(self):
+        """Test that transitions follow allowed_transitions and the flow stack stays bounded."""
+        manager = FlowManager(CONFIG_PATH)
+        manager.get_flow_instance = MagicMock(side_effect=lambda flow_id: MagicMock(name=flow_id))
+        
+        assert manager.can_transition(None, 'escalation')
+        assert manager.can_transition('general', 'info')
+        assert not manager.can_transition('appointment', 'info')
+        assert not manager.can_transition('escalation', 'general')
+        
+        assert manager.start_flow('general') is True
+        general = manager.current_flow
+        assert manager.start_flow('appointment') is True
+        assert manager.start_flow('escalation') is True
+        assert [entry['flow_id'] for entry in manager.flow_stack] == ['general', 'appointment']
+        
+        # Disallowed transitions leave the running flow in place
+        assert manager.start_flow('general') is False
+        assert manager.current_flow_id == 'escalation'
+        
+        manager.end_flow()
+        assert manager.current_flow_id == 'appointment'
+        
+        # Starting a suspended flow again unwinds the stack instead of stacking it twice
+        assert manager.start_flow('general') is True
+        assert manager.flow_stack == []
+        general.cleanup.assert_called_once()
+        
+        # The oldest suspended flow is dropped beyond max_stack_depth
+        manager.max_stack_depth = 1
+        assert manager.start_flow('info') is True
+        assert manager.start_flow('appointment') is True
+        assert [entry['flow_id'] for entry in manager.flow_stack] == ['info']
+    
     def test_clear_flows(self):
         """Test clearing all flows."""
         manager = FlowManager(CONFIG_PATH)
@@ -267,6 +350,21 @@ class TestFlows:
         assert 'transitioned_to' in result
         assert result['transitioned_to'] == 'appointment'
     
+    def test_general_flow_refused_transition(self):
+        """Test the general flow answers itself when a transition is refused."""
+        flow = GeneralFlow(self.flow_manager)
+        flow_data = {}
+        flow.initialize(flow_data)
+        
+        flow._analyze_intent = MagicMock(return_value='escalation')
+        self.flow_manager.start_flow = MagicMock(return_value=False)
+        
+        result = flow.process("Let me talk to a person", {}, flow_data)
+        self.flow_manager.start_flow.assert_called_once_with('escalation', flow_data)
+        assert 'transitioned_to' not in result
+        assert result['processing_results']['intent'] == 'escalation'
+        assert flow_data['current_intent'] == 'escalation'
+    
     def test_appointment_flow(self):
         """Test the appointment flow."""
         flow = AppointmentFlow(self.flow_manager)
@@ -315,6 +413,36 @@ class TestFlows:
         assert flow._determine_info_category("Where are you located?") == flow.INFO_CATEGORIES['LOCATION']
         assert flow._determine_info_category("How much does it cost?") == flow.INFO_CATEGORIES['PRICING']
     
+    def test_intent_matcher(self):
+        """Test that one scan classifies a message for every flow."""
+        matcher = IntentMatcher()
+        result = matcher.scan("Please call me back, it's urgent. Can I reschedule my appointment?")
+        
+        # Highest priority match of each group
+        assert result.first('intent') == 'appointment'
+        assert result.first('appointment_action') == 'reschedule'
+        assert result.first('urgency') == 'critical'
+        assert result.first('info_category') == 'hours'
+        assert result.has('callback', 'requested')
+        assert not result.has('confirmation')
+        assert result.first('unknown', 'general') == 'general'
+        
+        # Keywords overlapping at the same position are all found
+        assert matcher.scan("call back tomorrow").has('callback', 'requested')
+        assert matcher.scan("please contact me").first('info_category') == 'contact'
+        assert matcher.scan("please contact me").has('callback', 'requested')
+        
+        # Whole-word rules do not match inside other words
+        assert not matcher.scan("I know the notes").has('denial')
+        assert matcher.scan("no, that's wrong").has('denial')
+        
+        # Repeated scans of the same text are served from the cache
+        assert matcher.scan("Is that okay?") is matcher.scan("Is that okay?")
+        
+        # Flows read their classifications from the shared scan
+        assert MessageFlow(self.flow_manager)._determine_urgency("It can wait, no rush") == 'low'
+        assert AppointmentFlow(self.flow_manager)._analyze_appointment_intent("Do I have an appointment?") == 'inquire'
+    
     def test_escalation_flow(self):
         """Test the escalation flow."""
         flow = EscalationFlow(self.flow_manager)